@@ -1,10 +1,11 @@
 # app.py
 import streamlit as st
-from modules.interactions import chat_diagnosis_module
-from modules.drug_module import drug_module_ui
-from modules.lab import lab_module_ui
-from modules.calculators import calculators_ui
-from config import DEBUG
+from modules.metrics import start_metrics_server, recent_traces
+from config import DEBUG, WARMUP_ON_START
+
+# Page modules are imported inside their branches below: Streamlit re-runs
+# this script on every interaction, and the Calculators page should not
+# pull in faiss, torch, PyPDF2 or gTTS.
 
 # ------------------------------
 # Global Page Configuration
@@ -16,6 +17,36 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Prometheus endpoint (only when METRICS_PORT is set; started once per process)
+start_metrics_server()
+
+# ------------------------------
+# Shared Resources
+# ------------------------------
+@st.cache_resource(show_spinner=False)
+def shared_resources():
+    """Retrieval engine (encoder + FAISS index) and drug store, shared by all sessions."""
+    from modules.rag_engine import get_engine
+    from modules.drug_store import get_drug_store
+    return {"engine": get_engine(), "drug_store": get_drug_store()}
+
+@st.cache_resource(show_spinner=False)
+def background_warmup():
+    """Load the shared resources in a daemon thread, once per server process."""
+    from modules.warmup import start_warmup
+    return start_warmup()
+
+@st.cache_resource(show_spinner=False)
+def startup_cleanup():
+    """Remove stale files from TEMP_PATH, once per server process."""
+    from modules.ai_engine import cleanup_temp_files
+    return cleanup_temp_files()
+
+resources = shared_resources()
+startup_cleanup()
+if WARMUP_ON_START:
+    background_warmup()
+
 # ------------------------------
 # Dark Theme & Professional Styling
 # ------------------------------
@@ -82,6 +113,7 @@ if menu == "Home":
         """
     )
     # Call the diagnostic module
+    from modules.interactions import chat_diagnosis_module
     chat_diagnosis_module()
 
 # ------------------------------
@@ -89,7 +121,12 @@ if menu == "Home":
 # ------------------------------
 elif menu == "Drug Info":
     st.header("💊 Drug Information")
+    from modules.drug_module import drug_module_ui, suggest_drug_names
     drug_name = st.text_input("Enter Drug Name:")
+    suggestions = suggest_drug_names(drug_name)
+    if suggestions and drug_name.strip().lower() not in {s.lower() for s in suggestions}:
+        choice = st.selectbox("Did you mean:", [drug_name.strip()] + suggestions)
+        drug_name = choice
     if st.button("Get Drug Info") and drug_name.strip():
         result = drug_module_ui(drug_name)
         st.markdown(result)
@@ -99,6 +136,7 @@ elif menu == "Drug Info":
 # ------------------------------
 elif menu == "Lab Interpretation":
     st.title("🧪 Lab Interpretation")
+    from modules.lab import lab_module_ui
     lab_module_ui()
 
 # ------------------------------
@@ -106,6 +144,7 @@ elif menu == "Lab Interpretation":
 # ------------------------------
 elif menu == "Calculators":
     st.title("📊 Medical & Pharmaceutical Calculators")
+    from modules.calculators import calculators_ui
     calculators_ui()
 
 # ------------------------------
@@ -113,3 +152,28 @@ elif menu == "Calculators":
 # ------------------------------
 if DEBUG:
     st.sidebar.write("**Debug Mode Enabled**")
+    from modules.warmup import warmup_status
+    warmup = warmup_status()
+    st.sidebar.caption(f"Warm-up: {warmup['state']}"
+                       + (f" in {warmup['seconds']:.1f}s" if warmup["seconds"] is not None else ""))
+    for name, result in warmup["results"].items():
+        st.sidebar.caption(f"· {name}: {result:.2f}s" if isinstance(result, float) else f"· {name}: {result}")
+    engine_stats = resources["engine"].stats()
+    if engine_stats["index_type"]:
+        st.sidebar.caption(f"Index: {engine_stats['index_type']}, {engine_stats['queries']} queries")
+    if st.sidebar.checkbox("Show request traces"):
+        st.subheader("Recent request traces")
+        traces = recent_traces(limit=20)
+        if not traces:
+            st.caption("No traced requests yet.")
+        for t in traces:
+            tier = t["attrs"].get("tier", "-")
+            status = f" ⚠️ {t['error']}" if t["error"] else ""
+            with st.expander(f"{t['name']} · {t['duration_s'] * 1000:.0f} ms · tier: {tier}{status}"):
+                st.table([
+                    {"stage": s["stage"],
+                     "start (ms)": round((s["offset_s"] or 0) * 1000, 1),
+                     "duration (ms)": round(s["duration_s"] * 1000, 1),
+                     "error": s["error"] or ""}
+                    for s in t["spans"]
+                ])
@@ -12,6 +12,77 @@ load_dotenv()
 VECTOR_STORE_PATH = Path(os.getenv("VECTOR_STORE_PATH", "vector_store/"))
 TEMP_PATH = Path(os.getenv("PDF_FOLDER", "pdfs/"))
 TEMP_PATH.mkdir(exist_ok=True, parents=True)
+CACHE_PATH = Path(os.getenv("CACHE_PATH", "cache/"))
+
+# ------------------------------
+# Vector Store
+# ------------------------------
+DOCS_PATH = Path(os.getenv("DOCS_PATH", "docs/"))
+VECTOR_PATH = VECTOR_STORE_PATH
+FAISS_INDEX_PATH = VECTOR_PATH / "faiss_index.bin"
+CHUNK_STORE_PATH = VECTOR_PATH / "chunks.store"
+MANIFEST_PATH = VECTOR_PATH / "manifest.json"
+BM25_INDEX_PATH = VECTOR_PATH / "bm25.index"
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 500))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 50))
+# "sentence" packs whole sentences up to CHUNK_SIZE chars and CHUNK_MAX_TOKENS tokens
+# (0 = the encoder's max sequence length); "fixed" cuts plain character windows
+CHUNKER = os.getenv("CHUNKER", "sentence")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 0))
+# Duplicate chunks skipped before embedding: "near" (exact + SimHash), "exact" or "off"
+CHUNK_DEDUP = os.getenv("CHUNK_DEDUP", "near")
+CHUNK_SIMHASH_DISTANCE = int(os.getenv("CHUNK_SIMHASH_DISTANCE", 3))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Encoder backend: "torch" (full precision), "onnx", "onnx_int8" (dynamically quantized ONNX Runtime)
+# or "package.module:function" taking (model_name, threads); ENCODER_THREADS = 0 keeps the library default
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")
+ENCODER_THREADS = int(os.getenv("ENCODER_THREADS", 0))
+# Instruction set the int8 ONNX model is quantized for: arm64, avx2, avx512 or avx512_vnni
+ENCODER_ONNX_QUANTIZATION = os.getenv("ENCODER_ONNX_QUANTIZATION", "avx2")
+# Exported/quantized encoder models are kept here
+ENCODER_CACHE_PATH = Path(os.getenv("ENCODER_CACHE_PATH", str(CACHE_PATH / "encoders")))
+# Ingestion: extraction processes (0 = all cores), PDF pages per task, chunks per embedding batch
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 0))
+INGEST_PDF_PAGES_PER_TASK = int(os.getenv("INGEST_PDF_PAGES_PER_TASK", 32))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 256))
+# Uploaded documents: extraction processes (0 = all cores) and PDF pages per task,
+# chunks searched (sampled evenly above the cap) and hits fetched per chunk,
+# and the bounds of the merged context
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 0))
+UPLOAD_PDF_PAGES_PER_TASK = int(os.getenv("UPLOAD_PDF_PAGES_PER_TASK", 8))
+UPLOAD_MAX_CHUNKS = int(os.getenv("UPLOAD_MAX_CHUNKS", 512))
+UPLOAD_HITS_PER_CHUNK = int(os.getenv("UPLOAD_HITS_PER_CHUNK", 5))
+UPLOAD_CONTEXT_CHUNKS = int(os.getenv("UPLOAD_CONTEXT_CHUNKS", 8))
+UPLOAD_CONTEXT_CHARS = int(os.getenv("UPLOAD_CONTEXT_CHARS", 4000))
+# Retrieval: "dense" (FAISS), "lexical" (BM25) or "hybrid" (both, fused by reciprocal rank)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Candidates taken from each retriever per requested hit before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 4))
+# Queries of at most this many words, all of them indexed, skip the encoder (0 = never)
+LEXICAL_FAST_PATH_WORDS = int(os.getenv("LEXICAL_FAST_PATH_WORDS", 3))
+BM25_K1 = float(os.getenv("BM25_K1", 1.2))
+BM25_B = float(os.getenv("BM25_B", 0.75))
+# Queries encoded per batch by the batch retrieval API
+QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", 64))
+# Query embedding/result cache (0 entries disables it, empty path disables persistence)
+QUERY_CACHE_ENTRIES = int(os.getenv("QUERY_CACHE_ENTRIES", 10000))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", 24 * 3600))
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", str(VECTOR_PATH / "query_cache.json"))
+# Index type: flat, ivf_flat, ivf_pq or hnsw (build-time; queries detect it)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+# Vector storage of flat/IVF-flat/HNSW indexes: float32, float16 or int8 (scalar quantized)
+INDEX_STORAGE = os.getenv("INDEX_STORAGE", "float32")
+INDEX_NLIST = int(os.getenv("INDEX_NLIST", 256))
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", 16))
+INDEX_PQ_M = int(os.getenv("INDEX_PQ_M", 16))
+INDEX_PQ_NBITS = int(os.getenv("INDEX_PQ_NBITS", 8))
+INDEX_HNSW_M = int(os.getenv("INDEX_HNSW_M", 32))
+INDEX_EF_CONSTRUCTION = int(os.getenv("INDEX_EF_CONSTRUCTION", 200))
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", 64))
+INDEX_TRAIN_SAMPLE = int(os.getenv("INDEX_TRAIN_SAMPLE", 100000))
+# Seconds between on-disk change checks of the index files (0 = every query)
+VECTOR_RELOAD_INTERVAL = float(os.getenv("VECTOR_RELOAD_INTERVAL", 5))
 
 # ------------------------------
 # API Keys
@@ -21,10 +92,103 @@ GEMINI_API_URL = os.getenv("GEMINI_API_URL")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_API_URL = os.getenv("GROQ_API_URL")
 
+# ------------------------------
+# LLM Client
+# ------------------------------
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 3.05))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 30))
+GEMINI_READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", LLM_READ_TIMEOUT))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", LLM_READ_TIMEOUT))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", 2))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", 0.5))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", 10))
+# Consecutive failures before a provider is skipped, and seconds until it is retried
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", 60))
+# Race Gemini and Groq and take the first valid answer
+LLM_HEDGE = os.getenv("LLM_HEDGE", "False") == "True"
+LLM_HEDGE_TIMEOUT = float(os.getenv("LLM_HEDGE_TIMEOUT", 45))
+# Persistent LLM response cache (empty path disables it)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(CACHE_PATH / "llm_responses.sqlite"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# ------------------------------
+# Drug Database
+# ------------------------------
+DRUG_DB_PATH = Path(os.getenv("DRUG_DB_PATH", "database/drugs.json"))
+# "memory" keeps every record in RAM; "sqlite" keeps records on disk and only the name index in RAM;
+# "auto" uses sqlite once DRUG_SQLITE_PATH exists (e.g. after an OpenFDA bulk import)
+DRUG_STORE_BACKEND = os.getenv("DRUG_STORE_BACKEND", "auto")
+DRUG_SQLITE_PATH = Path(os.getenv("DRUG_SQLITE_PATH", "database/drugs.sqlite"))
+# Seconds between change checks of the drug database (0 = every lookup)
+DRUG_RELOAD_INTERVAL = float(os.getenv("DRUG_RELOAD_INTERVAL", 5))
+
+# ------------------------------
+# OpenFDA
+# ------------------------------
+OPENFDA_API_KEY = os.getenv("OPENFDA_API_KEY")
+OPENFDA_API_URL = os.getenv("OPENFDA_API_URL", "https://api.fda.gov/drug/label.json")
+OPENFDA_TIMEOUT = float(os.getenv("OPENFDA_TIMEOUT", 10))
+OPENFDA_RETRIES = int(os.getenv("OPENFDA_RETRIES", 2))
+# Client-side rate limit: sustained requests per second and burst size (OpenFDA allows 240/min)
+OPENFDA_RATE = float(os.getenv("OPENFDA_RATE", 4))
+OPENFDA_BURST = int(os.getenv("OPENFDA_BURST", 8))
+# Concurrent requests used by batch lookups
+OPENFDA_WORKERS = int(os.getenv("OPENFDA_WORKERS", 8))
+# On-disk label cache (empty path disables it)
+OPENFDA_CACHE_PATH = os.getenv("OPENFDA_CACHE_PATH", str(CACHE_PATH / "openfda_labels.sqlite"))
+OPENFDA_CACHE_TTL = float(os.getenv("OPENFDA_CACHE_TTL", 24 * 3600))
+OPENFDA_CACHE_MAX_BYTES = int(os.getenv("OPENFDA_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# ------------------------------
+# Exports (PDF / audio)
+# ------------------------------
+# Rendered files keyed by content hash (empty path disables the cache)
+EXPORT_CACHE_PATH = os.getenv("EXPORT_CACHE_PATH", str(CACHE_PATH / "exports.sqlite"))
+EXPORT_CACHE_TTL = float(os.getenv("EXPORT_CACHE_TTL", 7 * 24 * 3600))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+# Files left in TEMP_PATH longer than this (seconds) are deleted at startup
+TEMP_FILE_MAX_AGE = float(os.getenv("TEMP_FILE_MAX_AGE", 3600))
+
+# ------------------------------
+# Startup
+# ------------------------------
+# Load shared resources in a background thread when the app starts
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "True") == "True"
+# Comma-separated subset of: index, encoder, drug_store
+WARMUP_RESOURCES = os.getenv("WARMUP_RESOURCES", "index,encoder,drug_store")
+
+# ------------------------------
+# Metrics
+# ------------------------------
+# Port for the Prometheus /metrics endpoint (0 = disabled)
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+# Prometheus text file rewritten at most every METRICS_FILE_INTERVAL seconds (empty = disabled)
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_FILE_INTERVAL = float(os.getenv("METRICS_FILE_INTERVAL", 5))
+# Request traces kept for the debug panel
+METRICS_TRACE_HISTORY = int(os.getenv("METRICS_TRACE_HISTORY", 50))
+
 # ------------------------------
 # Other Config
 # ------------------------------
 TOP_K = int(os.getenv("TOP_K", 5))
 DEBUG = os.getenv("DEBUG", "True") == "True"
 TTS_LANG = os.getenv("TTS_LANG", "en")
-OPENFDA_API_KEY = os.getenv("OPENFDA_API_KEY")
+# Speech synthesis: "gtts" or "package.module:function" taking (text, lang) and returning MP3 bytes
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts")
+# Answers are synthesized in sentence-aligned segments of up to TTS_SEGMENT_CHARS, TTS_WORKERS at a time
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", 4))
+TTS_SEGMENT_CHARS = int(os.getenv("TTS_SEGMENT_CHARS", 400))
+# Speech recognition: "google" or "package.module:function" taking (PCMAudio, language) and returning text
+STT_BACKEND = os.getenv("STT_BACKEND", "google")
+STT_LANG = os.getenv("STT_LANG", "en-US")
+# Recordings are split on pauses into segments of at most STT_MAX_SEGMENT_SECONDS,
+# recognized STT_WORKERS at a time with a per-request timeout of STT_TIMEOUT seconds
+STT_WORKERS = int(os.getenv("STT_WORKERS", 4))
+STT_TIMEOUT = float(os.getenv("STT_TIMEOUT", 30))
+STT_MAX_SEGMENT_SECONDS = float(os.getenv("STT_MAX_SEGMENT_SECONDS", 30))
+STT_MIN_SILENCE_SECONDS = float(os.getenv("STT_MIN_SILENCE_SECONDS", 0.3))
+# A frame is silent below this fraction of the recording's loud (95th percentile) level
+STT_SILENCE_RATIO = float(os.getenv("STT_SILENCE_RATIO", 0.1))
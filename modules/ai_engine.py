@@ -1,87 +1,316 @@
 # modules/ai_engine.py
 import os
-import requests
-from gtts import gTTS
-from fpdf import FPDF
-from config import VECTOR_STORE_PATH, TEMP_PATH, TOP_K, DEBUG, GEMINI_API_KEY, GEMINI_API_URL, GROQ_API_KEY, GROQ_API_URL
-from modules.rag_engine import retrieve_relevant_chunks
+import json
+import hashlib
+import argparse
+import time
+import itertools
+import threading
+from config import (TEMP_PATH, TOP_K, QUERY_BATCH_SIZE, DEBUG, LLM_HEDGE, EXPORT_CACHE_PATH, EXPORT_CACHE_TTL,
+                    EXPORT_CACHE_MAX_BYTES, TEMP_FILE_MAX_AGE, TTS_LANG, TTS_BACKEND, UPLOAD_CONTEXT_CHARS)
+from modules.disk_cache import DiskCache
+from modules.llm_client import StreamInterrupted, get_provider, hedged_complete
+from modules.metrics import annotate, count, span, trace
+from modules.rag_engine import retrieve_relevant_chunks, retrieve_relevant_chunks_batch
+from modules.tts_engine import iter_speech, synthesize
+
+# ------------------------------ Export cache ------------------------------
+_EXPORT_CACHE = None
+_EXPORT_CACHE_LOCK = threading.Lock()
+
+def get_export_cache():
+    """Shared on-disk cache of rendered PDFs/MP3s, or None when EXPORT_CACHE_PATH is empty."""
+    global _EXPORT_CACHE
+    if _EXPORT_CACHE is None and EXPORT_CACHE_PATH:
+        with _EXPORT_CACHE_LOCK:
+            if _EXPORT_CACHE is None:
+                _EXPORT_CACHE = DiskCache(EXPORT_CACHE_PATH, EXPORT_CACHE_TTL or None, EXPORT_CACHE_MAX_BYTES)
+    return _EXPORT_CACHE
+
+def export_cache_key(kind: str, text: str, **params) -> str:
+    """Content address of an export: its kind, the text and the rendering parameters."""
+    blob = json.dumps({"kind": kind, "text": text, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def _cached_export(kind: str, text: str, render, **params) -> bytes:
+    """Bytes of `render()`, served from the export cache when the same text was rendered before."""
+    cache = get_export_cache()
+    key = export_cache_key(kind, text, **params)
+    if cache:
+        try:
+            data = cache.get(key)
+            if data is not None:
+                count("export_cache_hits_total", kind=kind)
+                return data
+        except Exception as e:
+            if DEBUG: print(f"[DEBUG] Export cache read failed: {e}")
+    with span(f"{kind}_render"):
+        data = render()
+    if cache:
+        try:
+            cache.set(key, data)
+        except Exception as e:
+            if DEBUG: print(f"[DEBUG] Export cache write failed: {e}")
+    return data
+
+def cleanup_temp_files(max_age: float = TEMP_FILE_MAX_AGE) -> int:
+    """Delete files in TEMP_PATH older than `max_age` seconds; returns how many were removed."""
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in TEMP_PATH.iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except OSError as e:
+            if DEBUG: print(f"[DEBUG] Could not remove {path}: {e}")
+    if DEBUG and removed: print(f"[DEBUG] Removed {removed} stale file(s) from {TEMP_PATH}")
+    return removed
 
 # ------------------------------ PDF generation ------------------------------
-def text_to_pdf(text: str, filename: str = "output.pdf") -> str:
-    pdf_file = TEMP_PATH / filename
+def _render_pdf(text: str) -> bytes:
+    from fpdf import FPDF
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12)
     for line in text.split("\n"):
         pdf.multi_cell(0, 8, line.encode('latin-1', 'replace').decode('latin-1'))
-    pdf.output(str(pdf_file))
-    return str(pdf_file)
+    # PyFPDF returns a latin-1 str, fpdf2 a bytearray
+    data = pdf.output(dest="S")
+    return data.encode("latin-1") if isinstance(data, str) else bytes(data)
+
+def text_to_pdf(text: str) -> bytes:
+    """The answer as PDF bytes, rendered in memory (nothing is written to TEMP_PATH)."""
+    return _cached_export("pdf", text, lambda: _render_pdf(text))
 
 # ------------------------------ Audio generation ------------------------------
-def text_to_speech(text: str, filename: str = "output.mp3") -> str:
-    audio_file = TEMP_PATH / filename
-    tts = gTTS(text=text, lang="en")
-    tts.save(str(audio_file))
-    return str(audio_file)
+def text_to_speech(text: str, lang: str = TTS_LANG) -> bytes:
+    """
+    The answer as MP3 bytes, synthesized in memory (nothing is written to TEMP_PATH).
+    Sentence segments are synthesized concurrently and cached individually.
+    """
+    return _cached_export("tts", text, lambda: synthesize(text, lang, cache=get_export_cache()),
+                          lang=lang, backend=TTS_BACKEND)
+
+def text_to_speech_stream(text: str, lang: str = TTS_LANG):
+    """Yield MP3 bytes segment by segment, so playback can start on the first sentence."""
+    yield from iter_speech(text, lang, cache=get_export_cache())
 
 # ------------------------------ Gemini API ------------------------------
 def query_gemini(query: str) -> str:
-    if not GEMINI_API_KEY:
-        if DEBUG: print("[DEBUG] GEMINI_API_KEY missing in .env")
-        return ""
-    url = f"{GEMINI_API_URL}text-bison-001:generateText"
-    headers = {"Authorization": f"Bearer {GEMINI_API_KEY}", "Content-Type": "application/json"}
-    data = {"prompt": query, "temperature": 0.2, "maxOutputTokens": 512}
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        result = response.json()
-        return result['candidates'][0]['content']
-    except Exception as e:
-        if DEBUG: print(f"[DEBUG] Gemini API error: {e}")
-        return ""
+    return get_provider("gemini").complete(query)
 
 # ------------------------------ Groq API ------------------------------
 def query_groq(query: str) -> str:
-    if not GROQ_API_KEY:
-        if DEBUG: print("[DEBUG] GROQ_API_KEY missing in .env")
-        return ""
-    url = f"{GROQ_API_URL}generate"
-    headers = {"Authorization": f"Bearer {GROQ_API_KEY}", "Content-Type": "application/json"}
-    data = {"prompt": query, "max_tokens": 512, "temperature": 0.2}
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        result = response.json()
-        return result.get('text', '')
-    except Exception as e:
-        if DEBUG: print(f"[DEBUG] Groq API error: {e}")
-        return ""
+    return get_provider("groq").complete(query)
 
 # ------------------------------ Main clinical answer ------------------------------
+NO_ANSWER = "⚠️ No answer found locally or online. Please consult a healthcare professional."
+
+def _format_chunks(chunks) -> str:
+    return "\n\n".join([f"• {chunk.strip()}" for chunk in chunks])
+
+def _record_tier(tier: str):
+    """Count which fallback tier (faiss, gemini, groq or none) produced an answer."""
+    count("answers_total", tier=tier)
+    annotate(tier=tier)
+
+def _online_answer(query: str) -> str:
+    # Steps 2+3 raced: first valid answer from Gemini or Groq
+    if LLM_HEDGE:
+        with span("llm_hedged"):
+            provider, answer = hedged_complete(query)
+        if DEBUG: print(f"[DEBUG] Hedged LLM answer from {provider}")
+        _record_tier(provider if answer.strip() else "none")
+        return answer if answer.strip() else NO_ANSWER
+
+    # Step 2: Gemini API fallback
+    answer, tier = query_gemini(query), "gemini"
+    if DEBUG: print("[DEBUG] Using Gemini API fallback")
+
+    # Step 3: Groq API fallback
+    if not answer.strip():
+        answer, tier = query_groq(query), "groq"
+        if DEBUG: print("[DEBUG] Using Groq API fallback")
+
+    # Step 4: Final fallback
+    if not answer.strip():
+        answer, tier = NO_ANSWER, "none"
+    _record_tier(tier)
+    return answer
+
 def generate_clinical_answer(query: str, top_k: int = TOP_K) -> str:
     answer = ""
 
+    with trace("answer"):
+        # Step 1: Try local FAISS
+        try:
+            with span("retrieval"):
+                chunks = retrieve_relevant_chunks(query, top_k=top_k)
+            if chunks:
+                answer = _format_chunks(chunks)
+                _record_tier("faiss")
+        except Exception as e:
+            if DEBUG: print(f"[DEBUG] FAISS retrieval skipped: {e}")
+
+        if not answer.strip():
+            answer = _online_answer(query)
+
+    return answer
+
+def generate_clinical_answers(queries, top_k: int = TOP_K, return_hits: bool = False):
+    """
+    Batch variant of generate_clinical_answer.
+
+    Retrieval for all queries runs as one batched encode + FAISS search; only
+    queries without local hits go to the online fallbacks. Returns a list of
+    answers, or (answers, hits) when `return_hits` is set.
+    """
+    queries = list(queries)
+    with trace("answer_batch", queries=len(queries)):
+        with span("retrieval"):
+            hits = retrieve_relevant_chunks_batch(queries, top_k=top_k)
+        answers = []
+        for query, query_hits in zip(queries, hits):
+            answer = _format_chunks([hit["chunk"] for hit in query_hits]) if query_hits else ""
+            if answer.strip():
+                count("answers_total", tier="faiss")
+            else:
+                answer = _online_answer(query)
+            answers.append(answer)
+    return (answers, hits) if return_hits else answers
+
+def generate_clinical_answer_stream(query: str, top_k: int = TOP_K):
+    """
+    Streaming variant of generate_clinical_answer.
+
+    Yields event dicts as the answer is produced:
+      {"type": "chunks", "chunks": [...]}       as soon as local retrieval finishes
+      {"type": "token", "text", "provider"}     for each piece of the answer
+      {"type": "reset", "provider"}             a provider failed mid-answer; discard its tokens
+      {"type": "done", "answer", "source", "ttft_s", "total_s"}
+    Time-to-first-token and total latency are reported separately.
+    """
+    with trace("answer_stream"):
+        yield from _answer_stream(query, lambda: retrieve_relevant_chunks(query, top_k=top_k))
+
+UPLOAD_PROMPT = (
+    "The following are excerpts from a medical document uploaded by a clinician. "
+    "Summarize the key clinical findings and give a professional interpretation.\n\n{excerpt}"
+)
+
+def generate_document_answer_stream(pages):
+    """
+    Streaming answer for an uploaded document, given as (page, text) pairs.
+
+    The document is chunked and searched as one batch; merged, ranked hits
+    form the local answer, and only a bounded excerpt of the document is
+    sent to the online fallbacks. Yields the same events as
+    generate_clinical_answer_stream.
+    """
+    from modules.document_query import query_document
+
+    with trace("answer_document"):
+        context, excerpt = [], ""
+        try:
+            with span("upload_retrieval"):
+                context, excerpt, stats = query_document(pages)
+            annotate(**{f"upload_{key}": value for key, value in stats.items()})
+        except Exception as e:
+            if DEBUG: print(f"[DEBUG] Upload retrieval skipped: {e}")
+            excerpt = "\n\n".join(text for _, text in pages)[:UPLOAD_CONTEXT_CHARS]
+        yield from _answer_stream(UPLOAD_PROMPT.format(excerpt=excerpt), lambda: [hit["chunk"] for hit in context])
+
+def _answer_stream(query: str, retrieve):
+    start = time.perf_counter()
+    first_token_at = None
+
     # Step 1: Try local FAISS
+    chunks = []
     try:
-        chunks = retrieve_relevant_chunks(query, top_k=top_k)
-        if chunks:
-            answer = "\n\n".join([f"• {chunk.strip()}" for chunk in chunks])
+        with span("retrieval"):
+            chunks = retrieve()
     except Exception as e:
         if DEBUG: print(f"[DEBUG] FAISS retrieval skipped: {e}")
+    yield {"type": "chunks", "chunks": chunks}
 
-    # Step 2: Gemini API fallback
-    if not answer.strip():
-        answer = query_gemini(query)
-        if DEBUG: print("[DEBUG] Using Gemini API fallback")
+    answer, source = "", None
+    if chunks:
+        answer, source = _format_chunks(chunks), "faiss"
+        first_token_at = time.perf_counter()
+        yield {"type": "token", "text": answer, "provider": source}
 
-    # Step 3: Groq API fallback
-    if not answer.strip():
-        answer = query_groq(query)
-        if DEBUG: print("[DEBUG] Using Groq API fallback")
+    # Steps 2+3: stream from Gemini, then Groq
+    for provider in ("gemini", "groq"):
+        if answer.strip():
+            break
+        if DEBUG: print(f"[DEBUG] Streaming {provider} API fallback")
+        pieces = []
+        try:
+            for text in get_provider(provider).stream(query):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                pieces.append(text)
+                yield {"type": "token", "text": text, "provider": provider}
+        except StreamInterrupted:
+            pieces = []
+            yield {"type": "reset", "provider": provider}
+        answer = "".join(pieces)
+        source = provider
 
     # Step 4: Final fallback
     if not answer.strip():
-        answer = "⚠️ No answer found locally or online. Please consult a healthcare professional."
+        answer, source = NO_ANSWER, "none"
+        yield {"type": "token", "text": answer, "provider": source}
 
-    return answer
+    total_s = time.perf_counter() - start
+    ttft_s = first_token_at - start if first_token_at is not None else None
+    _record_tier(source)
+    annotate(ttft_s=ttft_s)
+    if DEBUG:
+        ttft = f"{ttft_s:.3f}s" if ttft_s is not None else "n/a"
+        print(f"[DEBUG] Answer from {source}: time to first token {ttft}, total {total_s:.3f}s")
+    yield {"type": "done", "answer": answer, "source": source, "ttft_s": ttft_s, "total_s": total_s}
+
+# ------------------------------ Batch CLI ------------------------------
+def _read_queries(path):
+    """Yield (id, query) from a JSONL file of {"id", "query"} objects or bare strings."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                yield line_no, record
+            else:
+                yield record.get("id", line_no), record["query"]
+
+def answer_jsonl(input_path, output_path, top_k: int = TOP_K, batch_size: int = QUERY_BATCH_SIZE):
+    """Answer every query in `input_path` and write one JSON answer per line to `output_path`."""
+    written = 0
+    with open(output_path, "w", encoding="utf-8") as out:
+        records = _read_queries(input_path)
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            answers, hits = generate_clinical_answers([query for _, query in batch], top_k, return_hits=True)
+            for (query_id, query), answer, query_hits in zip(batch, answers, hits):
+                out.write(json.dumps({
+                    "id": query_id,
+                    "query": query,
+                    "answer": answer,
+                    "hits": [{"id": hit["id"], "distance": hit["distance"]} for hit in query_hits],
+                }, ensure_ascii=False) + "\n")
+            written += len(batch)
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of clinical queries.")
+    parser.add_argument("input", help="JSONL with one {\"id\", \"query\"} object (or string) per line")
+    parser.add_argument("output", help="JSONL file to write answers to")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--batch-size", type=int, default=QUERY_BATCH_SIZE)
+    args = parser.parse_args()
+    n = answer_jsonl(args.input, args.output, args.top_k, args.batch_size)
+    print(f"Answered {n} queries -> {args.output}")
@@ -0,0 +1,221 @@
+# modules/batch_calculators.py
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ------------------------------
+# Vectorized calculators
+# ------------------------------
+# Each function takes scalars, lists, NumPy arrays or pandas Series and
+# returns the same values as its scalar counterpart in modules.calculators.
+# Rows the scalar version would reject (or crash on) come back as NaN
+# instead of raising; a Series input gives a Series on the same index.
+
+def _numeric(values):
+    if isinstance(values, (pd.Series, pd.Index)):
+        return pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64")
+    array = np.asarray(values)
+    if array.dtype.kind in "biuf":
+        return array.astype("float64", copy=False)
+    return pd.to_numeric(pd.Series(array.ravel()), errors="coerce").to_numpy(dtype="float64").reshape(array.shape)
+
+def _lowered(values, size):
+    """Lower-cased strings (missing values become "") broadcast to `size`."""
+    if isinstance(values, str) or values is None:
+        return np.full(size, (values or "").lower(), dtype=object)
+    return pd.Series(np.asarray(values, dtype=object)).fillna("").astype(str).str.lower().to_numpy()
+
+def _result(values, like):
+    for arg in like:
+        if isinstance(arg, pd.Series):
+            return pd.Series(values, index=arg.index)
+    return values
+
+def _round(values, decimals):
+    """
+    Round like the scalar functions' built-in round(), which rounds the exact
+    decimal value. np.round scales by 10**decimals first, which can tip values
+    next to a rounding boundary the other way; only those are re-rounded in Python.
+    """
+    if decimals is None:
+        return values
+    values = np.asarray(values, dtype="float64")
+    rounded = np.array(np.round(values, decimals))
+    scaled = values * 10.0 ** decimals
+    with np.errstate(invalid="ignore"):
+        boundary = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if boundary.size:
+        flat, originals = rounded.reshape(-1), values.reshape(-1)
+        flat[boundary] = [round(float(originals[i]), decimals) for i in boundary]
+    return rounded if rounded.ndim else rounded[()]
+
+def bmi_batch(weight, height, decimals=2):
+    """BMI = weight(kg) / height(m)^2; NaN where height <= 0."""
+    w, h = np.broadcast_arrays(_numeric(weight), _numeric(height))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bmi = np.where(h > 0, w / h ** 2, np.nan)
+    return _result(_round(bmi, decimals), (weight, height))
+
+def bsa_batch(weight, height, decimals=2):
+    """Mosteller BSA = sqrt(height(cm) * weight(kg) / 3600); NaN where the product is negative."""
+    w, h = np.broadcast_arrays(_numeric(weight), _numeric(height))
+    product = h * w / 3600
+    with np.errstate(invalid="ignore"):
+        bsa = np.where(product >= 0, np.sqrt(product), np.nan)
+    return _result(_round(bsa, decimals), (weight, height))
+
+def gfr_batch(creatinine, age, sex, race="non-black", decimals=2):
+    """
+    Simplified CKD-EPI eGFR (ml/min/1.73 m^2), as `calculate_gfr`.
+
+    Any sex other than "female" is treated as male, like the scalar version;
+    missing sex, creatinine <= 0 and negative or missing age give NaN.
+    """
+    scr, years = np.broadcast_arrays(_numeric(creatinine), _numeric(age))
+    size = scr.size
+    sex_l = _lowered(sex, size)
+    race_l = _lowered(race, size)
+    female = sex_l == "female"
+    valid = (scr > 0) & (years >= 0) & (sex_l != "")
+
+    k = np.where(female, 0.7, 0.9)
+    alpha = np.where(female, -0.329, -0.411)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = scr / k
+        gfr = (141 * np.minimum(ratio, 1) ** alpha * np.maximum(ratio, 1) ** -1.209
+               * 0.993 ** years)
+    gfr = np.where(female, gfr * 1.018, gfr)
+    gfr = np.where(race_l == "black", gfr * 1.159, gfr)
+    gfr = np.where(valid, gfr, np.nan)
+    return _result(_round(gfr, decimals), (creatinine, age, sex, race))
+
+def drip_rate_batch(volume_ml, time_min, drop_factor=20, decimals=1):
+    """IV drip rate in drops/min; NaN where time <= 0."""
+    v, t, f = np.broadcast_arrays(_numeric(volume_ml), _numeric(time_min), _numeric(drop_factor))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(t > 0, v * f / t, np.nan)
+    return _result(_round(rate, decimals), (volume_ml, time_min, drop_factor))
+
+def isotonicity_batch(solute_mEq, solvent_L, decimals=2):
+    """Osmolarity (mOsm/L); NaN where the solvent volume is 0."""
+    s, v = np.broadcast_arrays(_numeric(solute_mEq), _numeric(solvent_L))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        osm = np.where(v != 0, s / v, np.nan)
+    return _result(_round(osm, decimals), (solute_mEq, solvent_L))
+
+def ph_batch(h_concentration, decimals=2):
+    """pH = -log10([H+]); NaN where the concentration is <= 0."""
+    h = _numeric(h_concentration)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ph = np.where(h > 0, -np.log10(h), np.nan)
+    return _result(_round(ph, decimals), (h_concentration,))
+
+# ------------------------------
+# DataFrame interface
+# ------------------------------
+# Output column -> (function, required input columns, optional input columns with defaults)
+CALCULATORS = {
+    "bmi": (bmi_batch, ("weight_kg", "height_m"), {}),
+    "bsa": (bsa_batch, ("weight_kg", "height_cm"), {}),
+    "egfr": (gfr_batch, ("creatinine", "age", "sex"), {"race": "non-black"}),
+    "drip_rate": (drip_rate_batch, ("volume_ml", "time_min"), {"drop_factor": 20}),
+    "osmolarity": (isotonicity_batch, ("solute_meq", "solvent_l"), {}),
+    "ph": (ph_batch, ("h_concentration",), {}),
+}
+
+def _with_derived_heights(df):
+    columns = {c.lower(): c for c in df.columns}
+    df = df.rename(columns={original: lower for lower, original in columns.items()})
+    if "height_m" not in df and "height_cm" in df:
+        df["height_m"] = _numeric(df["height_cm"]) / 100
+    elif "height_cm" not in df and "height_m" in df:
+        df["height_cm"] = _numeric(df["height_m"]) * 100
+    return df
+
+def available_calculators(columns):
+    """Calculators whose required columns are present (height in m or cm counts for both)."""
+    columns = {c.lower() for c in columns}
+    if "height_m" in columns or "height_cm" in columns:
+        columns |= {"height_m", "height_cm"}
+    return [name for name, (_, required, _) in CALCULATORS.items()
+            if all(column in columns for column in required)]
+
+def compute_dataframe(df, calculators=None):
+    """
+    Add one output column per calculator to a copy of `df`.
+
+    Input columns are matched case-insensitively (see CALCULATORS);
+    `calculators` defaults to every calculator whose inputs are present.
+    Invalid rows get NaN rather than failing the batch.
+    """
+    names = calculators or available_calculators(df.columns)
+    inputs = _with_derived_heights(df)
+    out = df.copy()
+    for name in names:
+        func, required, optional = CALCULATORS[name]
+        missing = [column for column in required if column not in inputs]
+        if missing:
+            raise ValueError(f"'{name}' needs column(s): {', '.join(missing)}")
+        args = [inputs[column] for column in required]
+        args += [inputs[column] if column in inputs else default for column, default in optional.items()]
+        out[name] = func(*args)
+    return out
+
+# ------------------------------
+# File batches
+# ------------------------------
+def _iter_frames(path, chunksize):
+    path = Path(path)
+    if path.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+def run_file(input_path, output_path, calculators=None, chunksize=500_000):
+    """
+    Compute calculators for every row of a CSV or Parquet file in chunks,
+    writing CSV or Parquet (by extension). Returns (rows, seconds).
+    """
+    output_path = Path(output_path)
+    start = time.perf_counter()
+    rows = 0
+    writer = None
+    try:
+        for frame in _iter_frames(input_path, chunksize):
+            result = compute_dataframe(frame, calculators)
+            if output_path.suffix.lower() == ".parquet":
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(result, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+            else:
+                result.to_csv(output_path, mode="w" if rows == 0 else "a", header=rows == 0, index=False)
+            rows += len(result)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows, time.perf_counter() - start
+
+# ------------------------------
+# CLI: python -m modules.batch_calculators
+# ------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the clinical calculators over every row of a CSV or Parquet file.")
+    parser.add_argument("input", help="CSV or Parquet file")
+    parser.add_argument("output", help="CSV or Parquet file to write (inputs plus result columns)")
+    parser.add_argument("--calc", default=None,
+                        help=f"comma-separated subset of: {', '.join(CALCULATORS)} (default: all applicable)")
+    parser.add_argument("--chunksize", type=int, default=500_000, help="rows processed at a time")
+    args = parser.parse_args()
+
+    calculators = args.calc.split(",") if args.calc else None
+    rows, elapsed = run_file(args.input, args.output, calculators, args.chunksize)
+    print(f"{rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s) -> {args.output}")
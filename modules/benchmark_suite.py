@@ -0,0 +1,473 @@
+# modules/benchmark_suite.py
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import threading
+import subprocess
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+# ------------------------------
+# Benchmark suite
+# ------------------------------
+# Runs every hot path against a seeded synthetic corpus in a scratch
+# directory and writes one JSON document per run, so results can be
+# diffed over time (see --compare). Project modules are imported only
+# after the scratch paths are placed in the environment, because config.py
+# resolves its paths at import time.
+#
+#   python -m modules.benchmark_suite --scale small --out bench.json
+#   python -m modules.benchmark_suite --scale small --compare bench.json
+
+SCALES = {
+    # chunks in the synthetic corpus, retrieval queries, calculator/lab rows
+    "tiny": {"chunks": 2_000, "queries": 200, "rows": 100_000},
+    "small": {"chunks": 50_000, "queries": 1_000, "rows": 1_000_000},
+    "medium": {"chunks": 500_000, "queries": 2_000, "rows": 5_000_000},
+    "large": {"chunks": 2_000_000, "queries": 5_000, "rows": 10_000_000},
+}
+
+_VOCABULARY = (
+    "patient presents with acute chronic fever cough dyspnea chest pain headache nausea "
+    "vomiting diarrhea fatigue hypertension diabetes asthma pneumonia infection sepsis "
+    "renal hepatic cardiac failure insufficiency therapy treatment dose daily oral "
+    "intravenous mg kg monitor serum creatinine hemoglobin platelets glucose insulin "
+    "antibiotic amoxicillin ibuprofen paracetamol metformin lisinopril warfarin heparin "
+    "contraindicated pregnancy elderly pediatric adverse reaction rash bleeding "
+    "diagnosis differential history examination imaging laboratory findings management "
+    "guideline recommended first line second line follow up weeks months risk factors"
+).split()
+
+# Boilerplate repeated at the top of every document, as in guideline PDFs;
+# it differs only in the document number, so it is a near duplicate
+_DISCLAIMER = (
+    "This guideline is provided for information only and does not replace clinical judgement. "
+    "Recommendations reflect the evidence available at the time of publication and may change. "
+    "Reproduction is permitted for non-commercial educational use with acknowledgement of the source. "
+    "Refer to the full prescribing information before administering any medicine. Document {number}."
+)
+
+# ------------------------------
+# Synthetic corpus
+# ------------------------------
+def generate_corpus(docs_dir, n_chunks, chunk_size=500, chunks_per_doc=50, seed=0):
+    """
+    Write a seeded corpus of .txt documents totalling about `n_chunks` chunks.
+
+    Each document starts with the same disclaimer paragraph, so deduplication
+    has something to find. Documents are generated and written one at a time,
+    so millions of chunks need no more memory than a single document.
+    Returns (docs, chars).
+    """
+    docs_dir = Path(docs_dir)
+    docs_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(_VOCABULARY, dtype=object)
+    # Generated words average ~9 characters with the separator; chunks overlap by ~10%
+    words_per_doc = chunks_per_doc * chunk_size // 9
+    n_docs = max(1, -(-n_chunks // chunks_per_doc))
+    chars = 0
+    for i in range(n_docs):
+        words = vocabulary[rng.zipf(1.3, words_per_doc) % len(vocabulary)]
+        sentences = [" ".join(words[j:j + 12]).capitalize() + "." for j in range(0, len(words), 12)]
+        text = _DISCLAIMER.format(number=i + 1) + "\n\n" + " ".join(sentences)
+        (docs_dir / f"synthetic_{i:07d}.txt").write_text(text, encoding="utf-8")
+        chars += len(text)
+    return n_docs, chars
+
+def generate_queries(n_queries, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_VOCABULARY) for _ in range(rng.randint(3, 8))) for _ in range(n_queries)]
+
+# ------------------------------
+# Measurements
+# ------------------------------
+def peak_rss_mb():
+    """Peak resident set size of this process so far (MB), or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def percentiles_ms(samples):
+    samples = np.asarray(samples) * 1000
+    return {f"p{q}_ms": float(np.percentile(samples, q)) for q in (50, 90, 95, 99)} | {
+        "mean_ms": float(samples.mean()), "max_ms": float(samples.max())}
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+# ------------------------------
+# Stages
+# ------------------------------
+def bench_split_text(docs_dir, max_docs=200):
+    """Fixed character windows against the sentence chunker (approximate token counts)."""
+    from modules.chunking import make_chunker
+
+    texts = [path.read_text(encoding="utf-8") for path in sorted(Path(docs_dir).glob("*.txt"))[:max_docs]]
+    chars = sum(len(text) for text in texts)
+    results = {"docs": len(texts)}
+    for kind in ("fixed", "sentence"):
+        chunker = make_chunker(kind=kind)
+        chunks, elapsed = _timed(lambda: sum(1 for text in texts for _ in chunker(text)))
+        results[kind] = {"chunks": chunks, "seconds": elapsed,
+                         "chunks_per_s": chunks / elapsed, "mb_per_s": chars / elapsed / 1e6}
+    return results
+
+def bench_ingestion(workers):
+    """Extraction + chunking throughput, without embedding."""
+    from modules.build_faiss import list_document_files, iter_document_chunks
+    from modules.ingest import IngestStats
+
+    stats = IngestStats(report_every=float("inf"))
+    files = list_document_files()
+    count = 0
+    start = time.perf_counter()
+    for record in iter_document_chunks(files, workers, stats):
+        if not record.get("done"):
+            count += 1
+    elapsed = time.perf_counter() - start
+    return {"docs": stats.docs, "chunks": count, "workers": workers, "seconds": elapsed,
+            "docs_per_s": stats.docs / elapsed, "chunks_per_s": count / elapsed}
+
+def bench_build(workers, index_type):
+    from modules.build_faiss import build_faiss_index
+    from modules.chunk_store import ChunkStore
+    from config import CHUNK_STORE_PATH
+
+    summary, elapsed = _timed(build_faiss_index, full=True, index_params={"index_type": index_type},
+                              workers=workers)
+    chunks = len(ChunkStore(CHUNK_STORE_PATH))
+    return {"index_type": index_type, "chunks": chunks, "seconds": elapsed,
+            "chunks_per_s": chunks / elapsed, "duplicates": summary["duplicates"],
+            "dedup_ratio": summary["dedup_ratio"], "peak_rss_mb": peak_rss_mb()}
+
+def bench_retrieval(queries, top_k):
+    from modules.rag_engine import get_engine, retrieve_relevant_chunks, retrieve_relevant_chunks_batch
+
+    engine = get_engine()
+    (_, load_s) = _timed(engine.snapshot)
+    retrieve_relevant_chunks(queries[0], top_k)  # loads the encoder
+    latencies = []
+    for query in queries:
+        _, elapsed = _timed(retrieve_relevant_chunks, query, top_k)
+        latencies.append(elapsed)
+    _, batch_s = _timed(retrieve_relevant_chunks_batch, queries, top_k)
+    return {"queries": len(queries), "top_k": top_k, "index_load_s": load_s,
+            "single": percentiles_ms(latencies) | {"qps": len(queries) / sum(latencies)},
+            "batch": {"seconds": batch_s, "qps": len(queries) / batch_s},
+            "peak_rss_mb": peak_rss_mb()}
+
+def known_item_queries(n_queries, seed=0):
+    """
+    (query, chunk id) pairs cut from stored chunks: 2-word keyword queries
+    and 10-word passage queries, each expected to retrieve its source chunk.
+    """
+    from modules.rag_engine import get_engine
+
+    _, chunks = get_engine().snapshot()
+    rng = np.random.default_rng(seed)
+    ids = rng.choice(chunks.ids, size=min(n_queries, len(chunks)), replace=False)
+    queries = {"keyword": [], "passage": []}
+    for chunk_id, text in zip(ids, chunks.get_many(ids)):
+        words = text.split()
+        for kind, length in (("keyword", 2), ("passage", 10)):
+            start = int(rng.integers(0, max(1, len(words) - length + 1)))
+            queries[kind].append((" ".join(words[start:start + length]).strip(".,"), int(chunk_id)))
+    return queries
+
+def bench_hybrid(n_queries, top_k, seed):
+    """
+    Dense, lexical (BM25) and hybrid retrieval on known-item queries: latency
+    per query, and how often the source chunk is the top hit or in the top k.
+    """
+    from modules.rag_engine import get_engine
+
+    engine = get_engine()
+    if engine.lexical is None:
+        return {"error": "no BM25 index; run the build stage first"}
+    engine.search("warm up the encoder", top_k, mode="dense")
+    results = {}
+    for kind, pairs in known_item_queries(n_queries, seed).items():
+        for mode in ("dense", "lexical", "hybrid"):
+            fast_path = engine.timings["lexical_fast_path"]
+            latencies, top1, recall = [], 0, 0
+            for query, chunk_id in pairs:
+                hits, elapsed = _timed(engine.search_batch, [query], top_k, mode=mode)
+                latencies.append(elapsed)
+                ids = [hit["id"] for hit in hits[0]]
+                top1 += bool(ids) and ids[0] == chunk_id
+                recall += chunk_id in ids
+            results[f"{kind}_{mode}"] = percentiles_ms(latencies) | {
+                "top1": top1 / len(pairs), f"recall_at_{top_k}": recall / len(pairs),
+                "fast_path": engine.timings["lexical_fast_path"] - fast_path}
+    return results
+
+class _StubProviderHandler(BaseHTTPRequestHandler):
+    """Answers Gemini and Groq completion requests with a canned text."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        text = "Stub clinical answer for benchmarking."
+        if "gemini" in self.path:
+            body = {"candidates": [{"content": text}]}
+        else:
+            body = {"text": text}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def start_stub_providers():
+    """Local stand-in for the LLM providers; returns (server, base URL)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubProviderHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def bench_answers(queries, top_k):
+    """generate_clinical_answer with local hits, and the online fallback against stub providers."""
+    from modules.ai_engine import generate_clinical_answer, _online_answer
+
+    local = [_timed(generate_clinical_answer, query, top_k)[1] for query in queries]
+    online = [_timed(_online_answer, query)[1] for query in queries]
+    return {"queries": len(queries), "local": percentiles_ms(local), "online_stub": percentiles_ms(online)}
+
+def bench_lab(rows, seed):
+    from modules.lab_benchmark import run_benchmark
+
+    return run_benchmark(rows, min(rows, 100_000), seed)
+
+def bench_calculators(rows, seed):
+    import pandas as pd
+    from modules.batch_calculators import compute_dataframe, gfr_batch
+    from modules.calculators import calculate_gfr
+
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "weight_kg": rng.uniform(3, 200, rows).round(1),
+        "height_cm": rng.uniform(45, 210, rows).round(0),
+        "creatinine": rng.uniform(0.2, 8, rows).round(2),
+        "age": rng.integers(0, 100, rows),
+        "sex": rng.choice(["male", "female"], rows),
+        "race": rng.choice(["black", "non-black"], rows),
+    })
+    _, batch_s = _timed(compute_dataframe, df)
+    sample = df.iloc[:min(rows, 100_000)]
+    _, scalar_s = _timed(lambda: [calculate_gfr(*row) for row in zip(sample["creatinine"], sample["age"],
+                                                                    sample["sex"], sample["race"])])
+    _, gfr_s = _timed(gfr_batch, df["creatinine"], df["age"], df["sex"], df["race"])
+    return {"rows": rows, "all_calculators_rows_per_s": rows / batch_s,
+            "egfr_batch_rows_per_s": rows / gfr_s, "egfr_scalar_rows_per_s": len(sample) / scalar_s}
+
+# Modules that dominate startup; a page should only load the ones it needs
+HEAVY_MODULES = ("faiss", "torch", "sentence_transformers", "speech_recognition", "PyPDF2", "docx",
+                 "gtts", "fpdf", "pandas", "onnxruntime")
+# What app.py imports on every run, and what each page adds (see app.py)
+PAGE_MODULES = {
+    "app": ["modules.metrics", "modules.rag_engine", "modules.drug_store", "modules.warmup"],
+    "home": ["modules.interactions"],
+    "drug_info": ["modules.drug_module"],
+    "lab": ["modules.lab"],
+    "calculators": ["modules.calculators"],
+}
+
+_STARTUP_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+for name in sys.argv[3:]:
+    __import__(name)
+result = {"import_s": time.perf_counter() - start}
+if sys.argv[1] == "warmup":
+    from modules.warmup import warm_up
+    result["warmup"] = warm_up()
+    from modules.ai_engine import generate_clinical_answer
+    answer_start = time.perf_counter()
+    generate_clinical_answer("fever and cough")
+    result["first_answer_s"] = time.perf_counter() - answer_start
+heavy = [name for name in sys.argv[2].split(",") if name in sys.modules]
+result |= {"heavy_modules": heavy, "heavy_module_count": len(heavy)}
+print(json.dumps(result))
+"""
+
+def _startup_probe(mode, modules):
+    """Run `_STARTUP_PROBE` in a fresh interpreter, as a new Streamlit server process would start."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", _STARTUP_PROBE, mode, ",".join(HEAVY_MODULES), *modules],
+                          capture_output=True, text=True, cwd=Path(__file__).resolve().parent.parent)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1]) | {"process_s": elapsed}
+
+def bench_startup():
+    """
+    Cold-start cost: per-page import time and heavy modules loaded in a
+    fresh interpreter, then warm-up of the shared resources and the first answer.
+    """
+    results = {"interpreter_s": _timed(subprocess.run, [sys.executable, "-c", "pass"])[1]}
+    for page in PAGE_MODULES:
+        modules = PAGE_MODULES["app"] + (PAGE_MODULES[page] if page != "app" else [])
+        results[page] = _startup_probe("imports", modules)
+    results["warmup"] = _startup_probe("warmup", PAGE_MODULES["app"])
+    return results
+
+# ------------------------------
+# Runner
+# ------------------------------
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent.parent).stdout.strip() or None
+    except OSError:
+        return None
+
+def prepare_environment(workdir, stub_url):
+    """Point config at the scratch directory and the stub providers; disable caches."""
+    workdir = Path(workdir)
+    os.environ.update({
+        "DOCS_PATH": str(workdir / "docs"),
+        "VECTOR_STORE_PATH": str(workdir / "vector_store"),
+        "CACHE_PATH": str(workdir / "cache"),
+        "PDF_FOLDER": str(workdir / "pdfs"),
+        "QUERY_CACHE_ENTRIES": "0",
+        "QUERY_CACHE_PATH": "",
+        "LLM_CACHE_PATH": "",
+        "LLM_HEDGE": "False",
+        "GEMINI_API_KEY": "benchmark",
+        "GEMINI_API_URL": f"{stub_url}/gemini/",
+        "GROQ_API_KEY": "benchmark",
+        "GROQ_API_URL": f"{stub_url}/groq/",
+        "DEBUG": "False",
+    })
+
+def run_suite(scale="small", seed=0, workdir=None, workers=0, index_type="flat", stages=None, keep=False):
+    params = dict(SCALES[scale])
+    workdir = Path(workdir or Path.cwd() / "benchmark_work")
+    if workdir.exists() and not keep:
+        shutil.rmtree(workdir)
+    server, stub_url = start_stub_providers()
+    prepare_environment(workdir, stub_url)
+    from config import CHUNK_SIZE, TOP_K
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "scale": scale,
+            "seed": seed,
+            "params": params | {"workers": workers, "index_type": index_type, "top_k": TOP_K},
+        },
+        "results": {},
+    }
+    stages = stages or ["corpus", "split_text", "ingestion", "build", "startup", "retrieval", "hybrid", "answers",
+                        "lab", "calculators"]
+    queries = generate_queries(params["queries"], seed)
+    docs_dir = workdir / "docs"
+    try:
+        for stage in stages:
+            print(f"[bench] {stage} ...", flush=True)
+            if stage == "corpus":
+                if keep and docs_dir.exists():
+                    continue
+                (docs, chars), elapsed = _timed(generate_corpus, docs_dir, params["chunks"], CHUNK_SIZE, seed=seed)
+                result = {"docs": docs, "chars": chars, "seconds": elapsed}
+            elif stage == "split_text":
+                result = bench_split_text(docs_dir)
+            elif stage == "ingestion":
+                result = bench_ingestion(workers)
+            elif stage == "build":
+                result = bench_build(workers, index_type)
+            elif stage == "startup":
+                result = bench_startup()
+            elif stage == "retrieval":
+                result = bench_retrieval(queries, TOP_K)
+            elif stage == "hybrid":
+                result = bench_hybrid(min(params["queries"], 500), TOP_K, seed)
+            elif stage == "answers":
+                result = bench_answers(queries[:200], TOP_K)
+            elif stage == "lab":
+                result = bench_lab(params["rows"], seed)
+            elif stage == "calculators":
+                result = bench_calculators(params["rows"], seed)
+            else:
+                raise ValueError(f"Unknown benchmark stage '{stage}'")
+            results["results"][stage] = result
+    finally:
+        server.shutdown()
+    results["meta"]["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+# ------------------------------
+# Reporting
+# ------------------------------
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+def compare(current, previous):
+    """Print metrics that exist in both runs with their relative change."""
+    now = _flatten("", current["results"], {})
+    before = _flatten("", previous["results"], {})
+    print(f"{'metric':<48}{'previous':>14}{'current':>14}{'change':>10}")
+    for key in sorted(now.keys() & before.keys()):
+        old, new = before[key], now[key]
+        change = f"{(new - old) / old:+.1%}" if old else "n/a"
+        print(f"{key:<48}{old:>14.4g}{new:>14.4g}{change:>10}")
+
+def print_summary(results):
+    for key, value in _flatten("", results["results"], {}).items():
+        print(f"{key:<48}{value:>14.4g}")
+    print(f"{'peak_rss_mb':<48}{results['meta']['peak_rss_mb'] or 0:>14.4g}")
+
+# ------------------------------
+# CLI: python -m modules.benchmark_suite
+# ------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark ingestion, startup, retrieval, answers, lab and calculators.")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--chunks", type=int, help="override the corpus size of the scale")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=0, help="extraction processes (0 = all cores)")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--stages", nargs="+", help="subset of stages to run")
+    parser.add_argument("--workdir", help="scratch directory (default ./benchmark_work)")
+    parser.add_argument("--keep", action="store_true", help="reuse an existing corpus in --workdir")
+    parser.add_argument("--out", default="benchmark_results.json", help="JSON file to write")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    if args.chunks:
+        SCALES[args.scale] = SCALES[args.scale] | {"chunks": args.chunks}
+    results = run_suite(args.scale, args.seed, args.workdir, args.workers, args.index_type, args.stages, args.keep)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print_summary(results)
+    print(f"Results written to {args.out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
@@ -1,91 +1,314 @@
 import os
-import pickle
+import json
+import hashlib
+import argparse
 from pathlib import Path
 
+import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
-from PyPDF2 import PdfReader
-import docx
 
-from config import DOCS_PATH, VECTOR_PATH, FAISS_INDEX_PATH, CHUNKS_FILE_PATH, CHUNK_SIZE, CHUNK_OVERLAP, DEBUG
+from config import (DOCS_PATH, VECTOR_PATH, FAISS_INDEX_PATH, CHUNK_STORE_PATH, MANIFEST_PATH, BM25_INDEX_PATH,
+                    CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER, CHUNK_MAX_TOKENS, CHUNK_DEDUP, CHUNK_SIMHASH_DISTANCE,
+                    EMBEDDING_MODEL, EMBED_BATCH_SIZE, INGEST_WORKERS, INDEX_TRAIN_SAMPLE, DEBUG)
+from modules.chunk_store import ChunkStore, ChunkStoreWriter, open_chunk_store
+from modules.chunking import ChunkDeduplicator, iter_text_spans, make_chunker
+from modules.encoders import encoder_id, load_encoder
+from modules.ingest import SUPPORTED_SUFFIXES, IngestStats, iter_extracted
+from modules.lexical_index import build_lexical_index
+from modules.vector_index import INDEX_STORAGES, INDEX_TYPES, build_params, create_index, needs_training, remove_ids
 
-# ------------------------------
-# Load documents from pdf, txt, docx
-# ------------------------------
-def load_documents():
-    documents = []
-    for file in DOCS_PATH.iterdir():
-        try:
-            if file.suffix.lower() == ".pdf":
-                reader = PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() or ""
-                if text.strip():
-                    documents.append(text)
-            elif file.suffix.lower() == ".txt":
-                with open(file, "r", encoding="utf-8") as f:
-                    text = f.read()
-                    if text.strip():
-                        documents.append(text)
-            elif file.suffix.lower() == ".docx":
-                doc = docx.Document(file)
-                text = "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
-                if text.strip():
-                    documents.append(text)
-        except Exception as e:
-            if DEBUG:
-                print(f"Error reading {file.name}: {e}")
-    if DEBUG:
-        print(f"Loaded {len(documents)} documents from {DOCS_PATH}")
-    return documents
+MANIFEST_VERSION = 2
+
+def list_document_files():
+    return sorted(
+        file for file in DOCS_PATH.iterdir()
+        if file.is_file() and file.suffix.lower() in SUPPORTED_SUFFIXES
+    )
 
 # ------------------------------
 # Split text into chunks
 # ------------------------------
 def split_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        start += chunk_size - overlap
-    return chunks
+    return [chunk for _, _, chunk in iter_text_spans(text, chunk_size, overlap)]
+
+# ------------------------------
+# Stream chunks from documents
+# ------------------------------
+def iter_document_chunks(files, workers=INGEST_WORKERS, stats=None, chunker=None):
+    """
+    Yield chunk records for `files` as pages are extracted in parallel.
+
+    Records are dicts with source, page, start, end and text, where start/end
+    are character offsets into the page; once a file has been fully extracted
+    a {"source": name, "done": True} marker follows. `chunker` defaults to
+    the configured one (see modules.chunking.make_chunker).
+    """
+    chunker = chunker or make_chunker()
+    for path, page, text in iter_extracted(files, workers, stats):
+        if text is None:
+            yield {"source": path.name, "done": True}
+            continue
+        if not text.strip():
+            continue
+        for start, end, chunk in chunker(text):
+            if stats is not None:
+                stats.chunks += 1
+            yield {"source": path.name, "page": page, "start": start, "end": end, "text": chunk}
+
+# ------------------------------
+# Streaming index appends
+# ------------------------------
+class IndexAppender:
+    """
+    Adds embedding batches to the index as they are produced.
+
+    A missing index is created from the first batch; IVF and int8 indexes
+    need training, so their batches are buffered until `train_sample` vectors
+    are available (or the stream ends) and the index is trained on those.
+    """
+
+    def __init__(self, index=None, index_params=None):
+        self.index = index
+        self.index_params = index_params
+        self.train_sample = {"train_sample": INDEX_TRAIN_SAMPLE, **(index_params or {})}["train_sample"]
+        self._pending = []
+
+    def add(self, embeddings, ids):
+        if self.index is None and needs_training(self.index_params):
+            self._pending.append((embeddings, ids))
+            if sum(len(batch) for batch, _ in self._pending) >= self.train_sample:
+                self._create_from_pending()
+            return
+        if self.index is None:
+            self._create(embeddings)
+        self.index.add_with_ids(embeddings, ids)
+
+    def _create(self, training):
+        self.index, index_type = create_index(training, self.index_params)
+        print(f"Created {index_type} index")
+
+    def _create_from_pending(self):
+        self._create(np.vstack([batch for batch, _ in self._pending]))
+        for embeddings, ids in self._pending:
+            self.index.add_with_ids(embeddings, ids)
+        self._pending = []
+
+    def finish(self):
+        if self._pending:
+            self._create_from_pending()
+        return self.index
+
+def file_sha256(file):
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _build_settings(index_params=None):
+    """Settings that invalidate every stored chunk when they change."""
+    return {"model": encoder_id(EMBEDDING_MODEL), "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP,
+            "chunker": CHUNKER, "chunk_max_tokens": CHUNK_MAX_TOKENS,
+            "dedup": CHUNK_DEDUP, "simhash_distance": CHUNK_SIMHASH_DISTANCE,
+            "index": build_params(index_params)}
+
+def new_manifest(index_params=None):
+    return {"version": MANIFEST_VERSION, "settings": _build_settings(index_params), "next_id": 0, "documents": {}}
+
+def load_manifest(index_params=None):
+    if not MANIFEST_PATH.exists():
+        return None
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("settings") != _build_settings(index_params):
+        return None
+    return manifest
+
+def _atomic_write(path, write):
+    tmp_path = Path(f"{path}.tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def save_index(index, manifest):
+    VECTOR_PATH.mkdir(parents=True, exist_ok=True)
+    _atomic_write(FAISS_INDEX_PATH, lambda p: faiss.write_index(index, str(p)))
+
+    def write_manifest(p):
+        with open(p, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+    _atomic_write(MANIFEST_PATH, write_manifest)
+
+def _load_existing_store(manifest):
+    """Return (index, chunk store) from disk if they match the manifest, else None."""
+    if manifest is None or not FAISS_INDEX_PATH.exists():
+        return None
+    try:
+        index = faiss.read_index(str(FAISS_INDEX_PATH))
+        store = open_chunk_store(CHUNK_STORE_PATH)
+    except Exception as e:
+        if DEBUG:
+            print(f"[DEBUG] Existing FAISS store unreadable, rebuilding: {e}")
+        return None
+    if not isinstance(index, (faiss.IndexIDMap, faiss.IndexIVF)) or store is None:
+        return None
+    return index, store
 
 # ------------------------------
 # Build FAISS index
 # ------------------------------
-def build_faiss_index():
-    documents = load_documents()
-    all_chunks = []
-    for doc in documents:
-        all_chunks.extend(split_text(doc))
-    
-    if not all_chunks:
-        print("No documents found to build FAISS index.")
+def build_faiss_index(full=False, index_params=None, workers=INGEST_WORKERS):
+    """
+    Embed new or changed documents and drop chunks of deleted ones.
+
+    Each document is tracked in the manifest by content hash together with the
+    IDs of its chunks in the ID-mapped index, so unchanged files are neither
+    re-extracted nor re-embedded. `full=True` rebuilds everything from scratch.
+
+    `index_params` overrides the INDEX_* config (index_type, nlist, pq_m, ...).
+    IVF indexes are trained on the first build only; run with `full=True`
+    after large corpus changes to retrain the coarse quantizer.
+
+    Files are extracted in `workers` processes and embedded in batches of
+    EMBED_BATCH_SIZE that are added to the index as they complete.
+
+    Chunks that repeat one already in the store (exact or near duplicate,
+    see CHUNK_DEDUP) are not embedded. The manifest keeps each document's
+    chunk fingerprints, and the documents that held the copies its duplicates
+    were dropped in favour of; those documents are re-ingested when the copy
+    goes away. Returns the ingestion summary, or None if nothing changed.
+
+    The BM25 index used by lexical and hybrid retrieval is rebuilt from the
+    final chunk store on every build; that costs tokenizing the stored
+    chunks, far less than embedding them.
+    """
+    manifest = None if full else load_manifest(index_params)
+    existing = None if full else _load_existing_store(manifest)
+    if existing is None:
+        manifest = new_manifest(index_params)
+        index, old_store = None, None
+    else:
+        index, old_store = existing
+
+    files = {file.name: file for file in list_document_files()}
+    hashes = {name: file_sha256(file) for name, file in files.items()}
+    documents = manifest["documents"]
+
+    removed = [name for name in documents if name not in files]
+    changed = [name for name in files if documents.get(name, {}).get("sha256") != hashes[name]]
+    # Re-ingest documents whose dropped duplicates pointed at a removed or changed copy
+    while True:
+        invalid = set(removed) | set(changed)
+        dependents = [name for name in files if name not in invalid
+                      and invalid.intersection(documents.get(name, {}).get("duplicates_of", []))]
+        if not dependents:
+            break
+        changed += dependents
+    print(f"Documents: {len(files)} total, {len(changed)} new/changed, {len(removed)} removed")
+
+    if not (changed or removed) and existing is not None:
+        if not BM25_INDEX_PATH.exists():
+            build_lexical_index(old_store, BM25_INDEX_PATH)
+            print("BM25 index built.")
+        print("FAISS index is up to date.")
         return
 
-    # Embeddings
-    print("Generating embeddings...")
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    embeddings = model.encode(all_chunks, show_progress_bar=True)
-    embeddings = embeddings.astype("float32")
+    # Drop chunks of deleted and modified documents
+    stale_ids = [cid for name in removed + changed for cid in documents.get(name, {}).get("chunk_ids", [])]
+    if stale_ids and index is not None:
+        index = remove_ids(index, stale_ids, index_params)
+    for name in removed:
+        del documents[name]
+
+    writer = ChunkStoreWriter(CHUNK_STORE_PATH)
+    if old_store is not None:
+        kept = [cid for name, doc in documents.items() if name not in changed for cid in doc["chunk_ids"]]
+        writer.copy_from(old_store, kept)
+
+    # Extract, chunk and embed new or modified documents as a stream
+    for name in changed:
+        # sha256 stays None until the file is fully ingested, so failures are retried
+        documents[name] = {"sha256": None, "chunk_ids": [], "fingerprints": [], "duplicates_of": []}
+
+    dedup = ChunkDeduplicator(CHUNK_DEDUP, CHUNK_SIMHASH_DISTANCE)
+    for name, doc in documents.items():
+        if name not in changed:
+            for fp in doc.get("fingerprints", []):
+                dedup.add(tuple(fp), name)
+
+    stats = IngestStats()
+    appender = IndexAppender(index, index_params)
+    # The encoder is loaded up front: the sentence chunker sizes chunks with its tokenizer
+    model = load_encoder(EMBEDDING_MODEL) if changed else None
+    chunker = make_chunker(model)
+    batch_texts, batch_ids = [], []
 
-    # Build FAISS index
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(embeddings)
+    def embed_batch():
+        embeddings = model.encode(batch_texts, batch_size=EMBED_BATCH_SIZE).astype("float32")
+        appender.add(embeddings, np.array(batch_ids, dtype="int64"))
+        stats.embedded += len(batch_ids)
+        batch_texts.clear()
+        batch_ids.clear()
+
+    for record in iter_document_chunks([files[name] for name in changed], workers, stats, chunker):
+        doc = documents[record["source"]]
+        if record.get("done"):
+            doc["sha256"] = hashes[record["source"]]
+            continue
+        fp, duplicate = dedup.check(record["text"], record["source"])
+        if duplicate is not None:
+            stats.duplicates += 1
+            if duplicate[1] != record["source"] and duplicate[1] not in doc["duplicates_of"]:
+                doc["duplicates_of"].append(duplicate[1])
+            continue
+        cid = manifest["next_id"]
+        manifest["next_id"] += 1
+        doc["chunk_ids"].append(cid)
+        if fp is not None:
+            doc["fingerprints"].append(list(fp))
+        writer.add(cid, record["text"], source=record["source"], page=record["page"],
+                   start=record["start"], end=record["end"])
+        batch_texts.append(record["text"])
+        batch_ids.append(cid)
+        if len(batch_texts) >= EMBED_BATCH_SIZE:
+            embed_batch()
+        stats.progress()
+
+    if batch_texts:
+        embed_batch()
+    index = appender.finish()
+    if changed:
+        stats.report()
+
+    if index is None:
+        writer.discard()
+        print("No documents found to build FAISS index.")
+        return
 
-    # Save index and chunks
-    faiss.write_index(index, str(FAISS_INDEX_PATH))
-    with open(CHUNKS_FILE_PATH, "wb") as f:
-        pickle.dump(all_chunks, f)
-    
-    print(f"FAISS index and chunks saved successfully! Total chunks: {len(all_chunks)}")
+    # The manifest is written last so an interrupted build is redone next run
+    total = writer.close()
+    lexical = build_lexical_index(ChunkStore(CHUNK_STORE_PATH), BM25_INDEX_PATH)
+    save_index(index, manifest)
+    summary = stats.summary()
+    print(f"FAISS index and chunks saved successfully! Total chunks: {total} "
+          f"({summary['duplicates']} duplicates skipped, dedup ratio {summary['dedup_ratio']:.1%}), "
+          f"BM25 terms: {lexical['terms']}")
+    return summary
 
 # ------------------------------
 # Run
 # ------------------------------
 if __name__ == "__main__":
-    build_faiss_index()
+    parser = argparse.ArgumentParser(description="Build or update the FAISS vector store.")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and rebuild from scratch")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, help="override INDEX_TYPE")
+    parser.add_argument("--storage", choices=INDEX_STORAGES, help="override INDEX_STORAGE (flat, ivf_flat, hnsw)")
+    parser.add_argument("--nlist", type=int, help="IVF: number of coarse centroids")
+    parser.add_argument("--pq-m", type=int, help="IVF-PQ: number of sub-quantizers")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW: graph neighbours per node")
+    parser.add_argument("--ef-construction", type=int, help="HNSW: build-time candidate list size")
+    parser.add_argument("--train-sample", type=int, help="IVF/int8: maximum number of training vectors")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="extraction processes (0 = all cores)")
+    args = parser.parse_args()
+    overrides = {key: value for key, value in vars(args).items()
+                 if key not in ("full", "workers") and value is not None}
+    build_faiss_index(full=args.full, index_params=overrides, workers=args.workers)
@@ -109,6 +109,36 @@ def calculators_ui():
         ph = ph_calculator(h_conc)
         st.success(f"pH: {ph}")
 
+    batch_calculators_ui()
+
+def batch_calculators_ui():
+    """Run the calculators over an uploaded CSV/Parquet census or cohort."""
+    st.subheader("Batch Calculation (CSV / Parquet)")
+    st.caption("Columns: weight_kg, height_m or height_cm, creatinine, age, sex, race, "
+               "volume_ml, time_min, drop_factor, solute_meq, solvent_l, h_concentration")
+    uploaded = st.file_uploader("Upload patient table:", type=["csv", "parquet"], key="batch_calc_file")
+    if uploaded is None:
+        return
+    import pandas as pd
+    from modules.batch_calculators import available_calculators, compute_dataframe
+
+    if uploaded.name.lower().endswith(".parquet"):
+        df = pd.read_parquet(uploaded)
+    else:
+        df = pd.read_csv(uploaded)
+    options = available_calculators(df.columns)
+    if not options:
+        st.warning("No calculator inputs found in the uploaded columns.")
+        return
+    selected = st.multiselect("Calculators:", options, default=options)
+    if st.button("Run Batch Calculation") and selected:
+        result = compute_dataframe(df, selected)
+        invalid = int(result[selected].isna().any(axis=1).sum())
+        st.success(f"Computed {len(result)} rows ({invalid} with invalid inputs left blank)")
+        st.dataframe(result.head(100))
+        st.download_button("Download Results (CSV)", result.to_csv(index=False).encode("utf-8"),
+                           file_name="calculator_results.csv", mime="text/csv")
+
 # ------------------------------
 # Direct run
 # ------------------------------
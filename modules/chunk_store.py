@@ -0,0 +1,212 @@
+# modules/chunk_store.py
+import os
+import io
+import json
+import mmap
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# ------------------------------
+# File layout
+# ------------------------------
+# A chunk store is a single file so it can be replaced atomically:
+#
+#   magic (8 bytes) | header length (uint32) | JSON header | padding
+#   | entry table (ENTRY_DTYPE, sorted by id) | UTF-8 text blob
+#
+# The file is opened with mmap, so the entry table is a zero-copy numpy view,
+# pages are shared between processes, and only the requested chunks are decoded.
+MAGIC = b"HC360CS1"
+ENTRY_DTYPE = np.dtype([
+    ("id", "<i8"),
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("source", "<i4"),   # index into header["sources"], -1 if unknown
+    ("page", "<i4"),     # 0-based page number, -1 if unknown
+    ("start", "<i8"),    # character span in the source document, -1 if unknown
+    ("end", "<i8"),
+])
+_ALIGN = 8
+
+def _aligned(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+# ------------------------------
+# Reader
+# ------------------------------
+class ChunkStore:
+    """Read-only, memory-mapped view of a chunk store file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a chunk store")
+        (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(self._mm[header_start:header_start + header_len].decode("utf-8"))
+        self.sources = header["sources"]
+        self._entries = np.frombuffer(self._mm, dtype=ENTRY_DTYPE, count=header["count"],
+                                      offset=header["entries_offset"])
+        self._blob_offset = header["blob_offset"]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, chunk_id):
+        return self._row(chunk_id) is not None
+
+    @property
+    def ids(self):
+        return self._entries["id"]
+
+    def _row(self, chunk_id):
+        row = int(np.searchsorted(self._entries["id"], chunk_id))
+        if row < len(self._entries) and self._entries["id"][row] == chunk_id:
+            return row
+        return None
+
+    def _text(self, row):
+        entry = self._entries[row]
+        start = self._blob_offset + int(entry["offset"])
+        return self._mm[start:start + int(entry["length"])].decode("utf-8")
+
+    def _raw(self, row):
+        entry = self._entries[row]
+        start = self._blob_offset + int(entry["offset"])
+        return self._mm[start:start + int(entry["length"])]
+
+    def get(self, chunk_id):
+        """Text of one chunk, or None if the id is unknown."""
+        row = self._row(chunk_id)
+        return None if row is None else self._text(row)
+
+    def get_many(self, chunk_ids):
+        """Texts for `chunk_ids` in order; unknown ids give None."""
+        return [self.get(int(chunk_id)) for chunk_id in chunk_ids]
+
+    def metadata(self, chunk_id):
+        row = self._row(chunk_id)
+        if row is None:
+            return None
+        entry = self._entries[row]
+        source = int(entry["source"])
+        return {
+            "id": int(entry["id"]),
+            "source": self.sources[source] if source >= 0 else None,
+            "page": int(entry["page"]) if entry["page"] >= 0 else None,
+            "start": int(entry["start"]) if entry["start"] >= 0 else None,
+            "end": int(entry["end"]) if entry["end"] >= 0 else None,
+        }
+
+    def iter_texts(self):
+        for row in range(len(self._entries)):
+            yield int(self._entries["id"][row]), self._text(row)
+
+def open_chunk_store(path):
+    """Open the chunk store at `path`, or return None if it does not exist."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    return ChunkStore(path)
+
+# ------------------------------
+# Writer
+# ------------------------------
+class ChunkStoreWriter:
+    """
+    Streams chunks into a new chunk store file.
+
+    Text is appended to a temporary blob as it arrives; `close()` writes the
+    sorted entry table and blob to `path` and swaps it in atomically.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._blob = tempfile.TemporaryFile(dir=self.path.parent)
+        self._entries = []
+        self._sources = {}
+        self._size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _source_index(self, source):
+        if source is None:
+            return -1
+        return self._sources.setdefault(source, len(self._sources))
+
+    def _append(self, chunk_id, data, source, page, start, end):
+        self._entries.append((chunk_id, self._size, len(data), self._source_index(source),
+                              -1 if page is None else page,
+                              -1 if start is None else start,
+                              -1 if end is None else end))
+        self._blob.write(data)
+        self._size += len(data)
+
+    def add(self, chunk_id, text, source=None, page=None, start=None, end=None):
+        self._append(int(chunk_id), text.encode("utf-8"), source, page, start, end)
+
+    def copy_from(self, store, chunk_ids):
+        """Carry chunks over from an existing store without decoding them."""
+        for chunk_id in chunk_ids:
+            row = store._row(chunk_id)
+            if row is None:
+                continue
+            meta = store.metadata(chunk_id)
+            self._append(int(chunk_id), store._raw(row), meta["source"], meta["page"],
+                         meta["start"], meta["end"])
+
+    def discard(self):
+        """Drop everything written so far; the store on disk is left untouched."""
+        self._blob.close()
+        self._entries = []
+
+    def close(self):
+        entries = np.array(self._entries, dtype=ENTRY_DTYPE)
+        entries.sort(order="id")
+        if len(entries) > 1 and (np.diff(entries["id"]) == 0).any():
+            raise ValueError("Duplicate chunk ids in chunk store")
+
+        sources = [None] * len(self._sources)
+        for source, i in self._sources.items():
+            sources[i] = source
+
+        # Header offsets depend on the header's own length; iterate until stable
+        header = {"count": len(entries), "sources": sources, "entries_offset": 0, "blob_offset": 0}
+        while True:
+            header_bytes = json.dumps(header).encode("utf-8")
+            entries_offset = _aligned(len(MAGIC) + 4 + len(header_bytes))
+            blob_offset = _aligned(entries_offset + entries.nbytes)
+            if (entries_offset, blob_offset) == (header["entries_offset"], header["blob_offset"]):
+                break
+            header["entries_offset"], header["blob_offset"] = entries_offset, blob_offset
+
+        tmp_path = Path(f"{self.path}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b"\0" * (header["entries_offset"] - f.tell()))
+            f.write(entries.tobytes())
+            f.write(b"\0" * (header["blob_offset"] - f.tell()))
+            self._blob.seek(0)
+            shutil.copyfileobj(self._blob, f, length=io.DEFAULT_BUFFER_SIZE * 64)
+        self._blob.close()
+        os.replace(tmp_path, self.path)
+        return len(entries)
@@ -0,0 +1,268 @@
+# modules/chunking.py
+import re
+import hashlib
+
+import numpy as np
+
+from config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER, CHUNK_MAX_TOKENS, CHUNK_DEDUP, CHUNK_SIMHASH_DISTANCE
+
+# ------------------------------
+# Fixed character windows
+# ------------------------------
+def iter_text_spans(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Yield (start, end, chunk) character windows over `text`."""
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        yield start, min(end, len(text)), text[start:end]
+        start += chunk_size - overlap
+
+# ------------------------------
+# Sentence spans
+# ------------------------------
+# A sentence ends at . ! or ? (plus closing quotes/brackets) followed by
+# whitespace that is not continued in lower case, or at a blank line
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+(?![a-z])|\n[ \t]*\n\s*')
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_WORD = re.compile(r"\S+")
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+def _trimmed(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def iter_sentence_spans(text):
+    """Yield (start, end) of each sentence of `text`, surrounding whitespace excluded."""
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        span = _trimmed(text, start, match.end())
+        if span[0] < span[1]:
+            yield span
+        start = match.end()
+    span = _trimmed(text, start, len(text))
+    if span[0] < span[1]:
+        yield span
+
+# ------------------------------
+# Token counting
+# ------------------------------
+def approx_token_count(texts):
+    """Rough subword counts: words and punctuation, or a token per 4 characters if that is more."""
+    return [max(len(_TOKEN.findall(text)), len(text) // 4) for text in texts]
+
+def encoder_token_counter(model):
+    """Exact token counts from the encoder's tokenizer, falling back to `approx_token_count`."""
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return approx_token_count
+
+    def count(texts):
+        encoded = tokenizer(list(texts), add_special_tokens=False, verbose=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+    return count
+
+def encoder_max_tokens(model):
+    """Longest input the encoder embeds without truncation, less [CLS]/[SEP]."""
+    max_length = getattr(model, "max_seq_length", None)
+    return max_length - 2 if max_length else None
+
+# ------------------------------
+# Sentence-aware chunker
+# ------------------------------
+class SentenceChunker:
+    """
+    Packs whole sentences into chunks of at most `max_chars` characters and
+    `max_tokens` encoder tokens, so no chunk is cut mid-sentence or
+    truncated by the encoder.
+
+    A sentence that alone exceeds a limit is cut at word boundaries. Chunks
+    never run across a paragraph break, and consecutive chunks of one
+    paragraph share trailing sentences totalling at most `overlap`
+    characters; a paragraph's first chunk starts with no overlap, so a
+    repeated boilerplate paragraph always gives the same chunks. Token
+    counts are computed once per sentence, in one `count_tokens` call per text.
+    """
+
+    def __init__(self, max_chars=CHUNK_SIZE, overlap=CHUNK_OVERLAP, max_tokens=None,
+                 count_tokens=approx_token_count):
+        self.max_chars = max_chars
+        self.overlap = overlap
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens
+
+    def _units(self, text):
+        """
+        (start, end, tokens, new_paragraph) of each sentence, with oversized
+        sentences pre-split at words.
+        """
+        spans = list(iter_sentence_spans(text))
+        if self.max_tokens:
+            tokens = self.count_tokens([text[start:end] for start, end in spans])
+        else:
+            tokens = [0] * len(spans)
+        previous_end = 0
+        for (start, end), n_tokens in zip(spans, tokens):
+            new_paragraph = _PARAGRAPH_BREAK.search(text, previous_end, start) is not None
+            previous_end = end
+            if end - start <= self.max_chars and (not self.max_tokens or n_tokens <= self.max_tokens):
+                yield start, end, n_tokens, new_paragraph
+                continue
+            # Token cost of a piece is estimated from the sentence's tokens per character
+            per_char = n_tokens / (end - start)
+            piece_start = piece_end = None
+            for word in _WORD.finditer(text, start, end):
+                if piece_start is not None and (
+                        word.end() - piece_start > self.max_chars
+                        or (self.max_tokens and (word.end() - piece_start) * per_char > self.max_tokens)):
+                    yield piece_start, piece_end, round((piece_end - piece_start) * per_char), new_paragraph
+                    piece_start, new_paragraph = None, False
+                if piece_start is None:
+                    piece_start = word.start()
+                piece_end = word.end()
+            if piece_start is not None:
+                yield piece_start, piece_end, round((piece_end - piece_start) * per_char), new_paragraph
+
+    def spans(self, text):
+        """Yield (start, end, chunk) with `start`/`end` offsets into `text`."""
+        units = list(self._units(text))
+        i = 0
+        while i < len(units):
+            j, tokens = i + 1, units[i][2]
+            while j < len(units):
+                if units[j][1] - units[i][0] > self.max_chars:
+                    break
+                if units[j][3]:
+                    break
+                if self.max_tokens and tokens + units[j][2] > self.max_tokens:
+                    break
+                tokens += units[j][2]
+                j += 1
+            start, end = units[i][0], units[j - 1][1]
+            yield start, end, text[start:end]
+            if j >= len(units):
+                break
+            # Step back over trailing sentences that fit the overlap, always moving
+            # forward and never back into the previous paragraph
+            k = j
+            while k - 1 > i and not units[k][3] and end - units[k - 1][0] <= self.overlap:
+                k -= 1
+            i = k
+
+    __call__ = spans
+
+def make_chunker(model=None, kind=CHUNKER, max_tokens=CHUNK_MAX_TOKENS):
+    """
+    The configured chunking function: text -> iterator of (start, end, chunk).
+
+    "sentence" chunks are limited to `max_tokens`, or to the encoder's max
+    sequence length when that is 0 and `model` is given.
+    """
+    if kind == "fixed":
+        return iter_text_spans
+    if kind != "sentence":
+        raise ValueError(f"Unknown chunker '{kind}'")
+    if model is not None:
+        return SentenceChunker(max_tokens=max_tokens or encoder_max_tokens(model),
+                               count_tokens=encoder_token_counter(model))
+    return SentenceChunker(max_tokens=max_tokens or None)
+
+# ------------------------------
+# Duplicate detection
+# ------------------------------
+_BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+def simhash(words, shingle=3):
+    """64-bit SimHash of a word sequence over `shingle`-word shingles."""
+    shingles = [" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles), dtype="<u8")
+    votes = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).sum(axis=0)
+    return sum(1 << int(bit) for bit in np.flatnonzero(votes * 2 > len(hashes)))
+
+def fingerprint(text, near=True):
+    """(exact hash of the normalized text, SimHash or None) for a chunk."""
+    words = _words(text)
+    return _hash64(" ".join(words)), (simhash(words) if near and words else None)
+
+class ChunkDeduplicator:
+    """
+    Remembers the chunks seen so far and flags repeats before they are embedded.
+
+    Exact duplicates are matched on a hash of the lower-cased words, so
+    whitespace and punctuation differences do not matter. Near duplicates
+    (boilerplate with a changed date or page number) are chunks whose
+    SimHash differs in at most `max_distance` bits; the fingerprint is split
+    into max_distance + 1 bands, and any such pair agrees on at least one band.
+    """
+
+    def __init__(self, mode=CHUNK_DEDUP, max_distance=CHUNK_SIMHASH_DISTANCE):
+        if mode not in ("off", "exact", "near"):
+            raise ValueError(f"Unknown dedup mode '{mode}'")
+        self.mode = mode
+        self.max_distance = max_distance
+        bounds = np.linspace(0, 64, max_distance + 2).astype(int)
+        self._bands = [(int(lo), (1 << int(hi - lo)) - 1) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self._exact = {}
+        self._near = [{} for _ in self._bands]
+        self.checked = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def fingerprint(self, text):
+        return fingerprint(text, near=self.mode == "near")
+
+    def add(self, fp, source=None):
+        """Remember a chunk fingerprint (e.g. one already stored in the index)."""
+        exact, near = fp
+        self._exact.setdefault(exact, source)
+        if near is not None:
+            for table, (shift, mask) in zip(self._near, self._bands):
+                table.setdefault((near >> shift) & mask, []).append((near, source))
+
+    def find(self, fp):
+        """Source of an earlier copy of this chunk as (kind, source), or None."""
+        exact, near = fp
+        if exact in self._exact:
+            return "exact", self._exact[exact]
+        if near is not None:
+            for table, (shift, mask) in zip(self._near, self._bands):
+                for other, source in table.get((near >> shift) & mask, ()):
+                    if bin(near ^ other).count("1") <= self.max_distance:
+                        return "near", source
+        return None
+
+    def check(self, text, source=None):
+        """
+        Return (fingerprint, duplicate) for a new chunk; `duplicate` is the
+        (kind, source) of an earlier copy, or None and the chunk is remembered.
+        """
+        self.checked += 1
+        if self.mode == "off":
+            return None, None
+        fp = self.fingerprint(text)
+        duplicate = self.find(fp)
+        if duplicate is None:
+            self.add(fp, source)
+        elif duplicate[0] == "exact":
+            self.exact_duplicates += 1
+        else:
+            self.near_duplicates += 1
+        return fp, duplicate
+
+    def stats(self):
+        duplicates = self.exact_duplicates + self.near_duplicates
+        return {
+            "checked": self.checked,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "dedup_ratio": duplicates / self.checked if self.checked else 0.0,
+        }
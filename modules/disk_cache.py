@@ -0,0 +1,153 @@
+# modules/disk_cache.py
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+# ------------------------------
+# SQLite-backed key/value cache
+# ------------------------------
+class DiskCache:
+    """
+    Persistent key/value cache in a SQLite file, shared across processes.
+
+    Entries expire after `ttl` seconds; once the stored values exceed
+    `max_bytes`, least recently used entries are evicted. Hit/miss counters
+    and bytes served from cache are kept in the same file so they survive
+    restarts. A lookup is a plain read: counters and access times are
+    buffered in memory and written in one transaction every
+    `_FLUSH_EVERY` lookups or `_FLUSH_INTERVAL` seconds, and before
+    `evict` and `stats`. SQLite errors propagate; callers decide how to degrade.
+    """
+
+    _EVICT_EVERY = 50
+    _FLUSH_EVERY = 200
+    _FLUSH_INTERVAL = 5.0
+
+    def __init__(self, path, ttl=None, max_bytes=256 << 20):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._pending_lock = threading.Lock()
+        self._pending_counts = {}
+        self._pending_accessed = {}
+        self._pending_lookups = 0
+        self._last_flush = time.monotonic()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, conn, **increments):
+        for name, value in increments.items():
+            conn.execute(
+                "INSERT INTO counters(name, value) VALUES (?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, value),
+            )
+
+    def get(self, key):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None and self.ttl and now - row[1] > self.ttl:
+            with conn:
+                conn.execute("DELETE FROM entries WHERE key = ? AND created = ?", (key, row[1]))
+            row = None
+        if row is None:
+            self._record(misses=1)
+            return None
+        self._record(key, now, hits=1, bytes_saved=len(row[0]))
+        return bytes(row[0])
+
+    def _record(self, key=None, accessed=None, **increments):
+        """Buffer a lookup's counters and access time; flush when enough are pending."""
+        with self._pending_lock:
+            for name, value in increments.items():
+                self._pending_counts[name] = self._pending_counts.get(name, 0) + value
+            if key is not None:
+                self._pending_accessed[key] = accessed
+            self._pending_lookups += 1
+            due = (self._pending_lookups >= self._FLUSH_EVERY
+                   or time.monotonic() - self._last_flush >= self._FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered counters and access times in one transaction."""
+        with self._pending_lock:
+            counts, accessed = self._pending_counts, self._pending_accessed
+            self._pending_counts, self._pending_accessed = {}, {}
+            self._pending_lookups = 0
+            self._last_flush = time.monotonic()
+        if not counts and not accessed:
+            return
+        with self._conn() as conn:
+            conn.executemany("UPDATE entries SET accessed = ? WHERE key = ? AND accessed < ?",
+                             [(when, key, when) for key, when in accessed.items()])
+            self._count(conn, **counts)
+
+    def set(self, key, value: bytes):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries(key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), now, now),
+            )
+        self._writes += 1
+        if self._writes % self._EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under `max_bytes`."""
+        self.flush()
+        with self._conn() as conn:
+            if self.ttl:
+                conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            freed = 0
+            doomed = []
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+                if total - freed <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                freed += size
+            conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+            self._count(conn, evictions=len(doomed))
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entries")
+
+    def stats(self):
+        self.flush()
+        with self._conn() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "bytes_saved": counters.get("bytes_saved", 0),
+            "hit_rate": hits / (hits + misses) if hits + misses else None,
+        }
@@ -0,0 +1,167 @@
+# modules/document_query.py
+import os
+import atexit
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from config import (DEBUG, UPLOAD_WORKERS, UPLOAD_PDF_PAGES_PER_TASK, UPLOAD_MAX_CHUNKS, UPLOAD_HITS_PER_CHUNK,
+                    UPLOAD_CONTEXT_CHUNKS, UPLOAD_CONTEXT_CHARS)
+from modules.chunking import make_chunker
+from modules.ingest import SUPPORTED_SUFFIXES, IngestStats, iter_extracted
+from modules.metrics import span
+from modules.rag_engine import RRF_K, get_engine
+
+# ------------------------------
+# Extraction
+# ------------------------------
+_UPLOAD_POOL = None
+_UPLOAD_POOL_LOCK = threading.Lock()
+
+def _get_upload_pool(workers: int):
+    """
+    Process-wide extraction pool, created on first use and kept for later uploads.
+
+    Workers are spawned rather than forked: the app process runs Streamlit's
+    threads, and a fork copies whatever locks they hold at that moment. A
+    pool broken by a crashed worker is replaced.
+    """
+    global _UPLOAD_POOL
+    if _UPLOAD_POOL is None or _UPLOAD_POOL._broken:
+        with _UPLOAD_POOL_LOCK:
+            if _UPLOAD_POOL is None or _UPLOAD_POOL._broken:
+                _UPLOAD_POOL = ProcessPoolExecutor(max_workers=workers,
+                                                   mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(_UPLOAD_POOL.shutdown, cancel_futures=True)
+    return _UPLOAD_POOL
+
+def extract_upload(data: bytes, filename: str, workers: int = UPLOAD_WORKERS):
+    """
+    Extract an uploaded PDF/DOCX/TXT as a list of (page, text) in page order.
+
+    Large PDFs are split into page ranges extracted in parallel by a
+    long-lived pool of spawned worker processes. The upload is written to a
+    temporary directory that is removed before returning.
+    """
+    suffix = Path(filename).suffix.lower()
+    if suffix not in SUPPORTED_SUFFIXES:
+        raise ValueError(f"Unsupported file type '{suffix}'")
+    stats = IngestStats(report_every=float("inf"))
+    workers = workers or os.cpu_count() or 1
+    pool = _get_upload_pool(workers) if workers > 1 else None
+    with tempfile.TemporaryDirectory(prefix="hc360_upload_") as tmp_dir:
+        path = Path(tmp_dir) / f"upload{suffix}"
+        path.write_bytes(data)
+        pages = [(page, text) for _, page, text in
+                 iter_extracted([path], workers, stats, UPLOAD_PDF_PAGES_PER_TASK, pool) if text is not None]
+    if stats.errors:
+        raise ValueError("; ".join(message for messages in stats.errors.values() for message in messages))
+    return sorted(pages, key=lambda item: item[0] or 0)
+
+# ------------------------------
+# Map: chunk and search
+# ------------------------------
+def chunk_document(pages, max_chunks: int = UPLOAD_MAX_CHUNKS, model=None):
+    """
+    Sentence-aligned chunks of the document as {"page", "start", "end", "text"} dicts.
+
+    Documents with more than `max_chunks` chunks are sampled evenly, so
+    very large uploads still cost a bounded number of encoder passes.
+    """
+    chunker = make_chunker(model)
+    chunks = [{"page": page, "start": start, "end": end, "text": text}
+              for page, page_text in pages for start, end, text in chunker(page_text)]
+    if len(chunks) > max_chunks:
+        step = len(chunks) / max_chunks
+        chunks = [chunks[int(i * step)] for i in range(max_chunks)]
+    return chunks
+
+def search_document(chunks, hits_per_chunk: int = UPLOAD_HITS_PER_CHUNK, engine=None):
+    """Hits of every document chunk: one batched encode and one index search for the whole upload."""
+    engine = engine or get_engine()
+    with span("upload_search", chunks=len(chunks)):
+        return engine.search_batch([chunk["text"] for chunk in chunks], top_k=hits_per_chunk)
+
+# ------------------------------
+# Reduce: merge and rank
+# ------------------------------
+def merge_hits(per_chunk_hits, limit: int = UPLOAD_CONTEXT_CHUNKS, max_chars: int = UPLOAD_CONTEXT_CHARS):
+    """
+    Merge the hits of all document chunks into one ranked, bounded list.
+
+    Hits are deduplicated by chunk id and by text; each scores the sum of
+    1 / (RRF_K + rank) over the document chunks that retrieved it, so
+    passages relevant to many parts of the document come first. Returns
+    hit dicts with `score`, `support` (number of document chunks) and the
+    indexes of those chunks, totalling at most `limit` hits and `max_chars`.
+    """
+    merged = {}
+    seen_texts = {}
+    for doc_chunk, hits in enumerate(per_chunk_hits):
+        for rank, hit in enumerate(hits):
+            key = seen_texts.setdefault(" ".join(hit["chunk"].split()).lower(), hit["id"])
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {**hit, "score": 0.0, "support": 0, "doc_chunks": []}
+            entry["score"] += 1 / (RRF_K + rank + 1)
+            if entry["distance"] is None or (hit["distance"] is not None and hit["distance"] < entry["distance"]):
+                entry["distance"] = hit["distance"]
+            if doc_chunk not in entry["doc_chunks"]:
+                entry["support"] += 1
+                entry["doc_chunks"].append(doc_chunk)
+
+    ranked = sorted(merged.values(), key=lambda entry: (
+        -entry["score"], float("inf") if entry["distance"] is None else entry["distance"]))
+    context, total = [], 0
+    for entry in ranked:
+        if len(context) >= limit or (context and total + len(entry["chunk"]) > max_chars):
+            break
+        context.append(entry)
+        total += len(entry["chunk"])
+    return context
+
+def document_excerpt(chunks, context, max_chars: int = UPLOAD_CONTEXT_CHARS):
+    """
+    The parts of the document worth sending to an LLM, at most `max_chars`:
+    chunks that retrieved the top hits first, then the opening of the
+    document, presented in document order.
+    """
+    weight = {}
+    for entry in context:
+        for i in entry["doc_chunks"]:
+            weight[i] = weight.get(i, 0.0) + entry["score"]
+    order = sorted(range(len(chunks)), key=lambda i: (-weight.get(i, 0.0), i))
+    chosen, total = [], 0
+    for i in order:
+        size = len(chunks[i]["text"])
+        if total + size > max_chars:
+            if chosen:
+                break
+            return chunks[i]["text"][:max_chars]
+        chosen.append(i)
+        total += size
+    return "\n\n".join(chunks[i]["text"] for i in sorted(chosen))
+
+def query_document(pages, engine=None):
+    """
+    Map-reduce retrieval for an uploaded document.
+
+    Returns (context hits, bounded excerpt for the LLM fallbacks, stats).
+    """
+    engine = engine or get_engine()
+    try:
+        model = engine.model
+    except Exception as e:
+        if DEBUG: print(f"[DEBUG] Encoder unavailable for upload chunking: {e}")
+        model = None
+    chunks = chunk_document(pages, model=model)
+    if not chunks:
+        return [], "", {"chunks": 0, "hits": 0}
+    per_chunk_hits = search_document(chunks, engine=engine)
+    context = merge_hits(per_chunk_hits)
+    stats = {"chunks": len(chunks), "hits": sum(len(hits) for hits in per_chunk_hits), "context": len(context)}
+    if DEBUG:
+        print(f"[DEBUG] Upload: {stats['chunks']} chunks, {stats['hits']} hits -> {stats['context']} in context")
+    return context, document_excerpt(chunks, context), stats
@@ -1,15 +1,16 @@
 import os
 import json
-import requests
-from config import DEBUG, OPENFDA_API_KEY, GOOGLE_API_KEY, GROQ_API_KEY, TEMP_PATH
+from config import DEBUG, OPENFDA_API_KEY, GEMINI_API_KEY, GROQ_API_KEY, TEMP_PATH, DRUG_DB_PATH
 from modules.ai_engine import query_gemini, query_groq
-
-DRUG_DB_PATH = os.path.join("database", "drugs.json")
+from modules.drug_store import get_drug_store
+from modules.openfda_client import get_openfda_client
+from modules.metrics import annotate, count, span, trace
 
 # ------------------------------
 # Load local drug database
 # ------------------------------
 def load_local_drug_db():
+    """Parse the whole drugs.json; lookups should go through get_drug_store() instead."""
     if os.path.exists(DRUG_DB_PATH):
         with open(DRUG_DB_PATH, "r", encoding="utf-8") as f:
             return json.load(f)
@@ -22,26 +23,11 @@ def load_local_drug_db():
 # Query OpenFDA for a drug
 # ------------------------------
 def query_openfda(drug_name: str):
-    url = f"https://api.fda.gov/drug/label.json?search=openfda.brand_name:{drug_name}&limit=1"
-    try:
-        response = requests.get(url)
-        data = response.json()
-        results = data.get("results", [])
-        if results:
-            result = results[0]
-            info = {
-                "name": drug_name,
-                "indications": result.get("indications_and_usage", ["Not available"])[0],
-                "warnings": result.get("warnings", ["Not available"])[0],
-                "dosage": result.get("dosage_and_administration", ["Not available"])[0],
-            }
-            return info
-        else:
-            return None
-    except Exception as e:
-        if DEBUG:
-            print(f"[DEBUG] OpenFDA query failed: {e}")
-        return None
+    return get_openfda_client().lookup(drug_name)
+
+def query_openfda_batch(drug_names):
+    """Look up many drugs on OpenFDA concurrently; returns {name: info or None}."""
+    return get_openfda_client().lookup_many(drug_names)
 
 # ------------------------------
 # Query AI (Gemini or Groq)
@@ -49,7 +35,7 @@ def query_openfda(drug_name: str):
 def query_ai_drug_info(drug_name: str):
     prompt = f"Provide professional medical information about the drug '{drug_name}': indications, dosage, warnings, side effects."
     try:
-        if GOOGLE_API_KEY:
+        if GEMINI_API_KEY:
             return query_gemini(prompt)
     except Exception as e:
         if DEBUG:
@@ -66,20 +52,36 @@ def query_ai_drug_info(drug_name: str):
 # Main function to get drug info
 # ------------------------------
 def get_drug_info(drug_name: str):
-    local_db = load_local_drug_db()
-    drug_info = local_db.get(drug_name.lower())
-    
-    if drug_info:
-        return drug_info
+    with trace("drug_info"):
+        with span("drug_store"):
+            drug_info = get_drug_store().get(drug_name)
+
+        if drug_info:
+            _record_tier("local")
+            return drug_info
+
+        # Check OpenFDA
+        with span("openfda"):
+            drug_info = query_openfda(drug_name)
+        if drug_info:
+            _record_tier("openfda")
+            return drug_info
+
+        # Fallback to AI
+        with span("drug_ai"):
+            ai_info = query_ai_drug_info(drug_name)
+        _record_tier("ai")
+        return {"name": drug_name, "info": ai_info}
 
-    # Check OpenFDA
-    drug_info = query_openfda(drug_name)
-    if drug_info:
-        return drug_info
+def _record_tier(tier: str):
+    count("drug_lookups_total", tier=tier)
+    annotate(tier=tier)
 
-    # Fallback to AI
-    ai_info = query_ai_drug_info(drug_name)
-    return {"name": drug_name, "info": ai_info}
+def suggest_drug_names(text: str, limit: int = 8):
+    """Known drug names matching what has been typed so far (prefix, then typo-tolerant)."""
+    if not text.strip():
+        return []
+    return get_drug_store().suggest(text, limit)
 
 # ------------------------------
 # Streamlit UI function
@@ -0,0 +1,381 @@
+# modules/drug_store.py
+import re
+import json
+import time
+import bisect
+import sqlite3
+import argparse
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from config import DEBUG, DRUG_DB_PATH, DRUG_STORE_BACKEND, DRUG_SQLITE_PATH, DRUG_RELOAD_INTERVAL
+
+# Record fields whose values a drug can be looked up by (strings or lists of strings)
+NAME_FIELDS = ("name", "brand_name", "brand_names", "generic_name", "generic_names", "synonyms")
+
+# ------------------------------
+# Names
+# ------------------------------
+_SPACES = re.compile(r"\s+")
+
+def normalize_name(name) -> str:
+    """Case-fold, collapse whitespace and trim surrounding punctuation."""
+    return _SPACES.sub(" ", str(name).casefold()).strip(" .,;:")
+
+def record_names(key, record):
+    """Spellings a record can be found under: every name field, then its key."""
+    names = []
+    if isinstance(record, dict):
+        for field in NAME_FIELDS:
+            value = record.get(field)
+            if isinstance(value, str):
+                names.append(value)
+            elif isinstance(value, (list, tuple)):
+                names.extend(v for v in value if isinstance(v, str))
+    names.append(key)
+    return names
+
+def _trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# ------------------------------
+# Name index
+# ------------------------------
+class NameIndex:
+    """
+    Immutable exact, prefix and typo-tolerant index over drug names.
+
+    Names are kept sorted so prefix search is a binary search. Each trigram
+    maps to a numpy array of name ids, so fuzzy search is one bincount over
+    the posting lists of the query's trigrams, ranked by Dice similarity.
+    """
+
+    def __init__(self, entries):
+        """`entries` is an iterable of (display name, record key)."""
+        keys = defaultdict(list)
+        display = {}
+        for shown, key in entries:
+            name = normalize_name(shown)
+            if not name:
+                continue
+            display.setdefault(name, str(shown).strip())
+            if key not in keys[name]:
+                keys[name].append(key)
+
+        self.names = sorted(keys)
+        self.display = [display[name] for name in self.names]
+        self.keys = [keys[name] for name in self.names]
+        self._ids = {name: i for i, name in enumerate(self.names)}
+
+        postings = defaultdict(list)
+        self._gram_counts = np.empty(len(self.names), dtype=np.int32)
+        for i, name in enumerate(self.names):
+            grams = _trigrams(name)
+            self._gram_counts[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def exact(self, name):
+        """Record keys filed under `name`, or an empty list."""
+        i = self._ids.get(normalize_name(name))
+        return [] if i is None else self.keys[i]
+
+    def prefix(self, prefix, limit=10):
+        """Ids of up to `limit` names starting with `prefix`, alphabetically."""
+        prefix = normalize_name(prefix)
+        if not prefix:
+            return []
+        ids = []
+        for i in range(bisect.bisect_left(self.names, prefix), len(self.names)):
+            if len(ids) >= limit or not self.names[i].startswith(prefix):
+                break
+            ids.append(i)
+        return ids
+
+    def fuzzy(self, query, limit=10, min_score=0.4):
+        """(id, score) of the `limit` names most similar to `query`, best first."""
+        grams = _trigrams(normalize_name(query))
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not lists:
+            return []
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.names))
+        # Dice >= min_score needs at least this many shared trigrams (names share at most their own)
+        needed = max(1, int(np.ceil(min_score * len(grams) / (2.0 - min_score) - 1e-9)))
+        candidates = np.flatnonzero(shared >= needed)
+        scores = 2.0 * shared[candidates] / (len(grams) + self._gram_counts[candidates])
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((candidates, -scores))
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+# ------------------------------
+# SQLite backend
+# ------------------------------
+def connect_drug_db(path=DRUG_SQLITE_PATH):
+    """Open (and create if needed) the SQLite drug database."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    with conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS drugs ("
+            " key TEXT PRIMARY KEY, set_id TEXT, version INTEGER, data TEXT NOT NULL)"
+        )
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS drugs_set_id ON drugs(set_id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS names ("
+            " name TEXT NOT NULL, display TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (name, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS names_key ON names(key)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT OR IGNORE INTO meta(name, value) VALUES ('generation', '0')")
+    return conn
+
+def _delete_drug(conn, key):
+    conn.execute("DELETE FROM drugs WHERE key = ?", (key,))
+    conn.execute("DELETE FROM names WHERE key = ?", (key,))
+
+def _bump_generation(conn):
+    conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'generation'")
+
+def upsert_drug(conn, key, record, names=None, set_id=None, version=None):
+    """
+    Insert or replace one record and its names (default: `record_names`).
+
+    With a `set_id`, a record carrying the same or a newer `version` of that
+    set is kept and False is returned. Runs inside the caller's transaction.
+    """
+    if set_id is not None:
+        row = conn.execute("SELECT key, version FROM drugs WHERE set_id = ?", (set_id,)).fetchone()
+        if row is not None:
+            if version is not None and row[1] is not None and row[1] >= version:
+                return False
+            if row[0] != key:
+                _delete_drug(conn, row[0])
+    conn.execute("INSERT OR REPLACE INTO drugs(key, set_id, version, data) VALUES (?, ?, ?, ?)",
+                 (key, set_id, version, json.dumps(record, ensure_ascii=False)))
+    conn.execute("DELETE FROM names WHERE key = ?", (key,))
+    rows = [(normalize_name(name), str(name).strip(), key)
+            for name in (record_names(key, record) if names is None else names)]
+    conn.executemany("INSERT OR IGNORE INTO names(name, display, key) VALUES (?, ?, ?)",
+                     [row for row in rows if row[0]])
+    _bump_generation(conn)
+    return True
+
+def import_json(conn, json_path=DRUG_DB_PATH):
+    """
+    Sync `drugs.json` into the SQLite database.
+
+    Records without a set_id are treated as coming from the JSON file, so
+    entries removed from it are removed here too. Returns the record count.
+    """
+    json_path = Path(json_path)
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    with conn:
+        stale = {key for (key,) in conn.execute("SELECT key FROM drugs WHERE set_id IS NULL")}
+        for key, record in data.items():
+            upsert_drug(conn, key, record)
+            stale.discard(key)
+        for key in stale:
+            _delete_drug(conn, key)
+        _bump_generation(conn)
+        conn.execute("INSERT OR REPLACE INTO meta(name, value) VALUES ('json_stat', ?)",
+                     (_stat_token(json_path),))
+    return len(data)
+
+def _stat_token(path):
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+# ------------------------------
+# Drug store
+# ------------------------------
+class DrugStore:
+    """
+    Drug records indexed by brand name, generic name and synonyms.
+
+    The source is loaded once and re-checked for changes at most every
+    `reload_interval` seconds. The "memory" backend keeps all of
+    `drugs.json` in RAM; the "sqlite" backend syncs the JSON file into
+    `sqlite_path` and keeps only the name index in RAM, reading records on
+    demand. "auto" starts with sqlite if `sqlite_path` exists and otherwise
+    switches to it at the first change check after the file appears (for
+    example after an OpenFDA bulk import). A reload builds a new index and
+    swaps it in, so lookups running in other threads are never blocked by it.
+    """
+
+    def __init__(self, path=DRUG_DB_PATH, backend=DRUG_STORE_BACKEND, sqlite_path=DRUG_SQLITE_PATH,
+                 reload_interval=DRUG_RELOAD_INTERVAL):
+        if backend not in ("auto", "memory", "sqlite"):
+            raise ValueError(f"Unknown drug store backend '{backend}'")
+        self.path = Path(path)
+        self.sqlite_path = Path(sqlite_path)
+        self.auto = backend == "auto"
+        self.backend = "memory" if self.auto else backend
+        self._backend_changed()
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._state = None  # (version, NameIndex, records or None)
+        self._last_check = 0.0
+        self.timings = {"load_s": None, "reloads": 0}
+
+    # ---------- source state ----------
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_drug_db(self.sqlite_path)
+            self._local.conn = conn
+        return conn
+
+    def _backend_changed(self):
+        """With "auto", move from memory to sqlite once `sqlite_path` exists; True if switched."""
+        if self.auto and self.backend == "memory" and self.sqlite_path.exists():
+            self.backend = "sqlite"
+            return True
+        return False
+
+    def _version(self):
+        if self.backend == "memory":
+            return _stat_token(self.path)
+        generation = self._conn().execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()
+        return _stat_token(self.path), generation[0]
+
+    def _load(self):
+        start = time.perf_counter()
+        if self.backend == "memory":
+            version = self._version()
+            if version is None:
+                records = {}
+            else:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    records = json.load(f)
+            index = NameIndex((name, key) for key, record in records.items()
+                              for name in record_names(key, record))
+        else:
+            conn = self._conn()
+            synced = conn.execute("SELECT value FROM meta WHERE name = 'json_stat'").fetchone()
+            json_stat = _stat_token(self.path)
+            if json_stat is not None and (synced is None or synced[0] != json_stat):
+                import_json(conn, self.path)
+            version = self._version()
+            records = None
+            index = NameIndex(conn.execute("SELECT display, key FROM names"))
+        self._state = (version, index, records)
+        self.timings["load_s"] = time.perf_counter() - start
+        self.timings["reloads"] += 1
+        if DEBUG:
+            print(f"[DEBUG] Drug store ({self.backend}) loaded in {self.timings['load_s']:.3f}s "
+                  f"({len(index)} names)")
+
+    def _current(self):
+        now = time.monotonic()
+        if self._state is None or now - self._last_check >= self.reload_interval:
+            with self._lock:
+                if self._state is None or now - self._last_check >= self.reload_interval:
+                    self._last_check = now
+                    try:
+                        if (self._state is None or self._backend_changed()
+                                or self._version() != self._state[0]):
+                            self._load()
+                    except Exception as e:
+                        if DEBUG:
+                            print(f"[DEBUG] Error loading drug database: {e}")
+                        if self._state is None:
+                            self._state = (None, NameIndex([]), {})
+        return self._state
+
+    def _record(self, records, key):
+        if records is not None:
+            return records.get(key)
+        row = self._conn().execute("SELECT data FROM drugs WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # ---------- lookups ----------
+    def get(self, name):
+        """Record filed under `name` (any brand, generic or synonym), or None."""
+        _, index, records = self._current()
+        for key in index.exact(name):
+            record = self._record(records, key)
+            if record is not None:
+                return record
+        return None
+
+    def search_prefix(self, prefix, limit=10):
+        _, index, _ = self._current()
+        return [index.display[i] for i in index.prefix(prefix, limit)]
+
+    def search_fuzzy(self, query, limit=10, min_score=0.4):
+        """(name, similarity) pairs for names close to `query`, tolerating typos."""
+        _, index, _ = self._current()
+        return [(index.display[i], score) for i, score in index.fuzzy(query, limit, min_score)]
+
+    def suggest(self, text, limit=10):
+        """Names for a search box: prefix matches first, then typo-tolerant matches."""
+        _, index, _ = self._current()
+        ids = index.prefix(text, limit)
+        if len(ids) < limit:
+            seen = set(ids)
+            ids += [i for i, _ in index.fuzzy(text, limit) if i not in seen][:limit - len(ids)]
+        return [index.display[i] for i in ids]
+
+    def stats(self):
+        _, index, _ = self._current()
+        return {"backend": self.backend, "names": len(index), **self.timings}
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+def get_drug_store() -> DrugStore:
+    """Shared drug store, created on first use."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = DrugStore()
+    return _STORE
+
+# ------------------------------
+# CLI: python -m modules.drug_store
+# ------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up drugs in the local drug database.")
+    parser.add_argument("query", nargs="?", help="drug name, prefix or misspelling")
+    parser.add_argument("--backend", choices=["auto", "memory", "sqlite"], default=DRUG_STORE_BACKEND)
+    parser.add_argument("--import-json", action="store_true",
+                        help="sync drugs.json into the SQLite database and exit")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.import_json:
+        count = import_json(connect_drug_db(), DRUG_DB_PATH)
+        print(f"Imported {count} drugs into {DRUG_SQLITE_PATH}")
+    elif args.query:
+        store = DrugStore(backend=args.backend)
+        store.stats()
+        for label, lookup in (("exact", lambda q: store.get(q)),
+                              ("prefix", lambda q: store.search_prefix(q, args.limit)),
+                              ("fuzzy", lambda q: store.search_fuzzy(q, args.limit))):
+            start = time.perf_counter()
+            result = lookup(args.query)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"{label} ({elapsed_ms:.3f} ms): {result}")
+    else:
+        parser.print_help()
@@ -0,0 +1,172 @@
+# modules/encoder_benchmark.py
+import json
+import time
+import argparse
+
+import numpy as np
+import faiss
+
+from config import EMBEDDING_MODEL, ENCODER_THREADS, EMBED_BATCH_SIZE, TOP_K
+from modules.encoders import ENCODER_BACKENDS, load_encoder
+from modules.index_benchmark import load_corpus_texts
+from modules.vector_index import INDEX_STORAGES, create_index
+
+# The current production setup every other combination is compared against
+REFERENCE_BACKEND = "torch"
+
+# ------------------------------
+# Queries
+# ------------------------------
+def split_texts(texts, n_queries, query_words=12, seed=0):
+    """
+    Hold out `n_queries` chunks; their first `query_words` words are the
+    queries and the remaining chunks form the database.
+    """
+    n_queries = min(n_queries, max(1, len(texts) // 10))
+    rng = np.random.default_rng(seed)
+    rows = rng.permutation(len(texts))
+    database = [texts[i] for i in rows[n_queries:]]
+    queries = [" ".join(texts[i].split()[:query_words]) for i in rows[:n_queries]]
+    return database, queries
+
+# ------------------------------
+# Measurements
+# ------------------------------
+def _percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+def _encode(model, texts, batch_size):
+    return np.asarray(model.encode(texts, batch_size=batch_size), dtype="float32").reshape(len(texts), -1)
+
+def measure_encoder(backend, database, queries, threads=ENCODER_THREADS, batch_size=EMBED_BATCH_SIZE):
+    """Load one backend, embed the database in batches and the queries one at a time."""
+    start = time.perf_counter()
+    model = load_encoder(EMBEDDING_MODEL, backend, threads)
+    load_s = time.perf_counter() - start
+    _encode(model, queries[:1], 1)  # first call initializes the runtime
+
+    start = time.perf_counter()
+    vectors = _encode(model, database, batch_size)
+    corpus_s = time.perf_counter() - start
+
+    latencies, query_vectors = [], []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(_encode(model, [query], 1)[0])
+        latencies.append(time.perf_counter() - start)
+    return {
+        "vectors": vectors,
+        "query_vectors": np.vstack(query_vectors),
+        "load_s": load_s,
+        "corpus_s": corpus_s,
+        "chunks_per_s": len(database) / corpus_s,
+        "query_p50_ms": _percentile_ms(latencies, 50),
+        "query_p99_ms": _percentile_ms(latencies, 99),
+    }
+
+def _cosine(a, b):
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return (a * b).sum(axis=1)
+
+def measure_storage(vectors, query_vectors, ground_truth, storage, k):
+    """Store `vectors` in a flat index with `storage` and measure recall@k against the reference neighbours."""
+    index, _ = create_index(vectors, {"index_type": "flat", "storage": storage})
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
+    latencies = []
+    found = np.empty((len(query_vectors), k), dtype="int64")
+    for row, query in enumerate(query_vectors):
+        start = time.perf_counter()
+        _, I = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - start)
+        found[row] = I[0]
+    hits = sum(len(set(found[row]) & set(ground_truth[row])) for row in range(len(query_vectors)))
+    return {
+        "recall_at_k": hits / (len(query_vectors) * k),
+        "search_p50_ms": _percentile_ms(latencies, 50),
+        "bytes_per_vector": len(faiss.serialize_index(index)) / len(vectors),
+    }
+
+# ------------------------------
+# Benchmark
+# ------------------------------
+def run_benchmark(texts, backends=tuple(ENCODER_BACKENDS), storages=INDEX_STORAGES, k=TOP_K, n_queries=200,
+                  threads=ENCODER_THREADS, batch_size=EMBED_BATCH_SIZE):
+    """
+    Accuracy against speed for every (encoder backend, vector storage) pair.
+
+    The reference is the full-precision PyTorch model with float32 storage:
+    its exact top-k neighbours of each query are the ground truth, so
+    recall@k measures what the faster encoder and the smaller storage lose
+    together. `cosine_*` compare each backend's chunk embeddings with the
+    reference ones; `speedup` is the corpus embedding speed relative to it.
+    """
+    database, queries = split_texts(texts, n_queries)
+    k = min(k, len(database))
+    backends = [REFERENCE_BACKEND] + [backend for backend in backends if backend != REFERENCE_BACKEND]
+
+    reference = None
+    results = []
+    for backend in backends:
+        try:
+            measured = measure_encoder(backend, database, queries, threads, batch_size)
+        except ImportError as e:
+            print(f"Skipping encoder backend '{backend}': {e}")
+            continue
+        if reference is None:
+            if backend != REFERENCE_BACKEND:
+                raise SystemExit(f"Reference backend '{REFERENCE_BACKEND}' is unavailable")
+            reference = measured
+            exact = faiss.IndexFlatL2(reference["vectors"].shape[1])
+            exact.add(reference["vectors"])
+            _, ground_truth = exact.search(reference["query_vectors"], k)
+        cosine = _cosine(measured["vectors"], reference["vectors"])
+        for storage in storages:
+            results.append({
+                "backend": backend,
+                "storage": storage,
+                "k": k,
+                **measure_storage(measured["vectors"], measured["query_vectors"], ground_truth, storage, k),
+                "cosine_mean": float(cosine.mean()),
+                "cosine_min": float(cosine.min()),
+                "chunks_per_s": measured["chunks_per_s"],
+                "speedup": reference["corpus_s"] / measured["corpus_s"],
+                "query_p50_ms": measured["query_p50_ms"],
+                "query_p99_ms": measured["query_p99_ms"],
+                "load_s": measured["load_s"],
+                "n_vectors": len(database),
+                "threads": threads,
+            })
+    return results
+
+def print_results(results):
+    print(f"{'encoder':<10} {'storage':<8} {'recall@k':>9} {'cos mean':>9} {'cos min':>8} {'chunks/s':>9} "
+          f"{'speedup':>8} {'query ms':>9} {'search ms':>10} {'B/vec':>7}")
+    for r in results:
+        print(f"{r['backend']:<10} {r['storage']:<8} {r['recall_at_k']:>9.3f} {r['cosine_mean']:>9.4f} "
+              f"{r['cosine_min']:>8.4f} {r['chunks_per_s']:>9.1f} {r['speedup']:>7.2f}x "
+              f"{r['query_p50_ms']:>9.2f} {r['search_p50_ms']:>10.3f} {r['bytes_per_vector']:>7.0f}")
+
+# ------------------------------
+# Run
+# ------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare encoder backends and vector storages against the full-precision model.")
+    parser.add_argument("--backends", nargs="+", default=list(ENCODER_BACKENDS),
+                        help="encoder backends (the torch reference is always included)")
+    parser.add_argument("--storage", nargs="+", choices=INDEX_STORAGES, default=list(INDEX_STORAGES))
+    parser.add_argument("--k", type=int, default=TOP_K)
+    parser.add_argument("--queries", type=int, default=200, help="held-out chunks whose opening words are queries")
+    parser.add_argument("--sample", type=int, help="use only a random sample of chunks")
+    parser.add_argument("--threads", type=int, default=ENCODER_THREADS, help="encoder threads (0 = library default)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--json", help="also write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(load_corpus_texts(args.sample), args.backends, args.storage, args.k, args.queries,
+                            args.threads, args.batch_size)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,81 @@
+# modules/encoders.py
+import re
+import importlib
+
+from config import (DEBUG, EMBEDDING_MODEL, ENCODER_BACKEND, ENCODER_THREADS, ENCODER_ONNX_QUANTIZATION,
+                    ENCODER_CACHE_PATH)
+
+# ------------------------------
+# Encoder backends
+# ------------------------------
+# A backend is a callable (model_name, threads) -> encoder, where the encoder
+# offers SentenceTransformer's `encode(texts, batch_size=...)` and, for exact
+# chunk sizing, `tokenizer` and `max_seq_length`. All built-in backends are
+# SentenceTransformer models, so pooling and normalization match the
+# PyTorch model; only the inference runtime differs.
+
+def torch_backend(model_name: str, threads: int = 0):
+    """The full-precision PyTorch model (the reference)."""
+    from sentence_transformers import SentenceTransformer
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    return SentenceTransformer(model_name, device="cpu")
+
+def _onnx_kwargs(threads, file_name=None):
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    kwargs = {"provider": "CPUExecutionProvider", "session_options": options}
+    if file_name:
+        kwargs["file_name"] = file_name
+    return kwargs
+
+def onnx_backend(model_name: str, threads: int = 0):
+    """The model run by ONNX Runtime; exported from PyTorch on first use if the hub has no ONNX file."""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=_onnx_kwargs(threads))
+
+def onnx_int8_backend(model_name: str, threads: int = 0, quantization: str = ENCODER_ONNX_QUANTIZATION):
+    """
+    The model with int8 weights (dynamic quantization) run by ONNX Runtime.
+
+    The quantized model is written once to ENCODER_CACHE_PATH and loaded
+    from there afterwards.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+    model_dir = ENCODER_CACHE_PATH / re.sub(r"[^\w.-]+", "_", model_name)
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+    if not (model_dir / file_name).exists():
+        if DEBUG: print(f"[DEBUG] Quantizing '{model_name}' for {quantization} into {model_dir}")
+        model = onnx_backend(model_name, threads)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        model.save(str(model_dir))
+        export_dynamic_quantized_onnx_model(model, quantization, str(model_dir))
+    return SentenceTransformer(str(model_dir), device="cpu", backend="onnx",
+                               model_kwargs=_onnx_kwargs(threads, file_name))
+
+ENCODER_BACKENDS = {"torch": torch_backend, "onnx": onnx_backend, "onnx_int8": onnx_int8_backend}
+
+def register_backend(name: str, load):
+    """Make `load(model_name, threads) -> encoder` available as ENCODER_BACKEND=<name>."""
+    ENCODER_BACKENDS[name] = load
+
+def get_backend(name: str = ENCODER_BACKEND):
+    """A registered backend, or "package.module:function" for one defined elsewhere."""
+    if name in ENCODER_BACKENDS:
+        return ENCODER_BACKENDS[name]
+    if ":" in name:
+        module, attr = name.split(":", 1)
+        return getattr(importlib.import_module(module), attr)
+    raise ValueError(f"Unknown encoder backend '{name}'")
+
+def load_encoder(model_name: str = EMBEDDING_MODEL, backend: str = ENCODER_BACKEND, threads: int = ENCODER_THREADS):
+    """Load the embedding model with the configured backend and thread count."""
+    return get_backend(backend)(model_name, threads)
+
+def encoder_id(model_name: str = EMBEDDING_MODEL, backend: str = ENCODER_BACKEND) -> str:
+    """Identifies the embedding space: vectors of different ids must not be mixed."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
@@ -0,0 +1,145 @@
+# modules/index_benchmark.py
+import json
+import time
+import argparse
+
+import numpy as np
+import faiss
+
+from config import EMBEDDING_MODEL, ENCODER_BACKEND, TOP_K
+from modules.vector_index import (INDEX_TYPES, INDEX_STORAGES, default_params, build_params, create_index,
+                                  configure_search)
+
+# ------------------------------
+# Corpus vectors
+# ------------------------------
+def load_corpus_texts(sample=None, seed=0):
+    """Texts of the chunks in the current vector store (optionally a random sample)."""
+    from modules.rag_engine import load_vector_store
+
+    _, store = load_vector_store()
+    texts = [text for _, text in store.iter_texts()] if store is not None else []
+    if not texts:
+        raise SystemExit("Vector store is empty, run modules.build_faiss first.")
+    if sample and sample < len(texts):
+        rng = np.random.default_rng(seed)
+        texts = [texts[i] for i in np.sort(rng.choice(len(texts), sample, replace=False))]
+    return texts
+
+def load_corpus_vectors(sample=None, seed=0, backend=ENCODER_BACKEND):
+    """Embed the chunks of the current vector store (optionally a random sample)."""
+    from modules.encoders import load_encoder
+
+    model = load_encoder(EMBEDDING_MODEL, backend)
+    return np.asarray(model.encode(load_corpus_texts(sample, seed), show_progress_bar=True), dtype="float32")
+
+def split_queries(vectors, n_queries, seed=0):
+    """Hold out `n_queries` vectors as queries; the rest form the database."""
+    n_queries = min(n_queries, max(1, len(vectors) // 10))
+    rng = np.random.default_rng(seed)
+    rows = rng.permutation(len(vectors))
+    return vectors[rows[n_queries:]], vectors[rows[:n_queries]]
+
+# ------------------------------
+# Benchmark
+# ------------------------------
+def _percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+def _reported_params(index_type, params):
+    reported = {key: value for key, value in build_params({**params, "index_type": index_type}).items()
+                if key != "index_type"}
+    if index_type.startswith("ivf"):
+        reported["nprobe"] = params["nprobe"]
+    elif index_type == "hnsw":
+        reported["ef_search"] = params["ef_search"]
+    return reported
+
+def benchmark_index(database, queries, ground_truth, params, k=TOP_K):
+    """Build one index configuration and measure recall@k and per-query latency."""
+    start = time.perf_counter()
+    index, index_type = create_index(database, params)
+    index.add_with_ids(database, np.arange(len(database), dtype="int64"))
+    build_s = time.perf_counter() - start
+    configure_search(index, params)
+
+    latencies = []
+    found = np.empty((len(queries), k), dtype="int64")
+    for row, query in enumerate(queries):
+        start = time.perf_counter()
+        _, I = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - start)
+        found[row] = I[0]
+
+    hits = sum(len(set(found[row]) & set(ground_truth[row])) for row in range(len(queries)))
+    return {
+        "index_type": index_type,
+        "params": _reported_params(index_type, params),
+        "recall_at_k": hits / (len(queries) * k),
+        "k": k,
+        "p50_ms": _percentile_ms(latencies, 50),
+        "p99_ms": _percentile_ms(latencies, 99),
+        "build_s": build_s,
+        "n_vectors": len(database),
+        "bytes_per_vector": len(faiss.serialize_index(index)) / len(database),
+    }
+
+def run_benchmark(vectors, index_types=INDEX_TYPES, k=TOP_K, n_queries=200,
+                  nprobes=(None,), ef_searches=(None,), base_params=None, storages=("float32",)):
+    database, queries = split_queries(vectors, n_queries)
+    k = min(k, len(database))
+
+    exact = faiss.IndexFlatL2(database.shape[1])
+    exact.add(database)
+    _, ground_truth = exact.search(queries, k)
+
+    results = []
+    for index_type in index_types:
+        if index_type.startswith("ivf"):
+            sweep = [{"nprobe": value} for value in nprobes]
+        elif index_type == "hnsw":
+            sweep = [{"ef_search": value} for value in ef_searches]
+        else:
+            sweep = [{}]
+        # IVF-PQ stores its own codes, so only the first storage applies to it
+        for storage in (storages[:1] if index_type == "ivf_pq" else storages):
+            for override in sweep:
+                params = {**default_params(), **(base_params or {}), "index_type": index_type, "storage": storage}
+                params.update({key: value for key, value in override.items() if value is not None})
+                results.append(benchmark_index(database, queries, ground_truth, params, k))
+    return results
+
+def print_results(results):
+    print(f"{'index':<10} {'params':<48} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'B/vec':>8}")
+    for r in results:
+        params = ", ".join(f"{key}={value}" for key, value in r["params"].items())
+        print(f"{r['index_type']:<10} {params:<48} {r['recall_at_k']:>9.3f} "
+              f"{r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f} {r['build_s']:>8.2f} {r['bytes_per_vector']:>8.0f}")
+
+# ------------------------------
+# Run
+# ------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare FAISS index types on the current corpus.")
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--storage", nargs="+", choices=INDEX_STORAGES, default=["float32"],
+                        help="vector storages to sweep (flat, ivf_flat and hnsw)")
+    parser.add_argument("--encoder", default=ENCODER_BACKEND, help="encoder backend used to embed the corpus")
+    parser.add_argument("--k", type=int, default=TOP_K)
+    parser.add_argument("--queries", type=int, default=200, help="held-out chunks used as queries")
+    parser.add_argument("--sample", type=int, help="embed only a random sample of chunks")
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--pq-m", type=int)
+    parser.add_argument("--hnsw-m", type=int)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[None], help="IVF nprobe values to sweep")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[None], help="HNSW efSearch values to sweep")
+    parser.add_argument("--json", help="also write results to this JSON file")
+    args = parser.parse_args()
+
+    base = {key: getattr(args, key) for key in ("nlist", "pq_m", "hnsw_m") if getattr(args, key) is not None}
+    results = run_benchmark(load_corpus_vectors(args.sample, backend=args.encoder), args.types, args.k, args.queries,
+                            args.nprobe, args.ef_search, base, args.storage)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,192 @@
+# modules/ingest.py
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+from config import INGEST_WORKERS, INGEST_PDF_PAGES_PER_TASK
+
+SUPPORTED_SUFFIXES = {".pdf", ".txt", ".docx"}
+
+# ------------------------------
+# Text extraction (runs in worker processes)
+# ------------------------------
+def _pdf_pages(reader, first_page, last_page):
+    return [(page, reader.pages[page].extract_text() or "") for page in range(first_page, last_page)]
+
+def extract_pages(path, first_page=None, last_page=None):
+    """
+    Extract text from one file as a list of (page, text).
+
+    PDFs yield one entry per page in [first_page, last_page); TXT and DOCX
+    yield a single entry with page None.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        from PyPDF2 import PdfReader
+        reader = PdfReader(path)
+        last_page = len(reader.pages) if last_page is None else last_page
+        return _pdf_pages(reader, first_page or 0, last_page)
+    elif suffix == ".txt":
+        with open(path, "r", encoding="utf-8") as f:
+            return [(None, f.read())]
+    elif suffix == ".docx":
+        import docx
+        doc = docx.Document(path)
+        return [(None, "\n".join([para.text for para in doc.paragraphs if para.text.strip()]))]
+    return []
+
+def extract_text(path):
+    return "".join(text for _, text in extract_pages(path))
+
+def _run_task(task):
+    """
+    Extract one task; returns (pages, page count or None).
+
+    A PDF's first task has no page range: it counts the pages and extracts
+    the first `pages_per_task` of them, and the caller plans the rest.
+    """
+    path, first_page, last_page, pages_per_task = task
+    path = Path(path)
+    if path.suffix.lower() == ".pdf" and first_page is None:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(path)
+        n_pages = len(reader.pages)
+        return _pdf_pages(reader, 0, min(n_pages, pages_per_task)), n_pages
+    return extract_pages(path, first_page, last_page), None
+
+# ------------------------------
+# Ingestion stats
+# ------------------------------
+class IngestStats:
+    """Throughput and per-file error accounting for one ingestion run."""
+
+    def __init__(self, report_every=10.0):
+        self.start = time.perf_counter()
+        self.report_every = report_every
+        self._last_report = self.start
+        self.files_total = 0
+        self.docs = 0
+        self.pages = 0
+        self.chunks = 0
+        self.duplicates = 0
+        self.embedded = 0
+        self.errors = {}
+
+    def error(self, name, exc):
+        self.errors.setdefault(name, []).append(f"{type(exc).__name__}: {exc}")
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return {
+            "elapsed_s": elapsed,
+            "files": self.files_total,
+            "docs": self.docs,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "duplicates": self.duplicates,
+            "dedup_ratio": self.duplicates / self.chunks if self.chunks else 0.0,
+            "embedded": self.embedded,
+            "failed_files": len(self.errors),
+            "docs_per_s": self.docs / elapsed,
+            "chunks_per_s": self.chunks / elapsed,
+        }
+
+    def progress(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last_report < self.report_every:
+            return
+        self._last_report = now
+        s = self.summary()
+        print(f"[ingest] {s['docs']}/{s['files']} docs, {s['chunks']} chunks, "
+              f"{s['duplicates']} duplicates, {s['embedded']} embedded | {s['docs_per_s']:.1f} docs/s, "
+              f"{s['chunks_per_s']:.1f} chunks/s | {s['failed_files']} failed")
+
+    def report(self):
+        self.progress(force=True)
+        for name, messages in self.errors.items():
+            print(f"[ingest] failed: {name}: {'; '.join(messages)}")
+
+# ------------------------------
+# Parallel extraction
+# ------------------------------
+def iter_extracted(files, workers=INGEST_WORKERS, stats=None, pages_per_task=INGEST_PDF_PAGES_PER_TASK, pool=None):
+    """
+    Extract `files` in a process pool and yield (path, page, text).
+
+    Every file starts as one task, so page counting happens in the workers
+    too; a PDF longer than `pages_per_task` pages is fanned out into page
+    ranges once its first task reports the page count. At most twice as
+    many tasks as workers are in flight, so memory stays bounded regardless
+    of corpus size. Pages of one PDF may arrive out of order; a file's
+    `done` marker is yielded as (path, None, None) once all of its tasks
+    completed successfully, including for PDFs without pages.
+
+    `pool` is an executor to submit to instead of starting a fresh process
+    pool; it is left running, for callers that keep one for their lifetime.
+    """
+    files = [Path(path) for path in files]
+    if stats is not None:
+        stats.files_total = len(files)
+    workers = workers or os.cpu_count() or 1
+
+    queue = deque((path, None, None) for path in files)
+    remaining = {path: 1 for path in files}
+    failed = set()
+
+    def finish(path, result, error):
+        pages, n_pages = result if error is None else ([], None)
+        if error is not None:
+            failed.add(path)
+            if stats is not None:
+                stats.error(path.name, error)
+        if n_pages is not None:
+            for first in range(pages_per_task, n_pages, pages_per_task):
+                queue.append((path, first, min(first + pages_per_task, n_pages)))
+                remaining[path] += 1
+        for page, text in pages:
+            if stats is not None and page is not None:
+                stats.pages += 1
+            yield path, page, text
+        remaining[path] -= 1
+        if remaining[path] == 0 and path not in failed:
+            if stats is not None:
+                stats.docs += 1
+            yield path, None, None
+
+    # A single task is not worth starting a process pool for; a single large
+    # PDF is counted inline and only its remaining page ranges go to the pool
+    while queue and (workers == 1 or len(queue) == 1):
+        path, first, last = queue.popleft()
+        try:
+            result, error = _run_task((str(path), first, last, pages_per_task)), None
+        except Exception as e:
+            result, error = None, e
+        yield from finish(path, result, error)
+    if not queue:
+        return
+
+    owned = pool is None
+    if owned:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    in_flight = {}
+    try:
+        while queue or in_flight:
+            while queue and len(in_flight) < workers * 2:
+                path, first, last = queue.popleft()
+                in_flight[pool.submit(_run_task, (str(path), first, last, pages_per_task))] = path
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = in_flight.pop(future)
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, e
+                yield from finish(path, result, error)
+    finally:
+        for future in in_flight:
+            future.cancel()
+        if owned:
+            pool.shutdown()
@@ -1,12 +1,9 @@
 # modules/interactions.py
 import streamlit as st
-import tempfile
-import docx
-from PyPDF2 import PdfReader
-import speech_recognition as sr
-from modules.ai_engine import generate_clinical_answer, text_to_pdf, text_to_speech
+from modules.ai_engine import (generate_clinical_answer_stream, generate_document_answer_stream, text_to_pdf,
+                               text_to_speech)
 from modules.rag_engine import retrieve_relevant_chunks
-from config import DEBUG, TEMP_PATH
+from config import DEBUG
 
 # -----------------------------------------------------------
 #               CLINICAL DIAGNOSIS MODULE (FINAL)
@@ -41,6 +38,7 @@ def chat_diagnosis_module():
     )
 
     user_query = ""
+    document_pages = None
     submitted = False
 
     # =======================================================
@@ -54,18 +52,16 @@ def chat_diagnosis_module():
     #                     VOICE INPUT
     # =======================================================
     elif input_type == "Voice":
-        st.info("Upload a short MP3/WAV recording describing symptoms.")
+        st.info("Upload an MP3/WAV recording describing symptoms.")
         audio_file = st.file_uploader("Upload Voice File:", type=["mp3", "wav"])
         submitted = st.button("Transcribe & Get Clinical Answer")
         if audio_file and submitted:
             try:
-                recognizer = sr.Recognizer()
-                with tempfile.NamedTemporaryFile(delete=False) as tmp:
-                    tmp.write(audio_file.read())
-                    tmp_path = tmp.name
-                with sr.AudioFile(tmp_path) as source:
-                    audio_data = recognizer.record(source)
-                user_query = recognizer.recognize_google(audio_data)
+                from modules.speech_engine import transcribe_audio
+                with st.spinner("Transcribing..."):
+                    user_query = transcribe_audio(audio_file.getvalue(), audio_file.name)
+                if not user_query:
+                    raise ValueError("no speech detected in the recording")
                 st.success(f"Transcribed Text: {user_query}")
             except Exception as e:
                 st.error(f"Unable to recognize speech: {e}")
@@ -82,18 +78,12 @@ def chat_diagnosis_module():
         submitted = st.button("Process File & Get Clinical Answer")
         if uploaded_file and submitted:
             try:
-                text_content = ""
-                if uploaded_file.type == "application/pdf":
-                    reader = PdfReader(uploaded_file)
-                    for page in reader.pages:
-                        text_content += page.extract_text() or ""
-                elif uploaded_file.type == "text/plain":
-                    text_content = uploaded_file.read().decode("utf-8")
-                elif uploaded_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                    doc = docx.Document(uploaded_file)
-                    text_content = "\n".join([p.text for p in doc.paragraphs])
-                user_query = text_content
-                st.success("File processed successfully.")
+                from modules.document_query import extract_upload
+                with st.spinner("Extracting document..."):
+                    document_pages = extract_upload(uploaded_file.getvalue(), uploaded_file.name)
+                # The document itself is searched chunk by chunk, not used as one query
+                user_query = "\n".join(text for _, text in document_pages)
+                st.success(f"File processed successfully ({len(document_pages)} page(s)).")
             except Exception as e:
                 st.error(f"Error reading file: {e}")
                 submitted = False
@@ -102,41 +92,60 @@ def chat_diagnosis_module():
     #           Generate Clinical Answer
     # =======================================================
     if submitted and user_query.strip():
-        with st.spinner("Analyzing symptoms and retrieving medical knowledge..."):
-            try:
-                answer = generate_clinical_answer(user_query)
-            except Exception as e:
-                answer = "⚠️ Failed to generate answer. Please check your configuration."
-                if DEBUG:
-                    st.error(f"[DEBUG] {e}")
-
-        # Display Result
+        # Display Result as it streams in
         st.subheader("✅ Clinical Answer")
-        st.markdown(answer.replace("\n", "  \n- "), unsafe_allow_html=True)
+        placeholder = st.empty()
+        placeholder.markdown("_Analyzing symptoms and retrieving medical knowledge..._")
+        answer = ""
+        try:
+            if document_pages is not None:
+                events = generate_document_answer_stream(document_pages)
+            else:
+                events = generate_clinical_answer_stream(user_query)
+            for event in events:
+                if event["type"] == "token":
+                    answer += event["text"]
+                    placeholder.markdown(answer.replace("\n", "  \n- ") + " ▌", unsafe_allow_html=True)
+                elif event["type"] == "reset":
+                    answer = ""
+                    placeholder.markdown("_Switching to the next medical source..._")
+                elif event["type"] == "done":
+                    answer = event["answer"]
+                    if DEBUG:
+                        ttft = f"{event['ttft_s']:.2f}s" if event["ttft_s"] is not None else "n/a"
+                        st.caption(f"[DEBUG] source: {event['source']}, first token: {ttft}, "
+                                   f"total: {event['total_s']:.2f}s")
+        except Exception as e:
+            answer = "⚠️ Failed to generate answer. Please check your configuration."
+            if DEBUG:
+                st.error(f"[DEBUG] {e}")
+        placeholder.markdown(answer.replace("\n", "  \n- "), unsafe_allow_html=True)
+        # Kept per session so the export buttons below survive Streamlit's rerun
+        st.session_state["clinical_answer"] = answer
 
-        # Optional Outputs
+    # =======================================================
+    #           Optional Outputs (rendered in memory)
+    # =======================================================
+    answer = st.session_state.get("clinical_answer")
+    if answer:
         col1, col2 = st.columns(2)
 
         # PDF
         with col1:
-            if st.button("Download as PDF"):
-                try:
-                    pdf_file = text_to_pdf(answer)
-                    with open(pdf_file, "rb") as f:
-                        st.download_button(
-                            label="Download PDF",
-                            data=f.read(),
-                            file_name="clinical_answer.pdf",
-                            mime="application/pdf"
-                        )
-                except Exception as e:
-                    st.error(f"Failed to generate PDF: {e}")
+            try:
+                st.download_button(
+                    label="Download as PDF",
+                    data=text_to_pdf(answer),
+                    file_name="clinical_answer.pdf",
+                    mime="application/pdf"
+                )
+            except Exception as e:
+                st.error(f"Failed to generate PDF: {e}")
 
         # TTS Audio
         with col2:
             if st.button("Play as Voice"):
                 try:
-                    tts_file = text_to_speech(answer)
-                    st.audio(tts_file, format="audio/mp3")
+                    st.audio(text_to_speech(answer), format="audio/mp3")
                 except Exception as e:
                     st.error(f"Failed to generate audio: {e}")
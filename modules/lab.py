@@ -1,44 +1,7 @@
 import streamlit as st
 import pandas as pd
 from config import DEBUG
-
-# ------------------------------
-# Sample Lab Reference Data
-# ------------------------------
-LAB_REF_DATA = {
-    "Hemoglobin": {"unit": "g/dL", "normal_male": (13.5, 17.5), "normal_female": (12.0, 15.5)},
-    "WBC": {"unit": "10^3/uL", "normal": (4.0, 11.0)},
-    "Platelets": {"unit": "10^3/uL", "normal": (150, 450)},
-    "Creatinine": {"unit": "mg/dL", "normal": (0.7, 1.3)},
-    "BUN": {"unit": "mg/dL", "normal": (7, 20)},
-    "ALT": {"unit": "U/L", "normal": (7, 56)},
-    "AST": {"unit": "U/L", "normal": (10, 40)},
-    "TSH": {"unit": "uIU/mL", "normal": (0.4, 4.0)},
-    "Troponin": {"unit": "ng/mL", "normal": (0, 0.04)}
-}
-
-# ------------------------------
-# Lab Interpretation
-# ------------------------------
-def interpret_lab(test_name, value, gender=None):
-    ref = LAB_REF_DATA.get(test_name)
-    if not ref:
-        return f"No reference data available for {test_name}."
-
-    low, high = ref.get("normal", (None, None))
-    # Gender-specific ranges
-    if gender and f"normal_{gender.lower()}" in ref:
-        low, high = ref[f"normal_{gender.lower()}"]
-
-    if low is None or high is None:
-        return "Reference range not defined."
-
-    if value < low:
-        return f"{test_name}: {value} {ref['unit']} (Low) – Possible causes: anemia, blood loss, malnutrition."
-    elif value > high:
-        return f"{test_name}: {value} {ref['unit']} (High) – Possible causes: infection, dehydration, liver/kidney dysfunction."
-    else:
-        return f"{test_name}: {value} {ref['unit']} (Normal)."
+from modules.lab_engine import LAB_REF_DATA, interpret_lab, interpret_results
 
 # ------------------------------
 # Streamlit UI
@@ -59,6 +22,28 @@ def lab_module_ui():
         result = interpret_lab(test_name, value, gender)
         st.success(result)
 
+    st.subheader("Batch Interpretation (CSV)")
+    st.caption("Either test,value[,sex] rows, or one row per patient with a column per test "
+               "(e.g. Hemoglobin, WBC) and an optional sex column.")
+    uploaded = st.file_uploader("Upload lab results:", type=["csv"], key="lab_results_file")
+    if uploaded is not None:
+        try:
+            result = interpret_results(pd.read_csv(uploaded))
+        except Exception as e:
+            st.error("Could not interpret the uploaded file. Please check its columns.")
+            if DEBUG:
+                st.error(f"[DEBUG] {e}")
+            return
+        flag_columns = [c for c in result.columns if c == "flag" or c.endswith("_flag")]
+        if not flag_columns:
+            st.warning("No known lab tests found in the uploaded file.")
+            return
+        counts = pd.concat([result[c].astype(str) for c in flag_columns]).value_counts()
+        st.success(f"Interpreted {len(result)} rows: " + ", ".join(f"{k} {v}" for k, v in counts.items()))
+        st.dataframe(result.head(200))
+        st.download_button("Download Interpretation (CSV)", result.to_csv(index=False).encode("utf-8"),
+                           file_name="lab_interpretation.csv", mime="text/csv")
+
 # ------------------------------
 # Direct run
 # ------------------------------
@@ -0,0 +1,80 @@
+# modules/lab_benchmark.py
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from modules.lab_engine import LAB_REF_DATA, interpret_lab, interpret_batch
+
+# ------------------------------
+# Synthetic results
+# ------------------------------
+def synthetic_results(n_rows, seed=0):
+    """Long-format results spread around each test's reference range."""
+    rng = np.random.default_rng(seed)
+    tests = np.array(list(LAB_REF_DATA), dtype=object)
+    test = tests[rng.integers(0, len(tests), n_rows)]
+    centre = np.empty(n_rows)
+    for name, ref in LAB_REF_DATA.items():
+        low, high = ref.get("normal", ref.get("normal_male"))
+        mask = test == name
+        centre[mask] = rng.uniform(low - (high - low) * 0.3, high + (high - low) * 0.3, mask.sum())
+    sex = np.array(["Male", "Female"], dtype=object)[rng.integers(0, 2, n_rows)]
+    return pd.DataFrame({"patient": np.arange(n_rows) // len(tests), "test": test,
+                         "value": centre.round(2), "sex": sex})
+
+def _scalar_flag(text):
+    for flag in ("Low", "High", "Normal"):
+        if f"({flag})" in text:
+            return flag
+    return "No range" if text.startswith("Reference range") else "Unknown test"
+
+# ------------------------------
+# Benchmark
+# ------------------------------
+def run_benchmark(n_rows=1_000_000, scalar_rows=100_000, seed=0):
+    """rows/s of interpret_lab (row by row) vs interpret_batch, and their agreement."""
+    df = synthetic_results(n_rows, seed)
+
+    start = time.perf_counter()
+    batch = interpret_batch(df)
+    batch_s = time.perf_counter() - start
+
+    sample = df.iloc[:scalar_rows]
+    start = time.perf_counter()
+    scalar = [interpret_lab(t, v, s) for t, v, s in zip(sample["test"], sample["value"], sample["sex"])]
+    scalar_s = time.perf_counter() - start
+
+    agree = np.mean(np.array([_scalar_flag(text) for text in scalar], dtype=object)
+                    == batch["flag"].iloc[:scalar_rows].astype(str).to_numpy())
+    return {
+        "batch_rows": n_rows,
+        "batch_s": batch_s,
+        "batch_rows_per_s": n_rows / batch_s,
+        "scalar_rows": len(sample),
+        "scalar_s": scalar_s,
+        "scalar_rows_per_s": len(sample) / scalar_s,
+        "speedup": (n_rows / batch_s) / (len(sample) / scalar_s),
+        "agreement": float(agree),
+    }
+
+# ------------------------------
+# CLI: python -m modules.lab_benchmark
+# ------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare scalar and batch lab interpretation throughput.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows for the batch interpreter")
+    parser.add_argument("--scalar-rows", type=int, default=100_000, help="rows for the scalar function")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rows, args.scalar_rows, args.seed)
+    print(f"scalar interpret_lab : {results['scalar_rows_per_s']:>14,.0f} rows/s ({results['scalar_rows']} rows)")
+    print(f"batch interpret_batch: {results['batch_rows_per_s']:>14,.0f} rows/s ({results['batch_rows']} rows)")
+    print(f"speedup {results['speedup']:.0f}x, flag agreement {results['agreement']:.2%}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
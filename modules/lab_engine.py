@@ -0,0 +1,174 @@
+# modules/lab_engine.py
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# ------------------------------
+# Sample Lab Reference Data
+# ------------------------------
+LAB_REF_DATA = {
+    "Hemoglobin": {"unit": "g/dL", "normal_male": (13.5, 17.5), "normal_female": (12.0, 15.5)},
+    "WBC": {"unit": "10^3/uL", "normal": (4.0, 11.0)},
+    "Platelets": {"unit": "10^3/uL", "normal": (150, 450)},
+    "Creatinine": {"unit": "mg/dL", "normal": (0.7, 1.3)},
+    "BUN": {"unit": "mg/dL", "normal": (7, 20)},
+    "ALT": {"unit": "U/L", "normal": (7, 56)},
+    "AST": {"unit": "U/L", "normal": (10, 40)},
+    "TSH": {"unit": "uIU/mL", "normal": (0.4, 4.0)},
+    "Troponin": {"unit": "ng/mL", "normal": (0, 0.04)}
+}
+
+# ------------------------------
+# Lab Interpretation
+# ------------------------------
+def interpret_lab(test_name, value, gender=None):
+    ref = LAB_REF_DATA.get(test_name)
+    if not ref:
+        return f"No reference data available for {test_name}."
+
+    low, high = ref.get("normal", (None, None))
+    # Gender-specific ranges
+    if gender and f"normal_{gender.lower()}" in ref:
+        low, high = ref[f"normal_{gender.lower()}"]
+
+    if low is None or high is None:
+        return "Reference range not defined."
+
+    if value < low:
+        return f"{test_name}: {value} {ref['unit']} (Low) – Possible causes: anemia, blood loss, malnutrition."
+    elif value > high:
+        return f"{test_name}: {value} {ref['unit']} (High) – Possible causes: infection, dehydration, liver/kidney dysfunction."
+    else:
+        return f"{test_name}: {value} {ref['unit']} (Normal)."
+
+# ------------------------------
+# Array-backed reference table
+# ------------------------------
+# Flags produced by the batch interpreter, in code order
+FLAGS = ["Low", "Normal", "High", "Unknown test", "No range", "Invalid value"]
+SEXES = ("male", "female")
+
+def _map_distinct(values, lookup):
+    """Apply `lookup` once per distinct value and broadcast the results (missing values map like None)."""
+    if not isinstance(values, pd.Series):
+        values = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    mapped = np.array([lookup(value) for value in uniques] + [lookup(None)], dtype=np.intp)
+    return mapped[codes]
+
+class LabReferenceTable:
+    """
+    LAB_REF_DATA compiled into arrays for vectorized lookups.
+
+    `low`/`high` have shape (3, n_tests): row 0 is the general range, rows
+    1 and 2 the male and female ranges (falling back to the general range,
+    as `interpret_lab` does). Missing ranges are NaN.
+    """
+
+    def __init__(self, ref_data=LAB_REF_DATA):
+        self.tests = list(ref_data)
+        self.units = np.array([ref_data[test].get("unit", "") for test in self.tests], dtype=object)
+        self.low = np.full((1 + len(SEXES), len(self.tests)), np.nan)
+        self.high = np.full_like(self.low, np.nan)
+        for j, test in enumerate(self.tests):
+            ref = ref_data[test]
+            general = ref.get("normal", (None, None))
+            for i, sex in enumerate((None,) + SEXES):
+                low, high = ref.get(f"normal_{sex}", general) if sex else general
+                self.low[i, j] = np.nan if low is None else low
+                self.high[i, j] = np.nan if high is None else high
+
+    def test_codes(self, names):
+        """Column index of each test name, -1 for tests without reference data."""
+        index = {test: j for j, test in enumerate(self.tests)}
+        return _map_distinct(names, lambda name: index.get(name, -1))
+
+    def sex_codes(self, sexes, size):
+        """Range row of each sex: 1 male, 2 female, 0 anything else or missing."""
+        if sexes is None or isinstance(sexes, str):
+            sexes = np.full(size, sexes, dtype=object)
+        rows = {sex: i + 1 for i, sex in enumerate(SEXES)}
+        return _map_distinct(sexes, lambda sex: rows.get(sex.lower(), 0) if isinstance(sex, str) else 0)
+
+    def flag(self, test_codes, sex_codes, values):
+        """Flag codes (indexes into FLAGS) plus the low/high bounds used, one pass over arrays."""
+        known = test_codes >= 0
+        columns = np.where(known, test_codes, 0)
+        low = np.where(known, self.low[sex_codes, columns], np.nan)
+        high = np.where(known, self.high[sex_codes, columns], np.nan)
+        codes = np.select(
+            [~known, np.isnan(low) | np.isnan(high), np.isnan(values), values < low, values > high],
+            [3, 4, 5, 0, 2],
+            default=1,
+        ).astype(np.int8)
+        return codes, low, high
+
+_TABLE = None
+
+def get_reference_table() -> LabReferenceTable:
+    global _TABLE
+    if _TABLE is None:
+        _TABLE = LabReferenceTable(LAB_REF_DATA)
+    return _TABLE
+
+# ------------------------------
+# Batch interpretation
+# ------------------------------
+def _numeric(values):
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64")
+
+def interpret_batch(df, test_col="test", value_col="value", sex_col="sex", table=None):
+    """
+    Flag a long-format results table (one row per patient and test).
+
+    Returns a copy of `df` with `unit`, `low`, `high` and a categorical
+    `flag` column (see FLAGS). Sex-specific ranges are used when `sex_col`
+    is present.
+    """
+    table = table or get_reference_table()
+    tests = table.test_codes(df[test_col])
+    sexes = table.sex_codes(df[sex_col] if sex_col in df else None, len(df))
+    codes, low, high = table.flag(tests, sexes, _numeric(df[value_col]))
+    out = df.copy()
+    out["unit"] = np.where(tests >= 0, table.units[np.maximum(tests, 0)], None)
+    out["low"] = low
+    out["high"] = high
+    out["flag"] = pd.Categorical.from_codes(codes, FLAGS)
+    return out
+
+def interpret_panel(df, sex_col="sex", table=None):
+    """
+    Flag a wide panel table (one row per patient, one column per test).
+
+    Every column named after a test in the reference table gets a
+    `<test>_flag` column next to the original data.
+    """
+    table = table or get_reference_table()
+    sexes = table.sex_codes(df[sex_col] if sex_col in df else None, len(df))
+    out = df.copy()
+    for test in (column for column in df.columns if column in table.tests):
+        tests = np.full(len(df), table.tests.index(test), dtype=np.intp)
+        codes, _, _ = table.flag(tests, sexes, _numeric(df[test]))
+        out[f"{test}_flag"] = pd.Categorical.from_codes(codes, FLAGS)
+    return out
+
+def interpret_results(df, table=None):
+    """Long format if `df` has `test` and `value` columns, otherwise a wide panel."""
+    columns = {column.lower(): column for column in df.columns}
+    if "test" in columns and "value" in columns:
+        return interpret_batch(df, columns["test"], columns["value"], columns.get("sex", "sex"), table)
+    return interpret_panel(df, columns.get("sex", "sex"), table)
+
+# ------------------------------
+# CLI: python -m modules.lab_engine
+# ------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flag lab results in a CSV file as Low/Normal/High.")
+    parser.add_argument("input", help="CSV with test,value[,sex] columns or one column per test")
+    parser.add_argument("output", help="CSV to write (inputs plus flags)")
+    args = parser.parse_args()
+
+    result = interpret_results(pd.read_csv(args.input))
+    result.to_csv(args.output, index=False)
+    print(f"{len(result)} rows -> {args.output}")
@@ -0,0 +1,254 @@
+# modules/lexical_index.py
+import os
+import re
+import json
+import mmap
+import struct
+import hashlib
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from config import BM25_K1, BM25_B
+
+# ------------------------------
+# Tokenizer
+# ------------------------------
+# Terms keep internal . / - + so that "140/90", "hba1c", "0.5" and
+# "co-amoxiclav" stay whole; compound terms are also indexed by their parts.
+_TERM = re.compile(r"[^\W_]+(?:[./+\-][^\W_]+)*")
+_TERM_SEPARATORS = re.compile(r"[./+\-]")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with "
+    "what when how who why does do can should i my me".split()
+)
+
+def query_words(text):
+    """All lower-cased terms of `text`, stopwords included."""
+    return _TERM.findall(text.lower())
+
+def tokenize(text):
+    """Index terms of `text`: lower-cased, stopwords removed, compound terms plus their parts."""
+    terms = []
+    for term in query_words(text):
+        if term in STOPWORDS:
+            continue
+        terms.append(term)
+        if _TERM_SEPARATORS.search(term):
+            terms.extend(part for part in _TERM_SEPARATORS.split(term) if part and part not in STOPWORDS)
+    return terms
+
+def _term_hash(term):
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+# ------------------------------
+# File layout
+# ------------------------------
+# Like the chunk store, a BM25 index is a single memory-mapped file:
+#
+#   magic (8 bytes) | header length (uint32) | JSON header | padding
+#   | term table (TERM_DTYPE, sorted by hash) | doc table (DOC_DTYPE, by row)
+#   | posting rows (uint32) | posting term frequencies (uint16)
+#
+# Terms are stored as 64-bit hashes, so the vocabulary costs 24 bytes per
+# term and a lookup is a binary search. Each term's postings are one
+# contiguous, row-sorted slice; a query only touches the slices of its terms.
+MAGIC = b"HC360BM1"
+TERM_DTYPE = np.dtype([
+    ("hash", "<u8"),
+    ("offset", "<u8"),   # first posting of the term
+    ("df", "<u4"),       # number of chunks containing the term
+    ("pad", "<u4"),
+])
+DOC_DTYPE = np.dtype([
+    ("id", "<i8"),       # chunk id in the chunk store / FAISS index
+    ("length", "<u4"),   # number of index terms in the chunk
+    ("pad", "<u4"),
+])
+_ALIGN = 8
+
+def _aligned(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+# ------------------------------
+# Reader
+# ------------------------------
+class BM25Index:
+    """Read-only, memory-mapped BM25 index over the chunks of a chunk store."""
+
+    def __init__(self, path, k1=BM25_K1, b=BM25_B):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a BM25 index")
+        (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(self._mm[header_start:header_start + header_len].decode("utf-8"))
+        self.avgdl = header["avgdl"] or 1.0
+        self._terms = np.frombuffer(self._mm, dtype=TERM_DTYPE, count=header["terms"],
+                                    offset=header["terms_offset"])
+        self._docs = np.frombuffer(self._mm, dtype=DOC_DTYPE, count=header["docs"],
+                                   offset=header["docs_offset"])
+        self._rows = np.frombuffer(self._mm, dtype="<u4", count=header["postings"],
+                                   offset=header["rows_offset"])
+        self._tfs = np.frombuffer(self._mm, dtype="<u2", count=header["postings"],
+                                  offset=header["tfs_offset"])
+
+    def __len__(self):
+        return len(self._docs)
+
+    @property
+    def vocabulary_size(self):
+        return len(self._terms)
+
+    def _term(self, term):
+        """Row of `term` in the term table, or None if no chunk contains it."""
+        key = np.uint64(_term_hash(term))
+        row = int(np.searchsorted(self._terms["hash"], key))
+        if row < len(self._terms) and self._terms["hash"][row] == key:
+            return row
+        return None
+
+    def contains_all(self, terms):
+        return all(self._term(term) is not None for term in terms)
+
+    def _term_scores(self, row):
+        entry = self._terms[row]
+        start, df = int(entry["offset"]), int(entry["df"])
+        rows = self._rows[start:start + df]
+        tfs = self._tfs[start:start + df].astype(np.float32)
+        idf = np.log1p((len(self._docs) - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * self._docs["length"][rows] / self.avgdl)
+        return rows, (idf * tfs * (self.k1 + 1) / (tfs + norm)).astype(np.float32)
+
+    def search(self, query, top_k=5):
+        """(chunk_id, score) of the `top_k` best BM25 matches for `query`, best first."""
+        term_rows = [row for row in (self._term(term) for term in set(tokenize(query))) if row is not None]
+        if not term_rows or top_k <= 0:
+            return []
+        postings = [self._term_scores(row) for row in term_rows]
+        if len(postings) == 1:
+            rows, scores = postings[0]
+        else:
+            rows, inverse = np.unique(np.concatenate([rows for rows, _ in postings]), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate([scores for _, scores in postings]))
+        if len(rows) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            rows, scores = rows[best], scores[best]
+        order = np.lexsort((rows, -scores))
+        ids = self._docs["id"][rows[order]]
+        return [(int(chunk_id), float(score)) for chunk_id, score in zip(ids, scores[order])]
+
+    def search_batch(self, queries, top_k=5):
+        return [self.search(query, top_k) for query in queries]
+
+def open_lexical_index(path, k1=BM25_K1, b=BM25_B):
+    """Open the BM25 index at `path`, or return None if it does not exist."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    return BM25Index(path, k1, b)
+
+# ------------------------------
+# Writer
+# ------------------------------
+class BM25Writer:
+    """
+    Builds a BM25 index file from (chunk_id, text) pairs.
+
+    Postings are collected as compact numpy arrays every `flush_every`
+    chunks; `close()` sorts them by term and row, writes the file next to
+    `path` and swaps it in atomically.
+    """
+
+    def __init__(self, path, flush_every=10000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self._vocabulary = {}
+        self._ids, self._lengths = [], []
+        self._pending = ([], [], [])
+        self._batches = []
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, chunk_id, text):
+        row = len(self._ids)
+        terms = tokenize(text)
+        self._ids.append(int(chunk_id))
+        self._lengths.append(len(terms))
+        term_ids, rows, tfs = self._pending
+        for term, tf in Counter(terms).items():
+            term_ids.append(self._vocabulary.setdefault(term, len(self._vocabulary)))
+            rows.append(row)
+            tfs.append(min(tf, 0xFFFF))
+        if len(self._ids) % self.flush_every == 0:
+            self._flush()
+
+    def _flush(self):
+        term_ids, rows, tfs = self._pending
+        if term_ids:
+            self._batches.append((np.array(term_ids, dtype=np.uint32), np.array(rows, dtype=np.uint32),
+                                  np.array(tfs, dtype=np.uint16)))
+        self._pending = ([], [], [])
+
+    def close(self):
+        self._flush()
+        hashes = np.array([_term_hash(term) for term in self._vocabulary], dtype=np.uint64)
+        if self._batches:
+            posting_hashes = hashes[np.concatenate([term_ids for term_ids, _, _ in self._batches])]
+            rows = np.concatenate([rows for _, rows, _ in self._batches])
+            tfs = np.concatenate([tfs for _, _, tfs in self._batches])
+        else:
+            posting_hashes = np.zeros(0, dtype=np.uint64)
+            rows, tfs = np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint16)
+        self._batches = []
+        # Sorting by hash then row groups each term's postings, row-sorted; a
+        # (vanishingly rare) hash collision merges two terms into one
+        order = np.lexsort((rows, posting_hashes))
+        posting_hashes, rows, tfs = posting_hashes[order], rows[order], tfs[order]
+        unique, offsets, dfs = np.unique(posting_hashes, return_index=True, return_counts=True)
+
+        terms = np.zeros(len(unique), dtype=TERM_DTYPE)
+        terms["hash"], terms["offset"], terms["df"] = unique, offsets, dfs
+        docs = np.zeros(len(self._ids), dtype=DOC_DTYPE)
+        docs["id"], docs["length"] = self._ids, self._lengths
+
+        header = {"docs": len(docs), "terms": len(terms), "postings": len(rows),
+                  "avgdl": float(docs["length"].mean()) if len(docs) else 0.0,
+                  "terms_offset": 0, "docs_offset": 0, "rows_offset": 0, "tfs_offset": 0}
+        sections = [("terms_offset", terms), ("docs_offset", docs), ("rows_offset", rows), ("tfs_offset", tfs)]
+        # Header offsets depend on the header's own length; iterate until stable
+        while True:
+            header_bytes = json.dumps(header).encode("utf-8")
+            offset, changed = len(MAGIC) + 4 + len(header_bytes), False
+            for key, array in sections:
+                offset = _aligned(offset)
+                changed |= header[key] != offset
+                header[key] = offset
+                offset += array.nbytes
+            if not changed:
+                break
+
+        tmp_path = Path(f"{self.path}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            for key, array in sections:
+                f.write(b"\0" * (header[key] - f.tell()))
+                f.write(array.tobytes())
+        os.replace(tmp_path, self.path)
+        return header
+
+def build_lexical_index(store, path):
+    """Write the BM25 index of every chunk in `store` (a ChunkStore) to `path`."""
+    writer = BM25Writer(path)
+    for chunk_id, text in store.iter_texts():
+        writer.add(chunk_id, text)
+    return writer.close()
@@ -0,0 +1,365 @@
+# modules/llm_client.py
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (DEBUG, GEMINI_API_KEY, GEMINI_API_URL, GROQ_API_KEY, GROQ_API_URL,
+                    LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT, GEMINI_READ_TIMEOUT, GROQ_READ_TIMEOUT,
+                    LLM_RETRIES, LLM_BACKOFF, LLM_POOL_SIZE, LLM_BREAKER_FAILURES, LLM_BREAKER_RESET,
+                    LLM_HEDGE_TIMEOUT, LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_BYTES)
+from modules.disk_cache import DiskCache
+from modules.metrics import count, span
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class StreamInterrupted(Exception):
+    """A provider stream failed after some of the answer was already yielded."""
+
+# ------------------------------
+# Circuit breaker
+# ------------------------------
+class CircuitBreaker:
+    """
+    Stops calling a provider after `failure_threshold` consecutive failures.
+
+    After `reset_timeout` seconds one trial call is let through (half-open);
+    success closes the circuit again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURES, reset_timeout=LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """End a call whose outcome is unknown (e.g. an abandoned stream) without counting it."""
+        with self._lock:
+            self._trial_in_flight = False
+
+# ------------------------------
+# Response cache
+# ------------------------------
+_RESPONSE_CACHE = None
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+def get_response_cache():
+    """Shared on-disk LLM response cache, or None when LLM_CACHE_PATH is empty."""
+    global _RESPONSE_CACHE
+    if _RESPONSE_CACHE is None and LLM_CACHE_PATH:
+        with _RESPONSE_CACHE_LOCK:
+            if _RESPONSE_CACHE is None:
+                _RESPONSE_CACHE = DiskCache(LLM_CACHE_PATH, LLM_CACHE_TTL or None, LLM_CACHE_MAX_BYTES)
+    return _RESPONSE_CACHE
+
+def response_cache_key(provider, model, payload):
+    """Content address of a request: provider, model, prompt and generation parameters."""
+    blob = json.dumps({"provider": provider, "model": model, "payload": payload},
+                      sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+# ------------------------------
+# Provider client
+# ------------------------------
+class ProviderClient:
+    """
+    Pooled, timeout-bounded HTTP client for one LLM provider.
+
+    Uses a keep-alive `requests.Session`, retries connection errors, timeouts
+    and 429/5xx responses with exponential backoff, and trips a circuit
+    breaker when the provider keeps failing. `complete` returns "" on any
+    failure so callers can fall through to the next provider.
+
+    Successful answers are stored in `cache` (the shared DiskCache by
+    default) so identical requests are answered locally.
+    """
+
+    def __init__(self, name, url, api_key, build_payload, parse_response, model=None,
+                 stream_url=None, parse_stream_event=None,
+                 connect_timeout=LLM_CONNECT_TIMEOUT, read_timeout=LLM_READ_TIMEOUT,
+                 retries=LLM_RETRIES, backoff=LLM_BACKOFF, pool_size=LLM_POOL_SIZE, breaker=None,
+                 cache=None):
+        self.name = name
+        self.model = model or name
+        self.url = url
+        self.stream_url = stream_url or url
+        self.parse_stream_event = parse_stream_event
+        self.cache = cache if cache is not None else get_response_cache()
+        self.api_key = api_key
+        self.build_payload = build_payload
+        self.parse_response = parse_response
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _sleep_before_retry(self, attempt):
+        time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    def _send(self, url, payload, stream=False):
+        """POST `payload` with retries; returns the response or raises."""
+        last_error = None
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout, stream=stream)
+                if response.status_code in RETRY_STATUS and attempt < self.retries:
+                    response.close()
+                    last_error = requests.HTTPError(f"{response.status_code} from {self.name}")
+                    self._sleep_before_retry(attempt)
+                    continue
+                response.raise_for_status()
+                return response
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                if attempt < self.retries:
+                    self._sleep_before_retry(attempt)
+        raise last_error
+
+    def post(self, payload):
+        """POST `payload` with retries; returns the decoded JSON or raises."""
+        return self._send(self.url, payload).json()
+
+    def _cache_get(self, key):
+        if not self.cache:
+            return None
+        try:
+            value = self.cache.get(key)
+        except Exception as e:
+            if DEBUG: print(f"[DEBUG] LLM cache read failed: {e}")
+            return None
+        return value.decode("utf-8") if value is not None else None
+
+    def _cache_set(self, key, text):
+        if not self.cache:
+            return
+        try:
+            self.cache.set(key, text.encode("utf-8"))
+        except Exception as e:
+            if DEBUG: print(f"[DEBUG] LLM cache write failed: {e}")
+
+    def complete(self, prompt: str) -> str:
+        if not self.api_key:
+            if DEBUG: print(f"[DEBUG] {self.name.upper()}_API_KEY missing in .env")
+            return ""
+        payload = self.build_payload(prompt)
+        key = response_cache_key(self.name, self.model, payload)
+        cached = self._cache_get(key)
+        if cached is not None:
+            count("llm_cache_hits_total", provider=self.name)
+            return cached
+        if not self.breaker.allow():
+            count("llm_requests_total", provider=self.name, outcome="circuit_open")
+            if DEBUG: print(f"[DEBUG] {self.name} circuit open, skipping")
+            return ""
+        try:
+            with span(f"llm.{self.name}"):
+                text = self.parse_response(self.post(payload))
+        except Exception as e:
+            self.breaker.record_failure()
+            count("llm_requests_total", provider=self.name, outcome="error")
+            if DEBUG: print(f"[DEBUG] {self.name} API error: {e}")
+            return ""
+        self.breaker.record_success()
+        count("llm_requests_total", provider=self.name, outcome="ok")
+        if text and text.strip():
+            self._cache_set(key, text)
+        return text or ""
+
+    def stream(self, prompt: str):
+        """
+        Yield answer text pieces as the provider streams them (server-sent events).
+
+        Retries only cover establishing the stream. If the endpoint rejects
+        stream mode (an HTTP 4xx other than 429), the answer is requested
+        with `complete` instead and yielded as one piece, as it is for
+        providers without a streaming endpoint and for cached answers. Any
+        other failure before the first piece yields nothing, like `complete`
+        returning "", so the caller moves on to its next tier without a
+        second round of retries. A failure mid-answer raises
+        StreamInterrupted so the partial text can be discarded.
+        """
+        if not self.api_key:
+            if DEBUG: print(f"[DEBUG] {self.name.upper()}_API_KEY missing in .env")
+            return
+        payload = self.build_payload(prompt)
+        key = response_cache_key(self.name, self.model, payload)
+        cached = self._cache_get(key)
+        if cached is not None:
+            count("llm_cache_hits_total", provider=self.name)
+            yield cached
+            return
+        if self.parse_stream_event is None:
+            text = self.complete(prompt)
+            if text:
+                yield text
+            return
+        if not self.breaker.allow():
+            count("llm_requests_total", provider=self.name, outcome="circuit_open")
+            if DEBUG: print(f"[DEBUG] {self.name} circuit open, skipping")
+            return
+
+        pieces = []
+        try:
+            with span(f"llm.{self.name}.connect"):
+                response = self._send(self.stream_url, {**payload, "stream": True}, stream=True)
+            with response:
+                for event in iter_sse_events(response):
+                    text = self.parse_stream_event(event)
+                    if text:
+                        pieces.append(text)
+                        yield text
+        except Exception as e:
+            if not pieces and _rejected(e):
+                # The endpoint answered but refused stream mode; plain completion may work
+                if DEBUG: print(f"[DEBUG] {self.name} rejected streaming ({e}), completing instead")
+                self.breaker.release()
+                text = self.complete(prompt)
+                if text:
+                    yield text
+                return
+            self.breaker.record_failure()
+            count("llm_requests_total", provider=self.name, outcome="error")
+            if DEBUG: print(f"[DEBUG] {self.name} streaming error: {e}")
+            if pieces:
+                raise StreamInterrupted(f"{self.name} stream interrupted: {e}") from e
+            return
+        except BaseException:
+            # GeneratorExit when the consumer abandons the stream (e.g. a Streamlit rerun):
+            # free a half-open trial so the provider is not left disabled
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        count("llm_requests_total", provider=self.name, outcome="ok")
+        answer = "".join(pieces)
+        if answer.strip():
+            self._cache_set(key, answer)
+
+def _rejected(error):
+    """True for an HTTP 4xx other than 429: the request itself was refused, not the provider down."""
+    response = getattr(error, "response", None)
+    return (isinstance(error, requests.HTTPError) and response is not None
+            and 400 <= response.status_code < 500 and response.status_code != 429)
+
+def iter_sse_events(response):
+    """Decode the JSON `data:` payloads of a server-sent events response."""
+    # Event streams are always UTF-8; requests would guess ISO-8859-1 from a charset-less text/event-stream
+    for line in response.iter_lines():
+        line = line.decode("utf-8")
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        yield json.loads(data)
+
+# ------------------------------ Providers ------------------------------
+def _gemini_payload(prompt):
+    return {"prompt": prompt, "temperature": 0.2, "maxOutputTokens": 512}
+
+def _gemini_text(result):
+    return result['candidates'][0]['content']
+
+def _groq_payload(prompt):
+    return {"prompt": prompt, "max_tokens": 512, "temperature": 0.2}
+
+def _groq_text(result):
+    return result.get('text', '')
+
+def _groq_stream_text(event):
+    if 'choices' in event:
+        choice = event['choices'][0]
+        return choice.get('delta', {}).get('content') or choice.get('text', '')
+    return event.get('text', '')
+
+_PROVIDERS = {}
+_PROVIDERS_LOCK = threading.Lock()
+
+def _create_provider(name):
+    if name == "gemini":
+        # text-bison has no streaming endpoint; stream() answers with one generateText call
+        return ProviderClient("gemini", f"{GEMINI_API_URL}text-bison-001:generateText", GEMINI_API_KEY,
+                              _gemini_payload, _gemini_text, model="text-bison-001",
+                              read_timeout=GEMINI_READ_TIMEOUT)
+    if name == "groq":
+        return ProviderClient("groq", f"{GROQ_API_URL}generate", GROQ_API_KEY,
+                              _groq_payload, _groq_text, parse_stream_event=_groq_stream_text,
+                              read_timeout=GROQ_READ_TIMEOUT)
+    raise ValueError(f"Unknown LLM provider '{name}'")
+
+def get_provider(name) -> ProviderClient:
+    """Shared client (and connection pool) for `name`, created on first use."""
+    if name not in _PROVIDERS:
+        with _PROVIDERS_LOCK:
+            if name not in _PROVIDERS:
+                _PROVIDERS[name] = _create_provider(name)
+    return _PROVIDERS[name]
+
+# ------------------------------ Hedged requests ------------------------------
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+def hedged_complete(prompt, providers=("gemini", "groq"), timeout=LLM_HEDGE_TIMEOUT):
+    """
+    Send `prompt` to all `providers` at once and return (provider, text) for the
+    first non-empty answer, or (None, "") if none answers within `timeout`.
+    Slower requests are left to finish in the background.
+    """
+    futures = {_HEDGE_POOL.submit(get_provider(name).complete, prompt): name for name in providers}
+    deadline = time.monotonic() + timeout
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                             return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            text = future.result()
+            if text.strip():
+                return futures[future], text
+    return None, ""
@@ -0,0 +1,259 @@
+# modules/metrics.py
+import os
+import time
+import threading
+import contextvars
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+from config import DEBUG, METRICS_PORT, METRICS_FILE, METRICS_FILE_INTERVAL, METRICS_TRACE_HISTORY
+
+PREFIX = "hc360"
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# ------------------------------
+# Registry
+# ------------------------------
+class MetricsRegistry:
+    """Thread-safe counters, latency histograms and a ring buffer of recent traces."""
+
+    def __init__(self, buckets=BUCKETS, trace_history=METRICS_TRACE_HISTORY):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)   # (name, labels) -> value
+        self._histograms = {}                 # (name, labels) -> [bucket counts, sum, count]
+        self._traces = deque(maxlen=trace_history)
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[self._key(name, labels)] += value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def add_trace(self, trace):
+        with self._lock:
+            self._traces.append(trace)
+
+    def recent_traces(self, limit=None):
+        """Most recent traces first, as dicts."""
+        with self._lock:
+            traces = list(self._traces)[::-1]
+        return [trace.to_dict() for trace in traces[:limit]]
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._traces.clear()
+
+    # ---------- Prometheus text format ----------
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+    def render_prometheus(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h[0]), h[1], h[2])) for key, h in self._histograms.items())
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{self._labels(labels)} {value:g}")
+        for (name, labels), (counts, total, count) in histograms:
+            metric = f"{PREFIX}_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{metric}_bucket{self._labels(labels, [('le', f'{bound:g}')])} {bucket_count}")
+            lines.append(f"{metric}_bucket{self._labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{metric}_sum{self._labels(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{self._labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# ------------------------------
+# Traces and spans
+# ------------------------------
+_CURRENT_TRACE = contextvars.ContextVar("hc360_trace", default=None)
+
+class Trace:
+    """One request (an answer, a drug lookup, ...) and the timed stages it went through."""
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration_s = None
+        self.error = None
+        self.spans = []
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_s": self.duration_s,
+            "error": self.error,
+            "attrs": dict(self.attrs),
+            "spans": list(self.spans),
+        }
+
+@contextmanager
+def trace(name, **attrs):
+    """
+    Record a request trace; `span`s opened inside it are attached to it.
+    A trace opened inside another one is recorded as a span of the outer trace.
+    """
+    if _CURRENT_TRACE.get() is not None:
+        with span(name):
+            yield _CURRENT_TRACE.get()
+        return
+    current = Trace(name, **attrs)
+    token = _CURRENT_TRACE.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration_s = current.elapsed()
+        try:
+            _CURRENT_TRACE.reset(token)
+        except ValueError:
+            # A generator holding the trace was closed from another context
+            _CURRENT_TRACE.set(None)
+        REGISTRY.inc("requests_total", op=name)
+        REGISTRY.observe("request_seconds", current.duration_s, op=name)
+        REGISTRY.add_trace(current)
+        _maybe_write_file()
+
+@contextmanager
+def span(stage, **attrs):
+    """Time one stage: feeds the `stage_seconds` histogram and the current trace."""
+    current = _CURRENT_TRACE.get()
+    offset = current.elapsed() if current is not None else None
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        REGISTRY.inc("stage_errors_total", stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        REGISTRY.observe("stage_seconds", elapsed, stage=stage)
+        if current is not None:
+            current.spans.append({"stage": stage, "offset_s": offset, "duration_s": elapsed,
+                                  "error": error, **attrs})
+
+def count(name, value=1, **labels):
+    """Increment counter `name` (exported as hc360_<name>)."""
+    REGISTRY.inc(name, value, **labels)
+
+def annotate(**attrs):
+    """Attach attributes (e.g. which tier answered) to the current trace, if any."""
+    current = _CURRENT_TRACE.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+def recent_traces(limit=None):
+    return REGISTRY.recent_traces(limit)
+
+def render_prometheus():
+    return REGISTRY.render_prometheus()
+
+# ------------------------------
+# Export
+# ------------------------------
+_last_file_write = 0.0
+_file_lock = threading.Lock()
+
+def write_metrics_file(path=METRICS_FILE):
+    """Write the Prometheus text exposition to `path` atomically (for node_exporter's textfile collector)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(f"{path}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+def _maybe_write_file():
+    global _last_file_write
+    if not METRICS_FILE:
+        return
+    now = time.monotonic()
+    if now - _last_file_write < METRICS_FILE_INTERVAL or not _file_lock.acquire(blocking=False):
+        return
+    try:
+        _last_file_write = now
+        write_metrics_file(METRICS_FILE)
+    except OSError as e:
+        if DEBUG: print(f"[DEBUG] Writing metrics file failed: {e}")
+    finally:
+        _file_lock.release()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+_SERVER = None
+_SERVER_LOCK = threading.Lock()
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """Serve /metrics on `port` from a daemon thread; no-op if port is 0 or already serving."""
+    global _SERVER
+    if not port or _SERVER is not None:
+        return _SERVER
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            try:
+                _SERVER = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                if DEBUG: print(f"[DEBUG] Metrics endpoint not started on port {port}: {e}")
+                return None
+            threading.Thread(target=_SERVER.serve_forever, daemon=True, name="metrics").start()
+            if DEBUG: print(f"[DEBUG] Metrics served at http://{host}:{port}/metrics")
+    return _SERVER
@@ -0,0 +1,226 @@
+# modules/openfda_client.py
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (DEBUG, OPENFDA_API_KEY, OPENFDA_API_URL, OPENFDA_TIMEOUT, OPENFDA_RETRIES,
+                    OPENFDA_RATE, OPENFDA_BURST, OPENFDA_WORKERS, OPENFDA_CACHE_PATH,
+                    OPENFDA_CACHE_TTL, OPENFDA_CACHE_MAX_BYTES)
+from modules.disk_cache import DiskCache
+from modules.drug_store import normalize_name
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# ------------------------------
+# Label normalization
+# ------------------------------
+def _first_text(label, *fields):
+    """Text of the first of `fields` present in `label`, or "Not available"."""
+    for field in fields:
+        value = label.get(field)
+        if isinstance(value, list):
+            value = " ".join(v.strip() for v in value if isinstance(v, str) and v.strip())
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return "Not available"
+
+def label_to_drug_info(label, name=None):
+    """
+    Reduce an OpenFDA drug label to the record shape the drug module shows.
+
+    Shared by live lookups and bulk imports so both store the same fields.
+    """
+    openfda = label.get("openfda") or {}
+    brand_names = openfda.get("brand_name") or []
+    generic_names = openfda.get("generic_name") or []
+    return {
+        "name": name or next(iter(brand_names + generic_names), None) or "Unknown",
+        "brand_names": brand_names,
+        "generic_names": generic_names,
+        "indications": _first_text(label, "indications_and_usage"),
+        "warnings": _first_text(label, "warnings", "warnings_and_cautions", "boxed_warning"),
+        "dosage": _first_text(label, "dosage_and_administration"),
+    }
+
+# ------------------------------
+# Token-bucket rate limiter
+# ------------------------------
+class TokenBucket:
+    """
+    Allows `rate` acquisitions per second on average, with bursts of up to
+    `capacity`. `acquire` blocks until a token is available.
+    """
+
+    def __init__(self, rate=OPENFDA_RATE, capacity=OPENFDA_BURST):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_s = (1 - self._tokens) / self.rate
+            time.sleep(wait_s)
+
+# ------------------------------
+# OpenFDA client
+# ------------------------------
+class OpenFDAClient:
+    """
+    Drug label lookups against the OpenFDA API.
+
+    Requests share one keep-alive session, pass through a token-bucket rate
+    limiter, and are retried with backoff on timeouts and 429/5xx (honouring
+    Retry-After). Labels, including "not found" answers, are cached on disk
+    for `cache_ttl` seconds. Failed lookups return None and are not cached.
+    """
+
+    def __init__(self, base_url=OPENFDA_API_URL, api_key=OPENFDA_API_KEY, timeout=OPENFDA_TIMEOUT,
+                 retries=OPENFDA_RETRIES, backoff=0.5, rate=OPENFDA_RATE, burst=OPENFDA_BURST,
+                 workers=OPENFDA_WORKERS, cache_path=OPENFDA_CACHE_PATH, cache_ttl=OPENFDA_CACHE_TTL,
+                 cache_max_bytes=OPENFDA_CACHE_MAX_BYTES):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.workers = workers
+        self.limiter = TokenBucket(rate, burst)
+        self.cache = DiskCache(cache_path, cache_ttl or None, cache_max_bytes) if cache_path else None
+        self.stats = {"requests": 0, "cache_hits": 0, "throttled": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    # ---------- HTTP ----------
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def search(self, search, limit=1):
+        """Run an OpenFDA `search` query; returns the `results` list ([] if nothing matched)."""
+        params = {"search": search, "limit": limit}
+        if self.api_key:
+            params["api_key"] = self.api_key
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            self._count("requests")
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                continue
+            if response.status_code == 404:
+                # OpenFDA answers "no matches" with a 404
+                return []
+            if response.status_code in RETRY_STATUS and attempt < self.retries:
+                if response.status_code == 429:
+                    self._count("throttled")
+                time.sleep(self._retry_delay(attempt, response))
+                continue
+            response.raise_for_status()
+            return response.json().get("results", [])
+
+    # ---------- labels ----------
+    @staticmethod
+    def _label_query(drug_name):
+        name = drug_name.replace('"', " ").strip()
+        return f'openfda.brand_name:"{name}" openfda.generic_name:"{name}"'
+
+    def _cache_get(self, key):
+        if self.cache is None:
+            return None
+        try:
+            value = self.cache.get(key)
+        except Exception as e:
+            if DEBUG: print(f"[DEBUG] OpenFDA cache read failed: {e}")
+            return None
+        return value
+
+    def _cache_set(self, key, label):
+        if self.cache is None:
+            return
+        try:
+            self.cache.set(key, json.dumps(label).encode("utf-8"))
+        except Exception as e:
+            if DEBUG: print(f"[DEBUG] OpenFDA cache write failed: {e}")
+
+    def label(self, drug_name):
+        """
+        Raw label for `drug_name` (brand or generic), or None when OpenFDA has
+        no match or could not be reached.
+        """
+        key = f"label\x1f{normalize_name(drug_name)}"
+        cached = self._cache_get(key)
+        if cached is not None:
+            self._count("cache_hits")
+            return json.loads(cached)
+        try:
+            results = self.search(self._label_query(drug_name))
+        except Exception as e:
+            self._count("errors")
+            if DEBUG: print(f"[DEBUG] OpenFDA query failed: {e}")
+            return None
+        label = results[0] if results else None
+        self._cache_set(key, label)
+        return label
+
+    def lookup(self, drug_name):
+        """Drug info dict for `drug_name`, or None."""
+        label = self.label(drug_name)
+        return label_to_drug_info(label, drug_name) if label else None
+
+    def lookup_many(self, drug_names):
+        """
+        Look up many drugs concurrently; returns {name: info or None}.
+
+        Duplicate names are fetched once. Concurrency is bounded by
+        `workers` and the request rate by the shared token bucket.
+        """
+        unique = list(dict.fromkeys(drug_names))
+        if not unique:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(unique)),
+                                thread_name_prefix="openfda") as pool:
+            return dict(zip(unique, pool.map(self.lookup, unique)))
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_openfda_client() -> OpenFDAClient:
+    """Shared OpenFDA client (session, rate limiter and cache), created on first use."""
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = OpenFDAClient()
+    return _CLIENT
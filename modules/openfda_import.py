@@ -0,0 +1,158 @@
+# modules/openfda_import.py
+import io
+import re
+import json
+import time
+import zipfile
+import argparse
+from pathlib import Path
+
+from config import DEBUG, DRUG_SQLITE_PATH
+from modules.drug_store import connect_drug_db, upsert_drug
+from modules.openfda_client import label_to_drug_info
+
+# ------------------------------
+# Incremental JSON parsing
+# ------------------------------
+_ITEM_SEPARATOR = re.compile(r"[\s,]*")
+# Longest array item that is buffered while waiting for it to decode; the
+# largest OpenFDA labels are a few MB
+MAX_ITEM_CHARS = 64 << 20
+
+def iter_json_array(stream, key="results", chunk_size=1 << 20, max_item_chars=MAX_ITEM_CHARS):
+    """
+    Yield the items of the `key` array of a JSON document read from a text
+    stream, one at a time.
+
+    Only the item being decoded (plus one read chunk) is held in memory, so
+    multi-GB OpenFDA dumps are parsed in constant memory. The array is
+    found by the first `"key": [` in the text; OpenFDA puts `meta` (whose
+    `results` is an object) first. An item that is still undecodable after
+    `max_item_chars` characters, or cut off by the end of the stream,
+    raises ValueError with its character offset in the stream.
+    """
+    decoder = json.JSONDecoder()
+    start = re.compile(rf'"{re.escape(key)}"\s*:\s*\[')
+    buf = ""
+    read = 0  # characters read so far; buf[0] is at offset read - len(buf)
+    while True:
+        match = start.search(buf)
+        if match:
+            buf = buf[match.end():]
+            break
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        read += len(chunk)
+        buf = buf[-(len(key) + 64):] + chunk
+
+    pos = 0
+    while True:
+        pos = _ITEM_SEPARATOR.match(buf, pos).end()
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            if pos >= len(buf):
+                raise json.JSONDecodeError("need more data", buf, pos)
+            item, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            offset = read - len(buf) + pos
+            if len(buf) - pos > max_item_chars:
+                raise ValueError(f"JSON array item at character {offset} is malformed or longer than "
+                                 f"{max_item_chars} characters") from e
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                if pos >= len(buf):
+                    raise ValueError(f"JSON array '{key}' is not closed at character {offset}") from e
+                raise ValueError(f"JSON array item at character {offset} is malformed or truncated: {e.msg}") from e
+            read += len(chunk)
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        yield item
+        if pos >= chunk_size:
+            buf, pos = buf[pos:], 0
+
+def iter_labels(path):
+    """Drug labels from an OpenFDA bulk file: a `.json.zip` download or an extracted `.json`."""
+    path = Path(path)
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                if member.endswith(".json"):
+                    with archive.open(member) as raw:
+                        yield from iter_json_array(io.TextIOWrapper(raw, encoding="utf-8"))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from iter_json_array(f)
+
+# ------------------------------
+# Import
+# ------------------------------
+def _label_version(label):
+    try:
+        return int(label.get("version"))
+    except (TypeError, ValueError):
+        return None
+
+def import_labels(paths, db_path=DRUG_SQLITE_PATH, batch_size=1000, report_every=10.0):
+    """
+    Stream OpenFDA drug labels from `paths` into the SQLite drug store.
+
+    Records are keyed by label set_id; a set already stored with the same or
+    a newer version is left alone, so re-importing a newer dump only writes
+    changed labels. Commits every `batch_size` labels and returns counters.
+    """
+    conn = connect_drug_db(db_path)
+    stats = {"records": 0, "written": 0, "unchanged": 0, "skipped": 0}
+    start = last_report = time.perf_counter()
+
+    def report():
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        stats["elapsed_s"] = elapsed
+        stats["records_per_s"] = stats["records"] / elapsed
+        print(f"[openfda-import] {stats['records']} labels | {stats['records_per_s']:.0f} records/s | "
+              f"{stats['written']} written, {stats['unchanged']} unchanged, {stats['skipped']} skipped")
+
+    try:
+        for path in paths:
+            if DEBUG:
+                print(f"[DEBUG] Importing OpenFDA labels from {path}")
+            for label in iter_labels(path):
+                stats["records"] += 1
+                info = label_to_drug_info(label)
+                names = info["brand_names"] + info["generic_names"]
+                set_id = label.get("set_id") or label.get("id")
+                if not set_id or not names:
+                    stats["skipped"] += 1
+                    continue
+                if upsert_drug(conn, set_id, info, names=names, set_id=set_id,
+                               version=_label_version(label)):
+                    stats["written"] += 1
+                else:
+                    stats["unchanged"] += 1
+                if stats["records"] % batch_size == 0:
+                    conn.commit()
+                    now = time.perf_counter()
+                    if now - last_report >= report_every:
+                        last_report = now
+                        report()
+            conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        report()
+        conn.close()
+    return stats
+
+# ------------------------------
+# CLI: python -m modules.openfda_import
+# ------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import OpenFDA drug label bulk files (drug-label-*.json.zip) into the local drug store.")
+    parser.add_argument("files", nargs="+", help="downloaded .json.zip or extracted .json files")
+    parser.add_argument("--db", default=str(DRUG_SQLITE_PATH), help="SQLite drug database")
+    parser.add_argument("--batch-size", type=int, default=1000, help="labels per transaction")
+    args = parser.parse_args()
+    import_labels(args.files, args.db, args.batch_size)
@@ -0,0 +1,200 @@
+# modules/query_cache.py
+import os
+import re
+import json
+import time
+import base64
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from config import DEBUG
+
+# ------------------------------
+# Query normalization
+# ------------------------------
+_SPACES = re.compile(r"\s+")
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and trim trailing punctuation."""
+    return _SPACES.sub(" ", query.strip().lower()).strip(" ?.!")
+
+# ------------------------------
+# Bounded LRU with TTL
+# ------------------------------
+class LRUCache:
+    """Thread-safe LRU map bounded by entry count and approximate bytes, with per-entry TTL."""
+
+    def __init__(self, max_entries=10000, max_bytes=64 << 20, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, size, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl and time.time() - item[2] > self.ttl:
+                self._drop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, size, stored_at=None):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, size, stored_at or time.time())
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def items(self):
+        with self._lock:
+            return [(key, value, stored_at) for key, (value, _, stored_at) in self._data.items()]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+# ------------------------------
+# Query embedding + result cache
+# ------------------------------
+class QueryCache:
+    """
+    Caches query embeddings (per encoder) and search results (per index version).
+
+    Results are cleared whenever `set_version` sees a new index version, so a
+    rebuilt index never serves stale hits. With a `path`, both caches are
+    saved to and restored from a JSON file so restarts do not start cold.
+    """
+
+    def __init__(self, model_name, max_entries=10000, max_bytes=64 << 20, ttl=None, path=None):
+        self.model_name = model_name
+        self.path = Path(path) if path else None
+        self.embeddings = LRUCache(max_entries, max_bytes, ttl)
+        self.results = LRUCache(max_entries, max_bytes, ttl)
+        self.version = None
+        self._restored_results = None
+        if self.path is not None:
+            self.load()
+
+    # ---------- embeddings ----------
+    def get_embedding(self, query):
+        return self.embeddings.get(normalize_query(query))
+
+    def put_embedding(self, query, vector):
+        key = normalize_query(query)
+        vector = np.asarray(vector, dtype="float32")
+        self.embeddings.put(key, vector, vector.nbytes + len(key))
+
+    # ---------- results ----------
+    def set_version(self, version):
+        """Tie cached results to an index version; a different version drops them."""
+        if version == self.version:
+            return
+        self.results.clear()
+        restored, self._restored_results = self._restored_results, None
+        if restored and restored["version"] == version:
+            for key, value, stored_at in restored["items"]:
+                self.results.put(key, value, self._result_size(key, value), stored_at)
+        self.version = version
+
+    @staticmethod
+    def _result_key(query, top_k, mode="dense"):
+        key = f"{top_k}\x1f{normalize_query(query)}"
+        return key if mode == "dense" else f"{mode}\x1f{key}"
+
+    @staticmethod
+    def _result_size(key, hits):
+        return 8 * sum(len(hit) for hit in hits) + len(key)
+
+    def get_results(self, query, top_k, mode="dense"):
+        return self.results.get(self._result_key(query, top_k, mode))
+
+    def put_results(self, query, top_k, hits, mode="dense"):
+        """
+        `hits` is a list of (chunk_id, distance) pairs, or of (chunk_id,
+        distance, score) triples for lexical/hybrid retrieval (distance may be None).
+        """
+        key = self._result_key(query, top_k, mode)
+        hits = [(int(hit[0]),) + tuple(None if value is None else float(value) for value in hit[1:])
+                for hit in hits]
+        self.results.put(key, hits, self._result_size(key, hits))
+
+    # ---------- persistence ----------
+    def save(self):
+        if self.path is None:
+            return
+        data = {
+            "model": self.model_name,
+            "version": self.version,
+            "embeddings": [
+                [key, base64.b64encode(vector.tobytes()).decode("ascii"), stored_at]
+                for key, vector, stored_at in self.embeddings.items()
+            ],
+            "results": [[key, hits, stored_at] for key, hits, stored_at in self.results.items()],
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(f"{self.path}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            if DEBUG:
+                print(f"[DEBUG] Query cache unreadable, starting cold: {e}")
+            return
+        if data.get("model") == self.model_name:
+            for key, encoded, stored_at in data.get("embeddings", []):
+                vector = np.frombuffer(base64.b64decode(encoded), dtype="float32")
+                self.embeddings.put(key, vector, vector.nbytes + len(key), stored_at)
+        # Results are only usable once the loaded index version is known
+        self._restored_results = {
+            "version": data.get("version"),
+            "items": [(key, [tuple(hit) for hit in hits], stored_at)
+                      for key, hits, stored_at in data.get("results", [])],
+        }
+
+    def stats(self):
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
@@ -1,54 +1,383 @@
 # modules/rag_engine.py
-import pickle
+import atexit
+import hashlib
+import threading
+import time
 from pathlib import Path
-import faiss
-from config import VECTOR_PATH, DEBUG
+import numpy as np
+from config import (FAISS_INDEX_PATH, CHUNK_STORE_PATH, BM25_INDEX_PATH, EMBEDDING_MODEL, ENCODER_BACKEND,
+                    VECTOR_RELOAD_INTERVAL,
+                    RETRIEVAL_MODE, HYBRID_CANDIDATES, LEXICAL_FAST_PATH_WORDS,
+                    QUERY_BATCH_SIZE, QUERY_CACHE_ENTRIES, QUERY_CACHE_MAX_BYTES, QUERY_CACHE_TTL,
+                    QUERY_CACHE_PATH, DEBUG)
+from modules.chunk_store import ChunkStore
+from modules.encoders import encoder_id, load_encoder
+from modules.lexical_index import open_lexical_index, query_words, tokenize
+from modules.metrics import count, span
+from modules.query_cache import QueryCache
+
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+# Reciprocal rank fusion constant: a hit at rank r in one result list scores 1 / (RRF_K + r)
+RRF_K = 60
 
 # ------------------------------
 # Load FAISS vector store
 # ------------------------------
 def load_vector_store():
     """
-    Load FAISS index and chunks. Returns (index, chunks) or (None, []) if fails.
+    Load FAISS index and chunk store. Returns (index, store) or (None, None) if fails.
     """
-    INDEX_FILE = VECTOR_PATH / "faiss_index.bin"
-    CHUNKS_FILE = VECTOR_PATH / "chunks.pkl"
+    INDEX_FILE = Path(FAISS_INDEX_PATH)
+    CHUNKS_FILE = Path(CHUNK_STORE_PATH)
 
     if not INDEX_FILE.exists() or not CHUNKS_FILE.exists():
         if DEBUG:
-            print("[DEBUG] FAISS index or chunks file missing.")
-        return None, []
+            print("[DEBUG] FAISS index or chunk store missing.")
+        return None, None
 
     try:
-        index = faiss.read_index(str(INDEX_FILE))
-        with open(CHUNKS_FILE, "rb") as f:
-            chunks = pickle.load(f)
-        return index, chunks
+        import faiss
+        from modules.vector_index import configure_search
+        index = configure_search(faiss.read_index(str(INDEX_FILE)))
+        return index, ChunkStore(CHUNKS_FILE)
     except Exception as e:
         if DEBUG:
             print(f"[DEBUG] Error loading FAISS index: {e}")
-        return None, []
+        return None, None
 
 # ------------------------------
-# Retrieve relevant chunks from FAISS
+# Rank fusion
 # ------------------------------
-def retrieve_relevant_chunks(query, top_k=5):
+def fuse_ranks(dense, lexical, top_k, k=RRF_K):
     """
-    Query FAISS vector store to retrieve most relevant document chunks.
+    Reciprocal rank fusion of dense (chunk_id, distance) and lexical
+    (chunk_id, score) results into the `top_k` (chunk_id, distance, score)
+    triples, best first; `distance` is None for lexical-only hits.
+    """
+    fused = {}
+    for rank, (chunk_id, distance) in enumerate(dense):
+        fused[chunk_id] = [distance, 1 / (k + rank + 1)]
+    for rank, (chunk_id, _) in enumerate(lexical):
+        fused.setdefault(chunk_id, [None, 0.0])[1] += 1 / (k + rank + 1)
+    ranked = sorted(fused.items(), key=lambda item: -item[1][1])[:top_k]
+    return [(chunk_id, distance, score) for chunk_id, (distance, score) in ranked]
+
+# ------------------------------
+# Resident retrieval engine
+# ------------------------------
+def _file_checksum(path: Path) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class RetrievalEngine:
+    """
+    Keeps the FAISS index, memory-mapped chunk store and encoder loaded across queries.
+
+    The index files are re-checked at most every `reload_interval` seconds.
+    A changed mtime/size triggers a checksum comparison, and the store is only
+    reloaded when the content actually differs. Safe to share between threads.
+
+    Query embeddings and search results go through an optional QueryCache;
+    cached results are tied to the checksum of the loaded index files.
+
+    `mode` picks dense (FAISS), lexical (BM25) or hybrid retrieval; the
+    lexical modes fall back to dense when no BM25 index has been built.
+    Short keyword queries whose words are all indexed skip the encoder in
+    the lexical modes (see LEXICAL_FAST_PATH_WORDS).
     """
-    index, chunks = load_vector_store()
-    if index is None or not chunks:
-        return []  # FAISS not available, fallback needed
 
-    from sentence_transformers import SentenceTransformer
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+    def __init__(self, index_path=FAISS_INDEX_PATH, chunks_path=CHUNK_STORE_PATH, lexical_path=BM25_INDEX_PATH,
+                 model_name=EMBEDDING_MODEL, reload_interval=VECTOR_RELOAD_INTERVAL, cache=None,
+                 mode=RETRIEVAL_MODE, fast_path_words=LEXICAL_FAST_PATH_WORDS, encoder_backend=ENCODER_BACKEND):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}'")
+        self.index_path = Path(index_path)
+        self.chunks_path = Path(chunks_path)
+        self.lexical_path = Path(lexical_path)
+        self.model_name = model_name
+        self.encoder_backend = encoder_backend
+        self.reload_interval = reload_interval
+        self.cache = cache
+        self.mode = mode
+        self.fast_path_words = fast_path_words
+
+        self._lock = threading.RLock()
+        self._index = None
+        self._chunks = None
+        self._lexical = None
+        self._model = None
+        self._stat = None
+        self._checksum = None
+        self._last_check = 0.0
+
+        self.timings = {
+            "index_type": None,
+            "index_storage": None,
+            "encoder_backend": encoder_backend,
+            "index_load_s": None,
+            "model_load_s": None,
+            "last_query_s": None,
+            "total_query_s": 0.0,
+            "queries": 0,
+            "lexical_fast_path": 0,
+            "reloads": 0,
+        }
+
+    # ---------- on-disk state ----------
+    def _disk_stat(self):
+        try:
+            stat = tuple(
+                (p.stat().st_mtime_ns, p.stat().st_size)
+                for p in (self.index_path, self.chunks_path)
+            )
+        except FileNotFoundError:
+            return None
+        # The BM25 index is optional; building it later still triggers a reload
+        try:
+            return stat + ((self.lexical_path.stat().st_mtime_ns, self.lexical_path.stat().st_size),)
+        except FileNotFoundError:
+            return stat
+
+    def _disk_checksum(self):
+        paths = (self.index_path, self.chunks_path, self.lexical_path)
+        return tuple(_file_checksum(p) for p in paths if p.exists())
+
+    def _load_store(self, stat):
+        start = time.perf_counter()
+        checksum = self._disk_checksum()
+        if checksum == self._checksum and self._index is not None:
+            # Files were touched but the content is unchanged
+            self._stat = stat
+            return
+        # faiss is imported on first load so pages without retrieval never pay for it
+        import faiss
+        from modules.vector_index import configure_search, index_storage_of, index_type_of
+        with span("faiss_load"):
+            index = configure_search(faiss.read_index(str(self.index_path)))
+            chunks = ChunkStore(self.chunks_path)
+        try:
+            lexical = open_lexical_index(self.lexical_path)
+        except Exception as e:
+            if DEBUG: print(f"[DEBUG] BM25 index unreadable, using dense retrieval only: {e}")
+            lexical = None
+        # The previous store stays mapped until in-flight queries drop it
+        self._index, self._chunks, self._lexical = index, chunks, lexical
+        self._stat, self._checksum = stat, checksum
+        self.timings["index_load_s"] = time.perf_counter() - start
+        self.timings["index_type"] = index_type_of(index)
+        self.timings["index_storage"] = index_storage_of(index)
+        self.timings["reloads"] += 1
+        if DEBUG:
+            print(f"[DEBUG] FAISS {self.timings['index_type']} store loaded in "
+                  f"{self.timings['index_load_s']:.3f}s ({len(chunks)} chunks)")
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._index is not None and now - self._last_check < self.reload_interval:
+            return
+        with self._lock:
+            if self._index is not None and now - self._last_check < self.reload_interval:
+                return
+            self._last_check = now
+            stat = self._disk_stat()
+            if stat is None:
+                if DEBUG and self._index is None:
+                    print("[DEBUG] FAISS index or chunk store missing.")
+                return
+            if stat == self._stat:
+                return
+            try:
+                self._load_store(stat)
+            except Exception as e:
+                if DEBUG:
+                    print(f"[DEBUG] Error loading FAISS index: {e}")
+
+    def _current(self):
+        self._refresh()
+        with self._lock:
+            version = "-".join(self._checksum) if self._checksum else None
+            return self._index, self._chunks, self._lexical, version
+
+    def snapshot(self):
+        """Return a consistent (index, chunk store) pair, reloading if files changed."""
+        index, chunks, _, _ = self._current()
+        return index, chunks
+
+    @property
+    def lexical(self):
+        """The loaded BM25 index, or None."""
+        return self._current()[2]
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    with span("encoder_load"):
+                        self._model = load_encoder(self.model_name, self.encoder_backend)
+                    self.timings["model_load_s"] = time.perf_counter() - start
+                    if DEBUG:
+                        print(f"[DEBUG] Encoder '{self.model_name}' ({self.encoder_backend}) loaded in "
+                              f"{self.timings['model_load_s']:.3f}s")
+        return self._model
+
+    # ---------- querying ----------
+    def _record_query_time(self, elapsed, n_queries):
+        with self._lock:
+            self.timings["last_query_s"] = elapsed / n_queries
+            self.timings["total_query_s"] += elapsed
+            self.timings["queries"] += n_queries
 
-    query_vector = model.encode([query])
+    def search(self, query, top_k=5, mode=None):
+        """Return the `top_k` chunks most relevant to `query`."""
+        return [hit["chunk"] for hit in self.search_batch([query], top_k, mode=mode)[0]]
+
+    def _encode(self, queries, batch_size):
+        """Encode queries, reusing cached embeddings where available."""
+        vectors = [self.cache.get_embedding(q) if self.cache else None for q in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            with span("encode", queries=len(missing)):
+                encoded = np.asarray(
+                    self.model.encode([queries[i] for i in missing], batch_size=batch_size), dtype="float32"
+                ).reshape(len(missing), -1)
+            for row, i in enumerate(missing):
+                vectors[i] = encoded[row]
+                if self.cache:
+                    self.cache.put_embedding(queries[i], encoded[row])
+        return np.vstack(vectors)
+
+    def _is_keyword_query(self, query, lexical):
+        """Short queries whose words are all indexed terms (or stopwords) are answered by BM25 alone."""
+        words = query_words(query)
+        return 0 < len(words) <= self.fast_path_words and lexical.contains_all(tokenize(query))
+
+    def _dense_search(self, index, queries, k, batch_size):
+        vectors = self._encode(queries, batch_size)
+        with span("faiss_search", queries=len(queries)):
+            D, I = index.search(vectors, k)
+        return [[(int(chunk_id), float(distance)) for chunk_id, distance in zip(I[row], D[row]) if chunk_id >= 0]
+                for row in range(len(queries))]
+
+    def search_batch(self, queries, top_k=5, batch_size=QUERY_BATCH_SIZE, mode=None):
+        """
+        Retrieve hits for many queries with one vectorized encode and one index search.
+
+        Returns one list per query of {"id", "chunk", "distance"} dicts, best
+        first. Lexical and hybrid hits also carry a "score" (BM25 or fused
+        rank score) and have a None distance when FAISS did not return them.
+        """
+        queries = list(queries)
+        mode = mode or self.mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}'")
+        index, chunks, lexical, version = self._current()
+        if index is None or not chunks or not queries:
+            return [[] for _ in queries]  # FAISS not available, fallback needed
+        if lexical is None:
+            mode = "dense"
+
+        start = time.perf_counter()
+        hits = [None] * len(queries)
+        if self.cache:
+            self.cache.set_version(version)
+            hits = [self.cache.get_results(query, top_k, mode) for query in queries]
+
+        todo = [i for i, cached in enumerate(hits) if cached is None]
+        if todo and mode == "dense":
+            for i, query_hits in zip(todo, self._dense_search(index, [queries[i] for i in todo], top_k, batch_size)):
+                hits[i] = query_hits
+        elif todo:
+            candidates = top_k if mode == "lexical" else top_k * HYBRID_CANDIDATES
+            with span("bm25_search", queries=len(todo)):
+                lexical_hits = {i: lexical.search(queries[i], candidates) for i in todo}
+            dense_todo = []
+            for i in todo:
+                if mode == "lexical" or (lexical_hits[i] and self._is_keyword_query(queries[i], lexical)):
+                    hits[i] = [(chunk_id, None, score) for chunk_id, score in lexical_hits[i][:top_k]]
+                else:
+                    dense_todo.append(i)
+            fast = len(todo) - len(dense_todo)
+            if mode == "hybrid" and fast:
+                count("retrieval_fast_path_total", value=fast)
+                with self._lock:
+                    self.timings["lexical_fast_path"] += fast
+            if dense_todo:
+                dense_hits = self._dense_search(index, [queries[i] for i in dense_todo], candidates, batch_size)
+                for i, query_hits in zip(dense_todo, dense_hits):
+                    hits[i] = fuse_ranks(query_hits, lexical_hits[i], top_k)
+        if self.cache:
+            for i in todo:
+                self.cache.put_results(queries[i], top_k, hits[i], mode)
+
+        results = []
+        with span("chunk_fetch"):
+            for query_hits in hits:
+                # Only the top-k hits are decoded from the mapped store
+                texts = chunks.get_many([hit[0] for hit in query_hits])
+                results.append([
+                    {"id": hit[0], "chunk": text, "distance": hit[1],
+                     **({"score": hit[2]} if len(hit) > 2 else {})}
+                    for hit, text in zip(query_hits, texts)
+                    if text is not None
+                ])
+
+        self._record_query_time(time.perf_counter() - start, len(queries))
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.timings)
+        stats["avg_query_s"] = (
+            stats["total_query_s"] / stats["queries"] if stats["queries"] else None
+        )
+        if self.cache:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
+
+def get_engine() -> RetrievalEngine:
+    """Process-wide retrieval engine, created on first use."""
+    global _ENGINE
+    if _ENGINE is None:
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                cache = None
+                if QUERY_CACHE_ENTRIES > 0:
+                    cache = QueryCache(encoder_id(EMBEDDING_MODEL), QUERY_CACHE_ENTRIES, QUERY_CACHE_MAX_BYTES,
+                                       QUERY_CACHE_TTL or None, QUERY_CACHE_PATH or None)
+                    atexit.register(cache.save)
+                _ENGINE = RetrievalEngine(cache=cache)
+    return _ENGINE
+
+# ------------------------------
+# Retrieve relevant chunks from FAISS
+# ------------------------------
+def retrieve_relevant_chunks(query, top_k=5):
+    """
+    Query the vector store (and BM25 index, see RETRIEVAL_MODE) to retrieve most relevant document chunks.
+    """
     try:
-        D, I = index.search(query_vector, top_k)
-        retrieved_chunks = [chunks[i] for i in I[0] if i < len(chunks)]
-        return retrieved_chunks
+        return get_engine().search(query, top_k)
     except Exception as e:
         if DEBUG:
             print(f"[DEBUG] FAISS search failed: {e}")
         return []
+
+def retrieve_relevant_chunks_batch(queries, top_k=5):
+    """
+    Retrieve hits for a list of queries in one batched encode + search.
+    Returns a list (per query) of {"id", "chunk", "distance"} dicts.
+    """
+    try:
+        return get_engine().search_batch(queries, top_k)
+    except Exception as e:
+        if DEBUG:
+            print(f"[DEBUG] FAISS batch search failed: {e}")
+        return [[] for _ in queries]
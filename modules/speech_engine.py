@@ -0,0 +1,173 @@
+# modules/speech_engine.py
+import io
+import wave
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import (DEBUG, STT_BACKEND, STT_LANG, STT_WORKERS, STT_TIMEOUT, STT_MAX_SEGMENT_SECONDS,
+                    STT_MIN_SILENCE_SECONDS, STT_SILENCE_RATIO)
+from modules.metrics import span
+
+# ------------------------------
+# Decoding
+# ------------------------------
+class PCMAudio:
+    """Mono 16-bit PCM samples plus their sample rate."""
+
+    def __init__(self, samples, sample_rate):
+        self.samples = np.asarray(samples, dtype=np.int16)
+        self.sample_rate = int(sample_rate)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def slice(self, start, end):
+        return PCMAudio(self.samples[start:end], self.sample_rate)
+
+    def to_bytes(self):
+        return self.samples.tobytes()
+
+def _from_wave(data):
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        width, channels, rate = wav.getsampwidth(), wav.getnchannels(), wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.int32) - 128) << 8
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.int32)
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype="<i4") >> 16
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width * 8} bits")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return PCMAudio(samples, rate)
+
+def decode_audio(data: bytes, filename: str = "") -> PCMAudio:
+    """
+    Decode an uploaded recording held in memory; nothing is written to disk.
+
+    WAV is read with the standard library, AIFF/FLAC through
+    speech_recognition and MP3 through pydub (which needs ffmpeg).
+    """
+    if data[:4] == b"RIFF":
+        return _from_wave(data)
+    if filename.lower().endswith(".mp3") or data[:3] == b"ID3" or data[:2] in (b"\xff\xfb", b"\xff\xf3"):
+        try:
+            from pydub import AudioSegment
+        except ImportError:
+            raise ValueError("MP3 input needs pydub and ffmpeg; please upload a WAV file") from None
+        segment = AudioSegment.from_file(io.BytesIO(data), format="mp3").set_channels(1).set_sample_width(2)
+        return PCMAudio(np.frombuffer(segment.raw_data, dtype="<i2"), segment.frame_rate)
+    import speech_recognition as sr
+    with sr.AudioFile(io.BytesIO(data)) as source:
+        audio = sr.Recognizer().record(source).get_raw_data(convert_width=2)
+    return PCMAudio(np.frombuffer(audio, dtype="<i2"), source.SAMPLE_RATE)
+
+# ------------------------------
+# Splitting on silence
+# ------------------------------
+def split_on_silence(audio: PCMAudio, max_seconds=STT_MAX_SEGMENT_SECONDS,
+                     min_silence=STT_MIN_SILENCE_SECONDS, silence_ratio=STT_SILENCE_RATIO, frame_ms=30):
+    """
+    (start, end) sample ranges of segments no longer than `max_seconds`.
+
+    Frames whose RMS is below `silence_ratio` times the loud (95th
+    percentile) level are silent; segments are cut in the middle of the
+    last silent stretch of at least `min_silence` seconds before the limit,
+    or hard at the limit when the speaker never pauses. Fully silent
+    segments are dropped.
+    """
+    frame = max(1, audio.sample_rate * frame_ms // 1000)
+    n_frames = len(audio.samples) // frame
+    if n_frames == 0:
+        return [(0, len(audio.samples))] if len(audio.samples) else []
+    frames = audio.samples[:n_frames * frame].astype(np.float64).reshape(n_frames, frame)
+    rms = np.sqrt((frames ** 2).mean(axis=1))
+    threshold = max(np.percentile(rms, 95) * silence_ratio, 1.0)
+    silent = rms < threshold
+
+    # Cut points: the middle of every silent run that is long enough
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+    min_frames = max(1, int(min_silence * 1000 / frame_ms))
+    cuts = [(run_start + run_end) // 2 for run_start, run_end in zip(edges[::2], edges[1::2])
+            if run_end - run_start >= min_frames]
+
+    max_frames = max(1, int(max_seconds * 1000 / frame_ms))
+    segments, start = [], 0
+    while start < n_frames:
+        limit = start + max_frames
+        if limit >= n_frames:
+            end = n_frames
+        else:
+            candidates = [cut for cut in cuts if start < cut <= limit]
+            end = candidates[-1] if candidates else limit
+        if not silent[start:end].all():
+            segments.append((start * frame, len(audio.samples) if end == n_frames else end * frame))
+        start = end
+    return segments
+
+# ------------------------------
+# Recognizer backends
+# ------------------------------
+# A backend is a callable (pcm: PCMAudio, language) -> text; it returns ""
+# when a segment holds no intelligible speech.
+
+def google_backend(pcm: PCMAudio, language: str) -> str:
+    import speech_recognition as sr
+    recognizer = sr.Recognizer()
+    recognizer.operation_timeout = STT_TIMEOUT
+    audio = sr.AudioData(pcm.to_bytes(), pcm.sample_rate, 2)
+    try:
+        return recognizer.recognize_google(audio, language=language)
+    except sr.UnknownValueError:
+        return ""
+
+STT_BACKENDS = {"google": google_backend}
+
+def register_backend(name: str, recognize):
+    """Make `recognize(pcm, language) -> str` available as STT_BACKEND=<name>."""
+    STT_BACKENDS[name] = recognize
+
+def get_backend(name: str = STT_BACKEND):
+    """A registered backend, or "package.module:function" for one defined elsewhere."""
+    if name in STT_BACKENDS:
+        return STT_BACKENDS[name]
+    if ":" in name:
+        module, attr = name.split(":", 1)
+        return getattr(importlib.import_module(module), attr)
+    raise ValueError(f"Unknown speech recognition backend '{name}'")
+
+# ------------------------------
+# Transcription
+# ------------------------------
+def _recognize_segment(recognize, pcm, language):
+    with span("stt_segment"):
+        return (recognize(pcm, language) or "").strip()
+
+def transcribe(audio: PCMAudio, language: str = STT_LANG, backend: str = STT_BACKEND,
+               workers: int = STT_WORKERS, max_seconds: float = STT_MAX_SEGMENT_SECONDS) -> str:
+    """
+    Transcribe a recording of any length: split on silence into segments of
+    at most `max_seconds`, recognize up to `workers` segments at a time and
+    join the texts in their original order.
+    """
+    recognize = get_backend(backend)
+    segments = split_on_silence(audio, max_seconds)
+    if not segments:
+        return ""
+    if DEBUG:
+        print(f"[DEBUG] Transcribing {audio.duration:.1f}s of audio in {len(segments)} segment(s)")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(segments))), thread_name_prefix="stt") as pool:
+        texts = list(pool.map(lambda bounds: _recognize_segment(recognize, audio.slice(*bounds), language),
+                              segments))
+    return " ".join(text for text in texts if text)
+
+def transcribe_audio(data: bytes, filename: str = "", language: str = STT_LANG, backend: str = STT_BACKEND) -> str:
+    """Decode an uploaded recording in memory and transcribe it."""
+    with span("stt_decode"):
+        audio = decode_audio(data, filename)
+    return transcribe(audio, language, backend)
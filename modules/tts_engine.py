@@ -0,0 +1,96 @@
+# modules/tts_engine.py
+import io
+import hashlib
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DEBUG, TTS_LANG, TTS_BACKEND, TTS_WORKERS, TTS_SEGMENT_CHARS
+from modules.chunking import SentenceChunker
+from modules.metrics import count, span
+
+# ------------------------------
+# Synthesis backends
+# ------------------------------
+# A backend is a callable (text, lang) -> MP3 bytes. MP3 frames can be
+# concatenated, so segments synthesized separately play back as one file.
+
+def gtts_backend(text: str, lang: str) -> bytes:
+    from gtts import gTTS
+    buffer = io.BytesIO()
+    gTTS(text=text, lang=lang).write_to_fp(buffer)
+    return buffer.getvalue()
+
+TTS_BACKENDS = {"gtts": gtts_backend}
+
+def register_backend(name: str, synthesize):
+    """Make `synthesize(text, lang) -> bytes` available as TTS_BACKEND=<name>."""
+    TTS_BACKENDS[name] = synthesize
+
+def get_backend(name: str = TTS_BACKEND):
+    """A registered backend, or "package.module:function" for one defined elsewhere."""
+    if name in TTS_BACKENDS:
+        return TTS_BACKENDS[name]
+    if ":" in name:
+        module, attr = name.split(":", 1)
+        return getattr(importlib.import_module(module), attr)
+    raise ValueError(f"Unknown TTS backend '{name}'")
+
+# ------------------------------
+# Segmented synthesis
+# ------------------------------
+def split_segments(text: str, max_chars: int = TTS_SEGMENT_CHARS):
+    """Split `text` into segments of whole sentences of at most `max_chars` characters."""
+    return [segment for _, _, segment in SentenceChunker(max_chars=max_chars, overlap=0)(text)]
+
+def segment_cache_key(backend: str, lang: str, segment: str) -> str:
+    blob = f"tts_segment\0{backend}\0{lang}\0{segment}"
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def _synthesize_segment(synthesize, backend, lang, segment, cache):
+    key = segment_cache_key(backend, lang, segment)
+    if cache:
+        try:
+            data = cache.get(key)
+            if data is not None:
+                count("tts_segment_cache_hits_total")
+                return data
+        except Exception as e:
+            if DEBUG: print(f"[DEBUG] TTS segment cache read failed: {e}")
+    with span("tts_segment"):
+        data = synthesize(segment, lang)
+    if cache:
+        try:
+            cache.set(key, data)
+        except Exception as e:
+            if DEBUG: print(f"[DEBUG] TTS segment cache write failed: {e}")
+    return data
+
+def iter_speech(text: str, lang: str = TTS_LANG, backend: str = TTS_BACKEND, cache=None,
+                workers: int = TTS_WORKERS, max_chars: int = TTS_SEGMENT_CHARS):
+    """
+    Yield the audio of `text` segment by segment, in order.
+
+    Segments are synthesized concurrently by at most `workers` threads, so
+    the first one can be played while later ones are still being produced.
+    `cache` (e.g. a DiskCache) stores each segment, so answers sharing
+    passages only synthesize the new ones.
+    """
+    segments = split_segments(text, max_chars)
+    if not segments:
+        return
+    synthesize = get_backend(backend)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(segments))),
+                            thread_name_prefix="tts") as pool:
+        futures = [pool.submit(_synthesize_segment, synthesize, backend, lang, segment, cache)
+                   for segment in segments]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+def synthesize(text: str, lang: str = TTS_LANG, backend: str = TTS_BACKEND, cache=None,
+               workers: int = TTS_WORKERS, max_chars: int = TTS_SEGMENT_CHARS) -> bytes:
+    """The whole answer as one MP3: the segments of `iter_speech` concatenated."""
+    return b"".join(iter_speech(text, lang, backend, cache, workers, max_chars))
@@ -0,0 +1,177 @@
+# modules/vector_index.py
+import numpy as np
+import faiss
+from config import (INDEX_TYPE, INDEX_STORAGE, INDEX_NLIST, INDEX_NPROBE, INDEX_PQ_M, INDEX_PQ_NBITS, INDEX_HNSW_M,
+                    INDEX_EF_CONSTRUCTION, INDEX_EF_SEARCH, INDEX_TRAIN_SAMPLE, DEBUG)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+# How flat, IVF-flat and HNSW indexes store vectors: full precision, half
+# precision (2 bytes per dimension) or scalar-quantized to 8 bits per
+# dimension with trained per-dimension ranges (1 byte). IVF-PQ has its own codes.
+INDEX_STORAGES = ("float32", "float16", "int8")
+_SQ_CODES = {"float16": "SQfp16", "int8": "SQ8"}
+
+# ------------------------------
+# Index parameters
+# ------------------------------
+def default_params():
+    return {
+        "index_type": INDEX_TYPE,
+        "storage": INDEX_STORAGE,
+        "nlist": INDEX_NLIST,
+        "nprobe": INDEX_NPROBE,
+        "pq_m": INDEX_PQ_M,
+        "pq_nbits": INDEX_PQ_NBITS,
+        "hnsw_m": INDEX_HNSW_M,
+        "ef_construction": INDEX_EF_CONSTRUCTION,
+        "ef_search": INDEX_EF_SEARCH,
+        "train_sample": INDEX_TRAIN_SAMPLE,
+    }
+
+def build_params(params=None):
+    """The subset of parameters baked into the index at build time."""
+    params = {**default_params(), **(params or {})}
+    keys = {
+        "flat": ("storage",),
+        "ivf_flat": ("nlist", "storage"),
+        "ivf_pq": ("nlist", "pq_m", "pq_nbits"),
+        "hnsw": ("hnsw_m", "ef_construction", "storage"),
+    }[params["index_type"]]
+    return {"index_type": params["index_type"], **{key: params[key] for key in keys}}
+
+def needs_training(params=None):
+    params = {**default_params(), **(params or {})}
+    return params["index_type"].startswith("ivf") or (
+        params["index_type"] != "ivf_pq" and params["storage"] == "int8")
+
+def sample_training_vectors(vectors, sample_size, seed=0):
+    if len(vectors) <= sample_size:
+        return vectors
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), size=sample_size, replace=False)
+    return vectors[np.sort(rows)]
+
+def _effective_nlist(n_train, nlist):
+    # faiss wants ~39 training points per centroid
+    return max(1, min(nlist, n_train // 39))
+
+def _effective_pq_m(dim, pq_m):
+    return max(m for m in range(1, min(pq_m, dim) + 1) if dim % m == 0)
+
+# ------------------------------
+# Index creation
+# ------------------------------
+def create_index(vectors, params=None):
+    """
+    Create an empty, trained index sized for `vectors` that accepts `add_with_ids`.
+
+    Flat and HNSW indexes are wrapped in IDMap2; IVF indexes store the ids
+    in their inverted lists themselves. IVF variants are trained on a sample of `vectors`. When the corpus is too
+    small to train the requested type, a flat index is used instead.
+    Returns (index, index_type).
+    """
+    params = {**default_params(), **(params or {})}
+    index_type = params["index_type"]
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+    if params["storage"] not in INDEX_STORAGES:
+        raise ValueError(f"Unknown index storage '{params['storage']}', expected one of {INDEX_STORAGES}")
+    codes = _SQ_CODES.get(params["storage"])
+
+    n, dim = vectors.shape
+    train = sample_training_vectors(vectors, params["train_sample"])
+
+    if index_type == "ivf_pq" and len(train) < 2 ** params["pq_nbits"]:
+        if DEBUG:
+            print(f"[DEBUG] {len(train)} vectors are too few to train PQ, using flat index")
+        index_type = "flat"
+
+    if index_type == "flat":
+        description = f"IDMap2,{codes or 'Flat'}"
+    elif index_type == "hnsw":
+        description = f"IDMap2,HNSW{params['hnsw_m']}" + (f"_{codes}" if codes else "")
+    elif index_type == "ivf_flat":
+        description = f"IVF{_effective_nlist(len(train), params['nlist'])},{codes or 'Flat'}"
+    else:
+        pq_m = _effective_pq_m(dim, params["pq_m"])
+        description = f"IVF{_effective_nlist(len(train), params['nlist'])},PQ{pq_m}x{params['pq_nbits']}"
+
+    index = faiss.index_factory(dim, description)
+    if index_type == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efConstruction = params["ef_construction"]
+    if not index.is_trained:
+        index.train(train)
+    configure_search(index, params)
+    return index, index_type
+
+def remove_ids(index, ids, params=None):
+    """
+    Remove `ids` from an index built by `create_index`.
+
+    HNSW graphs do not support deletion, so those are rebuilt from the
+    remaining stored vectors. So are IVF indexes wrapped in IDMap2 (as
+    older builds made them): IDMap2 compacts its id map on removal as if
+    the wrapped index renumbered its rows, which IVF lists do not, so every
+    later id would shift. Returns the index to keep using.
+    """
+    ids = np.asarray(ids, dtype="int64")
+    base = _base_index(index)
+    wrapped_ivf = isinstance(index, faiss.IndexIDMap) and isinstance(base, faiss.IndexIVF)
+    if not wrapped_ivf:
+        try:
+            index.remove_ids(ids)
+            return index
+        except RuntimeError:
+            pass
+    else:
+        base.make_direct_map()
+
+    # Row r of the wrapped index holds id_map[r]; all rows are decoded in one call
+    all_ids = faiss.vector_to_array(index.id_map)
+    kept = ~np.isin(all_ids, ids)
+    keep = all_ids[kept]
+    vectors = base.reconstruct_n(0, base.ntotal)[kept] if len(keep) else np.zeros((0, index.d), "float32")
+    rebuilt, _ = create_index(vectors, {**(params or {}), "index_type": index_type_of(index),
+                                        "storage": index_storage_of(index)})
+    if len(keep):
+        rebuilt.add_with_ids(vectors, keep)
+    return rebuilt
+
+# ------------------------------
+# Query-time configuration
+# ------------------------------
+def _base_index(index):
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+def index_type_of(index):
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+def index_storage_of(index):
+    """"float32", "float16" or "int8" for flat/IVF/HNSW indexes; None for IVF-PQ."""
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVFPQ):
+        return None
+    if isinstance(base, faiss.IndexHNSW):
+        base = faiss.downcast_index(base.storage)
+    if not isinstance(base, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "float32"
+    return {faiss.ScalarQuantizer.QT_fp16: "float16", faiss.ScalarQuantizer.QT_8bit: "int8"}.get(base.sq.qtype)
+
+def configure_search(index, params=None):
+    """Apply query-time parameters (nprobe / efSearch) for whatever index type was loaded."""
+    params = {**default_params(), **(params or {})}
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(params["nprobe"], base.nlist)
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = params["ef_search"]
+    return index
@@ -0,0 +1,78 @@
+# modules/warmup.py
+import time
+import threading
+from config import DEBUG, WARMUP_RESOURCES
+
+# ------------------------------
+# Shared resource warm-up
+# ------------------------------
+# The retrieval engine loads the FAISS index and the encoder lazily, and
+# the drug store reads its database on first lookup. Warming them at
+# startup moves that cost off the first user request.
+
+def _load_index():
+    from modules.rag_engine import get_engine
+    get_engine().snapshot()
+
+def _load_encoder():
+    from modules.rag_engine import get_engine
+    get_engine().model
+
+def _load_drug_store():
+    from modules.drug_store import get_drug_store
+    get_drug_store().stats()
+
+RESOURCES = {
+    "index": _load_index,
+    "encoder": _load_encoder,
+    "drug_store": _load_drug_store,
+}
+
+def warm_up(resources=None):
+    """
+    Load shared resources now instead of on first use.
+
+    Returns {resource: seconds} for the ones that loaded and
+    {resource: "error: ..."} for the ones that failed.
+    """
+    names = resources or [name.strip() for name in WARMUP_RESOURCES.split(",") if name.strip()]
+    results = {}
+    for name in names:
+        if name not in RESOURCES:
+            raise ValueError(f"Unknown warm-up resource '{name}'")
+        start = time.perf_counter()
+        try:
+            RESOURCES[name]()
+            results[name] = time.perf_counter() - start
+        except Exception as e:
+            results[name] = f"error: {e}"
+        if DEBUG: print(f"[DEBUG] Warm-up {name}: {results[name]}")
+    return results
+
+# ------------------------------
+# Background warm-up
+# ------------------------------
+_STATUS = {"state": "idle", "results": {}, "seconds": None}
+_THREAD = None
+_THREAD_LOCK = threading.Lock()
+
+def _run(resources):
+    _STATUS["state"] = "running"
+    start = time.perf_counter()
+    try:
+        _STATUS["results"] = warm_up(resources)
+    finally:
+        _STATUS["seconds"] = time.perf_counter() - start
+        _STATUS["state"] = "done"
+
+def start_warmup(resources=None):
+    """Warm up in a daemon thread, once per process; returns the thread."""
+    global _THREAD
+    with _THREAD_LOCK:
+        if _THREAD is None:
+            _THREAD = threading.Thread(target=_run, args=(resources,), daemon=True, name="warmup")
+            _THREAD.start()
+    return _THREAD
+
+def warmup_status():
+    return dict(_STATUS)
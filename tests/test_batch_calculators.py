@@ -0,0 +1,27 @@
+# tests/test_batch_calculators.py
+import numpy as np
+import pandas as pd
+
+from modules.batch_calculators import bmi_batch, drip_rate_batch
+
+def _scalar_bmi(weight, height):
+    # modules.calculators.calculate_bmi, without its Streamlit import
+    return round(weight / (height ** 2), 2)
+
+def test_rounding_matches_builtin_round_near_boundaries():
+    # 37.9 / 2.0**2 = 9.475 (stored as 9.47499...): round() gives 9.47, np.round 9.48
+    weights = [37.9, 109.1, 48.3, 100.3, 50.3]
+    assert np.round(37.9 / 2.0 ** 2, 2) != round(37.9 / 2.0 ** 2, 2)
+    assert list(bmi_batch(weights, 2.0)) == [_scalar_bmi(w, 2.0) for w in weights]
+
+def test_rounding_matches_builtin_round_on_random_rows():
+    rng = np.random.default_rng(0)
+    weights = [float(w) for w in rng.uniform(3, 200, 50_000).round(1)]
+    heights = [float(h) / 100 for h in rng.uniform(45, 210, 50_000).round(0)]
+    expected = [_scalar_bmi(w, h) for w, h in zip(weights, heights)]
+    assert list(bmi_batch(weights, heights)) == expected
+
+def test_invalid_rows_and_series_index():
+    rates = drip_rate_batch(pd.Series([1000, 500, 250], index=[7, 8, 9]), [60, 0, 30])
+    assert list(rates.index) == [7, 8, 9]
+    assert rates[7] == round(1000 * 20 / 60, 1) and np.isnan(rates[8])
@@ -0,0 +1,34 @@
+# tests/test_chunking.py
+from modules.chunking import ChunkDeduplicator, SentenceChunker
+
+DISCLAIMER = "This leaflet is for information only. Always ask your pharmacist before use."
+
+def _text(i):
+    return (f"Drug {i} is taken once a day with food. Dose {i} mg may be raised after a week. "
+            f"Store drug {i} below 25 degrees.\n\n{DISCLAIMER}\n\n"
+            f"Side effects of drug {i} include nausea. Stop taking drug {i} if a rash appears.")
+
+def test_chunks_never_cross_a_paragraph_break():
+    chunker = SentenceChunker(max_chars=500, overlap=80)
+    for _, _, chunk in chunker(_text(1)):
+        assert "\n\n" not in chunk
+
+def test_short_repeated_disclaimer_is_its_own_chunk_and_deduplicated():
+    chunker = SentenceChunker(max_chars=500, overlap=80)
+    dedup = ChunkDeduplicator("near")
+    for i in range(10):
+        chunks = [chunk for _, _, chunk in chunker(_text(i))]
+        assert DISCLAIMER in chunks
+        for chunk in chunks:
+            dedup.check(chunk, source=i)
+    assert dedup.stats()["exact_duplicates"] == 9
+
+def test_overlap_stays_within_a_paragraph():
+    paragraph = " ".join(f"Sentence number {n} of the paragraph." for n in range(12))
+    text = f"{paragraph}\n\nSecond paragraph starts here. It has two sentences."
+    spans = list(SentenceChunker(max_chars=200, overlap=80)(text))
+    starts = [start for start, _, _ in spans]
+    assert starts == sorted(starts)
+    assert spans[-1][2] == "Second paragraph starts here. It has two sentences."
+    # Chunks inside the long paragraph overlap their predecessor
+    assert any(start < previous_end for (_, previous_end, _), (start, _, _) in zip(spans, spans[1:-1]))
@@ -0,0 +1,41 @@
+# tests/test_disk_cache.py
+import sqlite3
+import time
+
+from modules.disk_cache import DiskCache
+
+def test_lookups_do_not_take_the_write_lock(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite")
+    cache.set("a", b"value")
+    writer = sqlite3.connect(str(tmp_path / "cache.sqlite"), isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")  # another process holding the write lock
+    try:
+        start = time.monotonic()
+        for _ in range(50):
+            assert cache.get("a") == b"value"
+            assert cache.get("missing") is None
+        assert time.monotonic() - start < 1.0
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+def test_buffered_counters_reach_stats(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite")
+    cache.set("a", b"12345")
+    cache.get("a"), cache.get("a"), cache.get("b")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bytes_saved"]) == (2, 1, 10)
+    # Counters persist for the next process
+    assert DiskCache(tmp_path / "cache.sqlite").stats()["hits"] == 2
+
+def test_eviction_sees_buffered_access_times(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite", max_bytes=10)
+    cache.set("old", b"12345")
+    time.sleep(0.01)
+    cache.set("new", b"12345")
+    time.sleep(0.01)
+    assert cache.get("old") == b"12345"  # now the most recently used
+    cache.set("third", b"12345")
+    cache.evict()
+    assert cache.get("old") == b"12345"
+    assert cache.get("new") is None
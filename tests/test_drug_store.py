@@ -0,0 +1,27 @@
+# tests/test_drug_store.py
+import json
+
+from modules.drug_store import DrugStore, connect_drug_db, upsert_drug
+
+def test_auto_switches_to_sqlite_once_the_database_appears(tmp_path):
+    json_path, sqlite_path = tmp_path / "drugs.json", tmp_path / "drugs.sqlite"
+    json_path.write_text(json.dumps({"aspirin": {"generic_name": "aspirin"}}), encoding="utf-8")
+    store = DrugStore(json_path, backend="auto", sqlite_path=sqlite_path, reload_interval=0)
+    assert store.get("aspirin") is not None
+    assert store.stats()["backend"] == "memory"
+
+    # An OpenFDA import creates the database while the app is running
+    conn = connect_drug_db(sqlite_path)
+    with conn:
+        upsert_drug(conn, "set-1", {"brand_names": ["Zyrtec"]}, names=["Zyrtec", "cetirizine"],
+                    set_id="set-1", version=1)
+    conn.close()
+
+    assert store.get("cetirizine") == {"brand_names": ["Zyrtec"]}
+    assert store.get("aspirin") is not None  # drugs.json is synced into the database
+    assert store.stats()["backend"] == "sqlite"
+
+def test_auto_starts_on_an_existing_database(tmp_path):
+    connect_drug_db(tmp_path / "drugs.sqlite").close()
+    store = DrugStore(tmp_path / "drugs.json", backend="auto", sqlite_path=tmp_path / "drugs.sqlite")
+    assert store.backend == "sqlite"
@@ -0,0 +1,100 @@
+# tests/test_llm_client.py
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from modules.llm_client import CircuitBreaker, ProviderClient
+
+# ------------------------------
+# Local stand-in provider
+# ------------------------------
+class StandIn:
+    """
+    /complete answers {"text": "plain answer"}; /stream answers with
+    `stream_status` (200 streams "a", "é") after `stream_delay` seconds.
+    """
+
+    def __init__(self):
+        self.stream_status = 200
+        self.stream_delay = 0
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def handle(self, handler):
+        handler.rfile.read(int(handler.headers.get("Content-Length", 0)))
+        with self.lock:
+            self.requests.append(handler.path)
+        if handler.path == "/stream":
+            time.sleep(self.stream_delay)
+            status = self.stream_status
+            body = "".join(f"data: {json.dumps({'text': t}, ensure_ascii=False)}\n\n" for t in ("a", "é")) + "data: [DONE]\n\n"
+        else:
+            status, body = 200, json.dumps({"text": "plain answer"})
+        data = body.encode("utf-8") if status == 200 else b"{}"
+        try:
+            handler.send_response(status)
+            content_type = "text/event-stream" if handler.path == "/stream" else "application/json"
+            handler.send_header("Content-Type", content_type)
+            handler.send_header("Content-Length", str(len(data)))
+            handler.end_headers()
+            handler.wfile.write(data)
+        except OSError:
+            pass  # the client timed out and closed the connection
+
+    def count(self, path):
+        with self.lock:
+            return self.requests.count(path)
+
+@pytest.fixture
+def stand_in():
+    state = StandIn()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            state.handle(self)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+def _client(stand_in, **kwargs):
+    return ProviderClient("test", f"{stand_in.url}/complete", "key", lambda prompt: {"prompt": prompt},
+                          lambda result: result["text"], stream_url=f"{stand_in.url}/stream",
+                          parse_stream_event=lambda event: event.get("text", ""), read_timeout=0.3,
+                          retries=1, backoff=0.01, breaker=CircuitBreaker(5, 60), cache=False, **kwargs)
+
+def test_stream_yields_pieces(stand_in):
+    assert list(_client(stand_in).stream("q")) == ["a", "é"]
+    assert stand_in.count("/complete") == 0
+
+def test_rejected_stream_falls_back_to_complete(stand_in):
+    stand_in.stream_status = 400
+    client = _client(stand_in)
+    assert list(client.stream("q")) == ["plain answer"]
+    assert stand_in.count("/stream") == 1 and stand_in.count("/complete") == 1
+    assert client.breaker._failures == 0
+
+def test_timed_out_stream_is_not_retried_through_complete(stand_in):
+    stand_in.stream_delay = 1.0
+    client = _client(stand_in)
+    start = time.monotonic()
+    assert list(client.stream("q")) == []
+    assert time.monotonic() - start < 1.5  # (retries + 1) read timeouts, not twice that
+    assert stand_in.count("/complete") == 0
+    assert client.breaker._failures == 1
+
+def test_unavailable_stream_is_one_failure(stand_in):
+    stand_in.stream_status = 503
+    client = _client(stand_in)
+    assert list(client.stream("q")) == []
+    assert stand_in.count("/stream") == 2 and stand_in.count("/complete") == 0
+    assert client.breaker._failures == 1
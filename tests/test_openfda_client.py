@@ -0,0 +1,173 @@
+# tests/test_openfda_client.py
+import json
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from modules.openfda_client import OpenFDAClient, TokenBucket
+
+# ------------------------------
+# Local stand-in for api.fda.gov
+# ------------------------------
+class StandIn:
+    """
+    Answers label searches from `responses`: drug name -> list of
+    (status, headers) consumed one per request, then 200 with a label.
+    Names in `delays` are answered after that many seconds.
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.delays = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def label(self, name):
+        return {"openfda": {"brand_name": [name.title()], "generic_name": [name]},
+                "indications_and_usage": [f"Indications for {name}."],
+                "dosage_and_administration": [f"Dose of {name}."]}
+
+    def handle(self, handler):
+        query = parse_qs(urlparse(handler.path).query)
+        name = re.search(r'brand_name:"([^"]+)"', query["search"][0]).group(1)
+        with self.lock:
+            self.requests.append((time.monotonic(), name))
+            scripted = self.responses.get(name)
+            status, headers = scripted.pop(0) if scripted else (200, {})
+        time.sleep(self.delays.get(name, 0))
+        body = json.dumps({"results": [self.label(name)]} if status == 200 else {"error": {"code": status}})
+        data = body.encode("utf-8")
+        handler.send_response(status)
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def count(self, name=None):
+        with self.lock:
+            return sum(1 for _, requested in self.requests if name is None or requested == name)
+
+@pytest.fixture
+def stand_in():
+    state = StandIn()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            state.handle(self)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state.url = f"http://127.0.0.1:{server.server_address[1]}/drug/label.json"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def make_client(stand_in, tmp_path):
+    def make(**kwargs):
+        params = {"base_url": stand_in.url, "api_key": None, "timeout": 5, "retries": 2, "backoff": 0.05,
+                  "rate": 0, "burst": 1, "workers": 4, "cache_path": str(tmp_path / "openfda.sqlite")}
+        return OpenFDAClient(**{**params, **kwargs})
+    return make
+
+# ------------------------------
+# Retries
+# ------------------------------
+def test_retries_5xx_with_backoff(stand_in, make_client):
+    stand_in.responses["metformin"] = [(503, {}), (502, {})]
+    client = make_client()
+    info = client.lookup("metformin")
+    assert info["dosage"] == "Dose of metformin."
+    assert stand_in.count("metformin") == 3
+    times = [at for at, _ in stand_in.requests]
+    # Backoff is 0.05 * 2**attempt * [0.5, 1.5): at least 25 ms, then 50 ms
+    assert times[1] - times[0] >= 0.02
+    assert times[2] - times[1] >= 0.045
+
+def test_retries_429_honouring_retry_after(stand_in, make_client):
+    stand_in.responses["warfarin"] = [(429, {"Retry-After": "0.3"})]
+    client = make_client()
+    assert client.lookup("warfarin") is not None
+    times = [at for at, _ in stand_in.requests]
+    assert times[1] - times[0] >= 0.28
+    assert client.stats["throttled"] == 1
+
+def test_gives_up_after_retries_and_does_not_cache(stand_in, make_client):
+    stand_in.responses["heparin"] = [(500, {})] * 3
+    client = make_client()
+    assert client.lookup("heparin") is None
+    assert stand_in.count("heparin") == 3
+    assert client.stats["errors"] == 1
+    # The failure was not cached: the next lookup asks again and succeeds
+    assert client.lookup("heparin") is not None
+    assert stand_in.count("heparin") == 4
+
+# ------------------------------
+# Not found and caching
+# ------------------------------
+def test_404_is_not_found(stand_in, make_client):
+    stand_in.responses["unknownium"] = [(404, {})]
+    client = make_client()
+    assert client.lookup("unknownium") is None
+    assert stand_in.count("unknownium") == 1
+    assert client.stats["errors"] == 0
+    # "Not found" is cached as well
+    assert client.lookup("unknownium") is None
+    assert stand_in.count("unknownium") == 1
+
+def test_cache_hit_makes_no_second_request(stand_in, make_client):
+    client = make_client()
+    first = client.lookup("ibuprofen")
+    second = client.lookup("  IBUPROFEN ")
+    assert first == {**second, "name": first["name"]}
+    assert stand_in.count("ibuprofen") == 1
+    assert client.stats["cache_hits"] == 1
+    # A new client on the same cache file is answered from disk too
+    assert make_client().lookup("ibuprofen") is not None
+    assert stand_in.count("ibuprofen") == 1
+
+# ------------------------------
+# Rate limiting
+# ------------------------------
+def test_token_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    for _ in range(10):
+        bucket.acquire()
+    # 10 more tokens at 50/s take about 0.2 s
+    assert time.monotonic() - start >= 0.18
+
+def test_requests_are_paced_by_the_bucket(stand_in, make_client):
+    client = make_client(rate=20, burst=1, cache_path=None)
+    client.lookup_many([f"drug{i}" for i in range(6)])
+    times = sorted(at for at, _ in stand_in.requests)
+    assert len(times) == 6
+    # One token up front, then one every 50 ms
+    assert times[-1] - times[0] >= 0.2
+
+# ------------------------------
+# Batch lookups
+# ------------------------------
+def test_lookup_many_keeps_input_order_and_deduplicates(stand_in, make_client):
+    names = ["amoxicillin", "lisinopril", "paracetamol", "amoxicillin", "insulin"]
+    # Earlier names answer later, so completion order is the reverse of input order
+    stand_in.delays = {"amoxicillin": 0.3, "lisinopril": 0.2, "paracetamol": 0.1}
+    stand_in.responses["insulin"] = [(404, {})]
+    client = make_client()
+    results = client.lookup_many(names)
+    assert list(results) == ["amoxicillin", "lisinopril", "paracetamol", "insulin"]
+    assert results["lisinopril"]["indications"] == "Indications for lisinopril."
+    assert results["insulin"] is None
+    assert stand_in.count("amoxicillin") == 1
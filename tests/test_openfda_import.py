@@ -0,0 +1,37 @@
+# tests/test_openfda_import.py
+import io
+import json
+
+import pytest
+
+from modules.openfda_import import iter_json_array
+
+ITEMS = [{"id": i, "text": "x" * (i * 37 % 500)} for i in range(2000)]
+DOC = json.dumps({"meta": {"results": {"total": len(ITEMS)}}, "results": ITEMS})
+
+def test_items_across_read_chunks():
+    assert list(iter_json_array(io.StringIO(DOC), chunk_size=1000)) == ITEMS
+
+def test_malformed_item_stops_at_the_buffer_cap():
+    bad = DOC.replace('{"id": 1000,', '{"id": 1000 oops,', 1)
+    offset = bad.index('{"id": 1000 oops')
+
+    class Reader(io.StringIO):
+        consumed = 0
+
+        def read(self, size=-1):
+            chunk = super().read(size)
+            Reader.consumed += len(chunk)
+            return chunk
+
+    items = []
+    with pytest.raises(ValueError, match=f"character {offset} "):
+        for item in iter_json_array(Reader(bad), chunk_size=1000, max_item_chars=5000):
+            items.append(item)
+    assert items == ITEMS[:1000]
+    # Gave up after about `max_item_chars`, without reading the rest of the file
+    assert Reader.consumed < offset + 5000 + 2000
+
+def test_truncated_file():
+    with pytest.raises(ValueError, match="truncated"):
+        list(iter_json_array(io.StringIO(DOC[:len(DOC) // 2]), chunk_size=1000))
@@ -0,0 +1,46 @@
+# tests/test_vector_index.py
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from modules.vector_index import INDEX_TYPES, configure_search, create_index, remove_ids
+
+PARAMS = {"nlist": 16, "nprobe": 16, "pq_m": 8, "train_sample": 4000}
+
+def _vectors(n=3000, dim=32, seed=0):
+    return np.random.default_rng(seed).random((n, dim)).astype("float32")
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_ids_unchanged_after_removal(index_type):
+    vectors = _vectors()
+    ids = np.arange(len(vectors), dtype="int64")
+    params = {**PARAMS, "index_type": index_type}
+    index, _ = create_index(vectors, params)
+    index.add_with_ids(vectors, ids)
+
+    removed = np.arange(1000, 1050)
+    index = configure_search(remove_ids(index, removed, params), params)
+
+    assert index.ntotal == len(vectors) - len(removed)
+    probes = np.array([0, 100, 999, 1050, 1100, 2999])
+    _, found = index.search(vectors[probes], 1)
+    if index_type == "ivf_pq":
+        # PQ codes are lossy; the exact vector must still be among the nearest
+        _, found = index.search(vectors[probes], 10)
+        assert all(probe in row for probe, row in zip(probes, found))
+    else:
+        assert found[:, 0].tolist() == probes.tolist()
+    _, found = index.search(vectors[removed], 10)
+    assert not np.isin(found, removed).any()
+
+def test_legacy_idmap_ivf_is_rebuilt_with_correct_ids():
+    vectors = _vectors()
+    index = faiss.index_factory(vectors.shape[1], "IDMap2,IVF16,Flat")
+    index.train(vectors)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
+
+    index = configure_search(remove_ids(index, np.arange(1000, 1050), PARAMS), PARAMS)
+
+    _, found = index.search(vectors[[100, 1100, 2999]], 1)
+    assert found[:, 0].tolist() == [100, 1100, 2999]